@@ -0,0 +1,213 @@
+"""
+benchmarks.py
+
+Performance benchmarks for contagion, written in the style of airspeed
+velocity (asv): each class's setup() builds its inputs for one combination of
+params, and its time_* methods are timed. They can be run with asv, or
+without it via run_benchmarks.py, which also records peak memory and writes
+the results as JSON.
+"""
+
+import sys
+import os
+import numpy as np
+import networkx as nx
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from contagion import contagion, temporal
+
+
+SIZES = [1000, 10000, 100000, 1000000]
+FAMILIES = ["ba", "ws", "sbm"]
+FEATURES = ["none", "testing", "tracing", "waning"]
+
+_graphs = {}
+
+
+def make_graph(family, n, seed = 0):
+    """Builds (and caches) a benchmark graph with mean degree of about 6.
+
+    Parameters
+    ----------
+    family : `str`
+        "ba" (Barabási–Albert), "ws" (Watts–Strogatz) or "sbm" (stochastic
+        block model with 10 blocks)
+    n : `int`
+        number of nodes
+    seed : `int`
+        seed for the graph generator
+
+    Returns
+    -------
+    G : `networkx.Graph`
+        the graph
+    """
+    key = (family, n, seed)
+    if key not in _graphs:
+        if family == "ba":
+            G = nx.barabasi_albert_graph(n, 3, seed=seed)
+        elif family == "ws":
+            G = nx.watts_strogatz_graph(n, 6, 0.1, seed=seed)
+        elif family == "sbm":
+            k = 10
+            sizes = [n // k + (i < n % k) for i in range(k)]
+            p_in = 5./(n/k)
+            p_out = 1./(n - n/k)
+            probs = [[p_in if i == j else p_out for j in range(k)]
+                for i in range(k)]
+            G = nx.stochastic_block_model(sizes, probs, seed=seed, sparse=True)
+        else:
+            raise ValueError("Invalid graph family.")
+        _graphs.clear()
+        _graphs[key] = G
+    return _graphs[key]
+
+
+def make_contagion(family, n, feature, seed = 0):
+    """Builds a network and a Contagion with one optional feature enabled.
+
+    Parameters
+    ----------
+    family : `str`
+        graph family, as in make_graph()
+    n : `int`
+        number of nodes
+    feature : `str`
+        "none", "testing" (random testing), "tracing" (contact tracing) or
+        "waning" (waning immunity)
+    seed : `int`
+        seed for the simulation
+
+    Returns
+    -------
+    sim : `contagion.Contagion`
+        the simulation
+    """
+    np.random.seed(seed)
+    network = contagion.ContactNetwork(
+        make_graph(family, n), fraction_infected = 0.01)
+    kwargs = {}
+    if feature == "testing":
+        kwargs = dict(
+            implement_testing = True, track_symptomatic = True,
+            test_rate = 0.01)
+    elif feature == "tracing":
+        kwargs = dict(
+            implement_testing = True, track_symptomatic = True,
+            testing_type = "contact", test_rate = 0.01)
+    elif feature == "waning":
+        kwargs = dict(omega = 0.05)
+    return contagion.Contagion(
+        network, beta = 0.1, gamma = 0.1, seed = seed, **kwargs)
+
+
+class NetworkConstruction:
+    """Times building a ContactNetwork from a graph or a CSR matrix."""
+    params = [FAMILIES, SIZES]
+    param_names = ["family", "n"]
+
+    def setup(self, family, n):
+        self.G = make_graph(family, n)
+        self.A = contagion.ContactNetwork(self.G).A
+
+    def time_from_graph(self, family, n):
+        contagion.ContactNetwork(self.G, fraction_infected = 0.01)
+
+    def time_from_csr(self, family, n):
+        contagion.ContactNetwork.from_csr(self.A, fraction_infected = 0.01)
+
+
+class SimulateStep:
+    """Times single simulation steps with each optional feature."""
+    params = [FAMILIES, SIZES, FEATURES]
+    param_names = ["family", "n", "feature"]
+
+    def setup(self, family, n, feature):
+        self.sim = make_contagion(family, n, feature)
+
+    def time_simulate_step(self, family, n, feature):
+        self.sim.simulate_step()
+
+
+class RunSimulation:
+    """Times fixed-length simulation runs with each optional feature."""
+    params = [FAMILIES, SIZES, FEATURES]
+    param_names = ["family", "n", "feature"]
+    number = 1
+    repeat = 1
+    steps = 20
+
+    def setup(self, family, n, feature):
+        self.sim = make_contagion(family, n, feature)
+
+    def time_run_simulation(self, family, n, feature):
+        self.sim.run_simulation(self.steps)
+
+
+class ImmunizationMethods:
+    """Times every Immunization.generate_* method. Betweenness and closeness
+    centrality, cliques and chains scale superlinearly, so these are only
+    benchmarked on the smaller sizes.
+    """
+    methods = sorted(
+        name for name in dir(contagion.Immunization)
+        if name.startswith("generate_"))
+    params = [methods + [
+            "generate_centrality_immunization_array:eigenvector",
+            "generate_centrality_immunization_array:closeness"],
+        SIZES]
+    param_names = ["method", "n"]
+    max_slow_size = 1000
+    slow = ["centrality_immunization_array", "cliques", "chains"]
+
+    def setup(self, method, n):
+        name, _, centrality = method.partition(":")
+        if any(s in name for s in self.slow) \
+                and centrality != "eigenvector" and n > self.max_slow_size:
+            raise NotImplementedError  # skipped, as asv does
+        self.network = contagion.ContactNetwork(make_graph("ba", n))
+        self.network.G  # build the graph outside the timed region
+        self.method = getattr(contagion.Immunization(self.network), name)
+        self.kwargs = {"centrality_type": centrality} if centrality else {}
+
+    def time_generate(self, method, n):
+        self.method(Q = max(1, self.network.n // 100), **self.kwargs)
+
+
+class TemporalDeltas:
+    """Times applying a stream of small edge deltas to a temporal network,
+    which should scale with the number of changed contacts rather than with
+    the size of the network.
+    """
+    params = [SIZES]
+    param_names = ["n"]
+    steps = 10
+    changes = 100
+
+    def setup(self, n):
+        rng = np.random.default_rng(0)
+        A = contagion.ContactNetwork(make_graph("ba", n)).A.tocoo()
+        steps = np.repeat(np.arange(1, self.steps + 1), self.changes)
+        removed = rng.integers(0, A.nnz, len(steps))
+        added = rng.integers(0, n, (2, len(steps)))
+        self.network = temporal.TemporalNetwork(
+            n,
+            initial = A,
+            added = temporal.EdgeTable.from_events(steps, *added),
+            removed = temporal.EdgeTable.from_events(
+                steps, A.row[removed], A.col[removed]))
+
+    def time_advance(self, n):
+        self.network.advance_to(0)
+        self.network.advance_to(self.steps)
+
+
+class ImportTime:
+    """Times importing each module in a fresh interpreter. The core modules
+    should not import plotting libraries, NetworkX or Numba.
+    """
+    params = [["contagion.contagion", "contagion.cache", "contagion.plotting"]]
+    param_names = ["module"]
+    repeat = 3
+
+    def timeraw_import(self, module):
+        return "import " + module
@@ -0,0 +1,185 @@
+"""
+run_benchmarks.py
+
+Runs the benchmarks in benchmarks.py without asv. For each combination of
+params, a benchmark's setup() is run, its time_* methods are timed over a few
+repeats, and the peak memory allocated by one further call is recorded with
+tracemalloc. The code returned by timeraw_* methods is timed in a fresh
+interpreter, as with asv, and its peak resident memory is recorded instead.
+Results are written as JSON, and may be compared with a previous run.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 -o results.json
+    python benchmarks/run_benchmarks.py --compare old.json -o new.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import benchmarks
+
+
+def _time(func, args, repeat):
+    """Times repeated calls of func, returning the per-call times (seconds)
+    and the peak memory (bytes) allocated during one further call.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak
+
+
+# runs code in a fresh interpreter and prints its duration and peak resident
+# memory (bytes on macOS, kilobytes elsewhere)
+_RAW = """
+import resource, sys, time
+t0 = time.perf_counter()
+exec(compile(sys.argv[1], "<benchmark>", "exec"))
+elapsed = time.perf_counter() - t0
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss if sys.platform == "darwin" else rss*1024)
+"""
+
+
+def _time_raw(code, repeat):
+    """Times code in fresh interpreters, returning the per-run times (seconds)
+    and the largest peak resident memory (bytes) of the interpreters.
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + ([env["PYTHONPATH"]] if "PYTHONPATH" in env else []))
+    times, peak = [], 0
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", _RAW, code], env=env, text=True)
+        elapsed, rss = out.split()[-2:]
+        times.append(float(elapsed))
+        peak = max(peak, int(rss))
+    return times, peak
+
+
+def run(sizes, match = None, repeat = 5):
+    """Runs every benchmark whose name contains match, for the given network
+    sizes.
+
+    Returns
+    -------
+    results : `List`
+        one record per benchmark and combination of params
+    """
+    results = []
+    classes = [benchmarks.NetworkConstruction, benchmarks.SimulateStep,
+        benchmarks.RunSimulation, benchmarks.ImmunizationMethods,
+        benchmarks.TemporalDeltas, benchmarks.ImportTime]
+    for cls in classes:
+        params = [sizes if name == "n" else values
+            for name, values in zip(cls.param_names, cls.params)]
+        for name in sorted(dir(cls)):
+            if not name.startswith(("time_", "timeraw_")):
+                continue
+            bench = "{}.{}".format(cls.__name__, name)
+            if match is not None and match not in bench:
+                continue
+            for combo in itertools.product(*params):
+                instance = cls()
+                try:
+                    if hasattr(instance, "setup"):
+                        instance.setup(*combo)
+                except NotImplementedError:
+                    continue
+                if name.startswith("timeraw_"):
+                    times, peak = _time_raw(
+                        getattr(instance, name)(*combo),
+                        getattr(cls, "repeat", repeat))
+                else:
+                    times, peak = _time(
+                        getattr(instance, name),
+                        combo,
+                        getattr(cls, "repeat", repeat))
+                record = {
+                    "benchmark": bench,
+                    "params": dict(zip(cls.param_names, combo)),
+                    "times": times,
+                    "median": float(np.median(times)),
+                    "min": float(np.min(times)),
+                    "peak_memory": peak}
+                results.append(record)
+                print("{:<45} {:<60} {:>10.4f}s {:>8.1f}MB".format(
+                    bench, str(combo), record["median"], peak/2**20),
+                    flush=True)
+    return results
+
+
+def _key(record):
+    return record["benchmark"], json.dumps(record["params"], sort_keys=True)
+
+
+def compare(old, new):
+    """Prints the ratio of new to old median times for benchmarks present in
+    both runs.
+    """
+    previous = {_key(r): r for r in old["results"]}
+    for record in new["results"]:
+        if _key(record) in previous:
+            ratio = record["median"]/previous[_key(record)]["median"]
+            print("{:<45} {:<60} {:>6.2f}x".format(
+                record["benchmark"], str(tuple(record["params"].values())),
+                ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000],
+        help="network sizes (default: 1000 10000)")
+    parser.add_argument(
+        "--match", default=None,
+        help="only run benchmarks whose name contains this string")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timed calls per benchmark")
+    parser.add_argument(
+        "-o", "--output", default="benchmark_results.json",
+        help="path of the JSON results file")
+    parser.add_argument(
+        "--compare", default=None, help="JSON results of a previous run")
+    args = parser.parse_args()
+
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+            text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    output = {
+        "meta": {
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "sizes": args.sizes},
+        "results": run(args.sizes, args.match, args.repeat)}
+    with open(args.output, "w") as fh:
+        json.dump(output, fh, indent=1)
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            compare(json.load(fh), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+"""
+_kernels.py
+
+Fused per-node kernels for Contagion's compiled backend. The kernels are
+compiled with Numba when it is installed; otherwise they are plain Python
+functions (correct, but only practical for small networks), and Contagion
+falls back to its NumPy implementation.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    numba = None
+    HAVE_NUMBA = False
+
+
+def _jit(func):
+    """Compiles a kernel with Numba, if available."""
+    if HAVE_NUMBA:
+        return numba.njit(cache=True)(func)
+    return func
+
+
+# vaccination modes
+VACC_NONE = 0
+VACC_FULL = 1           # one-time, full-efficacy vaccination this step
+VACC_PARTIAL_FIRST = 2  # first step of partial-efficacy vaccination
+VACC_PARTIAL = 3        # subsequent steps of partial-efficacy vaccination
+
+# testing modes
+TEST_NONE = 0
+TEST_RANDOM = 1         # a single test rate for all nodes
+TEST_RANDOM_SPLIT = 2   # (asymptomatic, symptomatic) test rates
+TEST_GIVEN = 3          # tests selected outside the kernel
+
+# waning modes
+WANE_NONE = 0
+WANE_ALL = 1            # scalar omega applied to all recovered nodes
+WANE_NATURAL = 2        # scalar omega applied to non-immunized nodes only
+WANE_SPLIT = 3          # (natural, immunization) omega tuple
+
+
+@_jit
+def seed(value):
+    """Seeds the random number generator used inside compiled kernels."""
+    np.random.seed(value)
+
+
+@_jit
+def fused_step(
+        indptr, indices, data,
+        Su, In, In_out, Re, Sy, Im, Im_this_step, EverTested, NewPositiveTests,
+        new_transmissions, new_recoveries, new_symptomatic, new_tested,
+        beta, gamma, psi, omega_natural, omega_immunized, efficacy, test_rate_0,
+        test_rate_1, vacc_mode, test_mode, wane_mode, track_symptomatic,
+        weighted, log_survival):
+    """Advances every node through one simulation step in a single pass,
+    reproducing the per-node arithmetic of Contagion.simulate_step. Infection
+    pressure is read from In, and the updated infected record is written to
+    In_out, so that nodes visited later in the pass see the start-of-step
+    state of their neighbors. Random numbers are only drawn for nodes whose
+    transition is possible.
+
+    If weighted is True, each infected contact of weight w transmits
+    independently with probability 1 - (1 - beta)**w, where log_survival is
+    log(1 - beta).
+
+    All arrays are flat float64 arrays of length n (except the CSR arrays),
+    and are updated in place.
+
+    Returns
+    -------
+    sums : `tuple`
+        the totals of Su, In, Re, Sy, EverTested and NewPositiveTests, as
+        recorded in the simulation histories (Su is totalled before waning
+        immunity returns nodes to it, as in Contagion.update_Su)
+    """
+    n = len(Su)
+    su_sum = 0.
+    in_sum = 0.
+    re_sum = 0.
+    sy_sum = 0.
+    et_sum = 0.
+    pos_sum = 0.
+    for i in range(n):
+        su = Su[i]
+        inf = In[i]
+        re = Re[i]
+
+        # vaccination
+        if vacc_mode == VACC_FULL:
+            re = 1. if re + Im[i] > 0 else 0.
+        elif vacc_mode == VACC_PARTIAL_FIRST or vacc_mode == VACC_PARTIAL:
+            if vacc_mode == VACC_PARTIAL:
+                re -= Im_this_step[i]
+            re = 1. if re > 0 else 0.
+            filt = 0.
+            if Im[i] != 0:
+                x = Im[i]*np.random.random()
+                if 0 < x <= efficacy:
+                    filt = 1.
+            Im_this_step[i] = filt
+            re = 1. if re + filt > 0 else 0.
+
+        # transmission
+        trans = 0.
+        if su != 0 and re == 0.:
+            pressure = 0.
+            for k in range(indptr[i], indptr[i + 1]):
+                pressure += data[k]*In[indices[k]]
+            if pressure != 0:
+                if weighted:
+                    if su > 0 and \
+                            np.random.random() < -np.expm1(pressure*log_survival):
+                        trans = 1.
+                else:
+                    x = pressure*su*np.random.random()
+                    if 0 < x <= beta:
+                        trans = 1.
+
+        # recovery
+        rec = 0.
+        if inf != 0:
+            x = inf*np.random.random()
+            if 0 < x <= gamma:
+                rec = 1.
+
+        # symptoms
+        sym = 0.
+        if track_symptomatic:
+            asym = inf - Sy[i]
+            if asym != 0:
+                x = asym*np.random.random()
+                if 0 < x <= psi:
+                    sym = 1.
+
+        # testing
+        if test_mode != TEST_NONE:
+            if test_mode == TEST_RANDOM:
+                tested = 1. if np.random.random() <= test_rate_0 else 0.
+            elif test_mode == TEST_RANDOM_SPLIT:
+                u = np.random.random()
+                tested = 0.
+                if u <= test_rate_0 and 1. - Sy[i] - re == 1.:
+                    tested += 1.
+                if u <= test_rate_1 and Sy[i] == 1.:
+                    tested += 1.
+            else:
+                tested = new_tested[i]
+            new_tested[i] = tested
+            if tested == 1. and EverTested[i] == 0.:
+                EverTested[i] += 1.
+            NewPositiveTests[i] = 1. if tested == 1. and inf == 1. else 0.
+            et_sum += EverTested[i]
+            pos_sum += NewPositiveTests[i]
+
+        # compartment updates
+        su -= trans
+        su_sum += su
+        inf += trans - rec
+        re += rec
+        re = 1. if re > 0 else 0.
+        if wane_mode == WANE_ALL or wane_mode == WANE_NATURAL:
+            if re > 0 and (wane_mode == WANE_ALL or Im[i] == 0):
+                if np.random.random() <= omega_natural:
+                    re -= 1.
+                    su += 1.
+        elif wane_mode == WANE_SPLIT:
+            re_to_su = 0.
+            if re > 0 and Im[i] == 0:
+                if np.random.random() <= omega_natural:
+                    re_to_su = 1.
+            im_to_su = 0.
+            if Im[i] > 0:
+                if np.random.random() <= omega_immunized:
+                    im_to_su = 1.
+            re -= re_to_su
+            Im[i] = 1. if Im[i] - im_to_su > 0 else 0.
+            su += re_to_su + im_to_su
+        re = 1. if re > 0 else 0.
+        su = 1. if su > 0 else 0.
+
+        Su[i] = su
+        In_out[i] = inf
+        Re[i] = re
+        new_transmissions[i] = trans
+        new_recoveries[i] = rec
+        in_sum += inf
+        re_sum += re
+        if track_symptomatic:
+            new_symptomatic[i] = sym
+            Sy[i] += sym - rec
+            sy_sum += Sy[i]
+    return su_sum, in_sum, re_sum, sy_sum, et_sum, pos_sum
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+
+"""
+aggregation.py
+
+Streaming aggregation of simulation ensembles: per-step means and variances
+(Welford's algorithm) and mergeable quantile sketches (KLL), together with
+peak and final-size summaries. Aggregators use memory independent of the
+number of runs, and aggregators built in separate processes can be pickled
+and merged.
+"""
+
+__author__ = "Lucas McCabe"
+
+import copy
+import random
+import numpy as np
+
+
+class RunningStats():
+    """Welford accumulators of the count, mean and sum of squared deviations
+    of a stream of scalars or equally-shaped arrays.
+    """
+
+    def __init__(self, shape = ()):
+        """Constructor for the RunningStats class.
+
+        Parameters
+        ----------
+        shape : `tuple`
+            shape of the values
+
+        Returns
+        -------
+        None
+        """
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        return None
+
+    def update(self, x):
+        """Adds a value.
+
+        Parameters
+        ----------
+        x : `float` or `numpy.ndarray`
+            the value
+
+        Returns
+        -------
+        None
+        """
+        self.count += 1
+        delta = x - self.mean
+        self.mean = self.mean + delta/self.count
+        self.m2 = self.m2 + delta*(x - self.mean)
+        return None
+
+    def merge(self, other):
+        """Adds the values accumulated by another RunningStats.
+
+        Parameters
+        ----------
+        other : `RunningStats`
+            the other accumulator
+
+        Returns
+        -------
+        None
+        """
+        count = self.count + other.count
+        if other.count == 0:
+            return None
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta*other.count/count
+        self.m2 = self.m2 + other.m2 + delta**2*self.count*other.count/count
+        self.count = count
+        return None
+
+    def variance(self, ddof = 1):
+        """Returns the variance of the values.
+
+        Parameters
+        ----------
+        ddof : `int`
+            delta degrees of freedom
+
+        Returns
+        -------
+        variance : `float` or `numpy.ndarray`
+            the variance, nan if there are too few values
+        """
+        if self.count <= ddof:
+            return np.full(np.shape(self.mean), np.nan)[()]
+        return self.m2/(self.count - ddof)
+
+
+class KLLSketch():
+    """A mergeable quantile sketch (Karnin, Lang and Liberty, 2016). Values
+    are held in a hierarchy of compactors; a full compactor sorts its values
+    and promotes every other one, chosen at random, to the next level, where
+    each value stands for twice as many. Quantiles have rank error of roughly
+    1/k with memory of roughly 3k values.
+    """
+
+    def __init__(self, k = 200, seed = None):
+        """Constructor for the KLLSketch class.
+
+        Parameters
+        ----------
+        k : `int`
+            accuracy parameter: the capacity of the top compactor
+        seed : `int`
+            seed for the compaction coin flips
+
+        Returns
+        -------
+        None
+        """
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+        self._rng = random.Random(seed)
+        return None
+
+    def _capacity(self, h):
+        depth = len(self.compactors) - h - 1
+        return int(np.ceil(self.k*(2./3.)**depth)) + 1
+
+    def _size(self):
+        return sum(len(c) for c in self.compactors)
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h, compactor in enumerate(self.compactors):
+                if len(compactor) >= self._capacity(h):
+                    if h + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    compactor.sort()
+                    odd = len(compactor) % 2
+                    leftover = [compactor.pop()] if odd else []
+                    offset = self._rng.randint(0, 1)
+                    self.compactors[h + 1].extend(compactor[offset::2])
+                    self.compactors[h] = leftover
+                    break
+        return None
+
+    def update(self, values):
+        """Adds one or more values.
+
+        Parameters
+        ----------
+        values : `float` or `numpy.ndarray`
+            the values
+
+        Returns
+        -------
+        None
+        """
+        values = np.atleast_1d(values).astype(float).tolist()
+        self.compactors[0].extend(values)
+        self.count += len(values)
+        self._compress()
+        return None
+
+    def merge(self, other):
+        """Adds the values summarized by another sketch.
+
+        Parameters
+        ----------
+        other : `KLLSketch`
+            the other sketch
+
+        Returns
+        -------
+        None
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for h, compactor in enumerate(other.compactors):
+            self.compactors[h].extend(compactor)
+        self.count += other.count
+        self._compress()
+        return None
+
+    def quantile(self, q):
+        """Returns approximate quantiles of the values.
+
+        Parameters
+        ----------
+        q : `float` or `numpy.ndarray`
+            quantile level(s) in [0, 1]
+
+        Returns
+        -------
+        quantiles : `float` or `numpy.ndarray`
+            the quantiles, nan if the sketch is empty
+        """
+        values = np.concatenate(
+            [np.asarray(c, dtype=float) for c in self.compactors])
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        weights = np.concatenate([
+            np.full(len(c), 2.**h) for h, c in enumerate(self.compactors)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        ranks = np.asarray(q)*cumulative[-1]
+        index = np.searchsorted(cumulative, ranks, side="left")
+        return values[np.minimum(index, len(values) - 1)]
+
+
+class EnsembleAggregator():
+    """Aggregates per-step series (e.g. In_hist) from an ensemble of runs,
+    with per-step means, variances and quantile sketches, and the peak height,
+    peak time and final size of each run. Runs that end early are treated as
+    remaining at their final value, so that every step summarizes every run.
+    """
+
+    def __init__(self, k = 200, seed = None):
+        """Constructor for the EnsembleAggregator class.
+
+        Parameters
+        ----------
+        k : `int`
+            accuracy parameter of the quantile sketches
+        seed : `int`
+            seed for the quantile sketches
+
+        Returns
+        -------
+        None
+        """
+        self.k = k
+        self.runs = 0
+        self._seed = random.Random(seed)
+        self.steps = RunningStats((0,))
+        self.sketches = []
+        self.final = RunningStats()
+        self._final_sketch = self._new_sketch()
+        self.summaries = {
+            name: (RunningStats(), self._new_sketch())
+            for name in ["peak_height", "peak_time", "final_size"]}
+        return None
+
+    def _new_sketch(self):
+        return KLLSketch(self.k, seed=self._seed.getrandbits(32))
+
+    def _extend(self, length):
+        """Extends the per-step statistics to length steps, filling new steps
+        with the runs' final values.
+        """
+        old = len(self.sketches)
+        if length <= old:
+            return None
+        fill = length - old
+        self.steps.mean = np.concatenate(
+            [self.steps.mean, np.full(fill, self.final.mean)])
+        self.steps.m2 = np.concatenate(
+            [self.steps.m2, np.full(fill, self.final.m2)])
+        self.sketches += [
+            copy.deepcopy(self._final_sketch) for _ in range(fill)]
+        return None
+
+    def add(self, series, final_size = None):
+        """Adds a run.
+
+        Parameters
+        ----------
+        series : `numpy.ndarray`
+            the run's per-step values, e.g. its In_hist
+        final_size : `float`
+            the run's final size (e.g. its cumulative number of infections),
+            if it is to be summarized
+
+        Returns
+        -------
+        None
+        """
+        series = np.asarray(series, dtype=float).ravel()
+        if len(series) == 0:
+            raise ValueError("Series must not be empty.")
+        self._extend(len(series))
+        padded = np.concatenate(
+            [series, np.full(len(self.sketches) - len(series), series[-1])])
+        self.steps.update(padded)
+        for sketch, value in zip(self.sketches, padded.tolist()):
+            sketch.update(value)
+        self.final.update(series[-1])
+        self._final_sketch.update(series[-1])
+
+        summary = {
+            "peak_height": series.max(),
+            "peak_time": float(np.argmax(series)),
+            "final_size": final_size}
+        for name, value in summary.items():
+            if value is not None:
+                stats, sketch = self.summaries[name]
+                stats.update(value)
+                sketch.update(value)
+        self.runs += 1
+        return None
+
+    def merge(self, other):
+        """Adds the runs aggregated by another EnsembleAggregator, e.g. one
+        built in another process.
+
+        Parameters
+        ----------
+        other : `EnsembleAggregator`
+            the other aggregator
+
+        Returns
+        -------
+        None
+        """
+        other = copy.deepcopy(other)
+        length = max(len(self.sketches), len(other.sketches))
+        self._extend(length)
+        other._extend(length)
+        self.steps.merge(other.steps)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        self.final.merge(other.final)
+        self._final_sketch.merge(other._final_sketch)
+        for name, (stats, sketch) in self.summaries.items():
+            other_stats, other_sketch = other.summaries[name]
+            stats.merge(other_stats)
+            sketch.merge(other_sketch)
+        self.runs += other.runs
+        return None
+
+    def mean(self):
+        """Returns the per-step means."""
+        return self.steps.mean.copy()
+
+    def variance(self):
+        """Returns the per-step variances."""
+        return self.steps.variance()
+
+    def quantiles(self, q):
+        """Returns approximate per-step quantiles.
+
+        Parameters
+        ----------
+        q : `List`
+            quantile levels in [0, 1]
+
+        Returns
+        -------
+        quantiles : `numpy.ndarray`
+            a (len(q), steps) array
+        """
+        return np.array([s.quantile(q) for s in self.sketches]).T
+
+    def summary(self, q = (0.05, 0.5, 0.95)):
+        """Summarizes the peak heights, peak times and final sizes of the runs.
+
+        Parameters
+        ----------
+        q : `tuple`
+            quantile levels to report
+
+        Returns
+        -------
+        summary : `dict`
+            maps "peak_height", "peak_time" and "final_size" to dicts of their
+            "count", "mean", "variance" and "quantiles"
+        """
+        return {
+            name: {
+                "count": stats.count,
+                "mean": stats.mean[()] if stats.count else np.nan,
+                "variance": stats.variance(),
+                "quantiles": sketch.quantile(np.asarray(q))}
+            for name, (stats, sketch) in self.summaries.items()}
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+
+"""
+cache.py
+
+Memoization of simulation runs. A run is identified by a content hash of the
+network's contacts, its initial compartments and immunization arrays, every
+Contagion constructor parameter, the number of steps and the seed, so that
+identical requests share a key however they were built. Results (histories
+and summary statistics) are kept in an in-process LRU cache and, optionally,
+in an on-disk store of .npz files with size-based LRU eviction. Sweeps over
+parameters only simulate the points missing from the cache.
+"""
+
+__author__ = "Lucas McCabe"
+
+import collections
+import hashlib
+import importlib.metadata
+import inspect
+import os
+import time
+import types
+import weakref
+import numpy as np
+import scipy.sparse as sp
+from contagion import contagion, campaigns, observers
+
+# parameters that do not change a run's results, or that are set by the cache
+_IGNORED = [
+    "self", "network", "save_history", "profile", "observers", "n_threads"]
+
+# version of the simulation results, included in every key; bumped whenever
+# simulations or the stored results change, so older results are not reused
+_SCHEMA = 2
+
+
+def _touch(path):
+    """Sets a file's modification time, which orders files for eviction, to
+    the current time. The clock is finer than the file system's own
+    timestamps, so files used in quick succession keep their order."""
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def _package_version():
+    """Returns the installed version of contagion, or None."""
+    try:
+        return importlib.metadata.version("contagion")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+# network attributes that determine a run, besides its contacts
+_NETWORK_STATE = [
+    "Su", "In", "Re", "Im", "Mo", "mo_thresh", "im_starts_after", "im_type",
+    "efficacy"]
+
+# network attributes that a simulation may modify, and which are restored
+# after it
+_RESTORED = ["Su", "In", "Re", "Sy", "EverTested", "NewPositiveTests"] + [
+    name for name in _NETWORK_STATE if name not in ["Su", "In", "Re"]]
+
+# Campaign constructor parameters; its other attributes are dosing progress,
+# which Contagion resets
+_CAMPAIGN_PARAMETERS = [
+    "order", "capacity", "efficacy", "second_efficacy", "start",
+    "second_dose_after"]
+
+# contact data of networks whose contacts change over time
+_DYNAMIC_CONTACTS = ["layers", "snapshots", "initial", "added", "removed", "cycle"]
+
+# digests of sparse matrices, by id, which are assumed not to be modified in
+# place once hashed
+_matrix_digests = {}
+
+
+def _matrix_digest(A):
+    """Returns the digest of a sparse matrix's shape and entries."""
+    entry = _matrix_digests.get(id(A))
+    if entry is not None and entry[0]() is A:
+        return entry[1]
+    csr = sp.csr_matrix(A, copy=True)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(csr.shape).encode())
+    csr.sum_duplicates()
+    # index and value types vary with how a matrix was built
+    for array, dtype in [
+            (csr.indptr, np.int64), (csr.indices, np.int64),
+            (csr.data, np.float64)]:
+        _update(h, array.astype(dtype, copy=False))
+    digest = h.digest()
+    key = id(A)
+    _matrix_digests[key] = (
+        weakref.ref(A, lambda _: _matrix_digests.pop(key, None)), digest)
+    return digest
+
+
+def _update(h, value):
+    """Feeds a parameter value into a hash. Arrays and sparse matrices are
+    hashed by content, a Campaign by its constructor parameters, and other
+    objects (e.g. a CompartmentModel) by their attributes.
+
+    Parameters
+    ----------
+    h : `hashlib.blake2b`
+        the hash
+    value
+        the value
+
+    Raises
+    ------
+    ValueError: when the value cannot be hashed by content, e.g. a function.
+
+    Returns
+    -------
+    None
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        h.update(repr((type(value).__name__, value)).encode())
+    elif sp.issparse(value):
+        h.update(b"sparse")
+        h.update(_matrix_digest(value))
+    elif isinstance(value, np.ndarray):
+        h.update(repr(("ndarray", value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).view(np.uint8).ravel())
+    elif isinstance(value, (list, tuple)):
+        h.update(repr((type(value).__name__, len(value))).encode())
+        for item in value:
+            _update(h, item)
+    elif isinstance(value, dict):
+        h.update(repr(("dict", len(value))).encode())
+        for key in sorted(value, key=repr):
+            _update(h, key)
+            _update(h, value[key])
+    elif isinstance(value, (
+            types.FunctionType,
+            types.MethodType,
+            types.BuiltinFunctionType)) or not hasattr(value, "__dict__"):
+        raise ValueError(
+            "Cannot hash a value of type {} by content.".format(
+                type(value).__name__))
+    elif isinstance(value, campaigns.Campaign):
+        h.update(b"Campaign")
+        _update(h, {name: getattr(value, name) for name in _CAMPAIGN_PARAMETERS})
+    else:
+        h.update(repr(("object", type(value).__qualname__)).encode())
+        _update(h, vars(value))
+    return None
+
+
+def fingerprint(network, steps = np.inf, seed = None, **sim_kwargs):
+    """Computes the key of a simulation run. Keys also depend on the
+    installed version of contagion and the cache's schema, so results of
+    older code are not reused.
+
+    Parameters
+    ----------
+    network : `ContactNetwork`
+        the network, in its initial state
+    steps : `float`
+        number of simulation steps
+    seed : `int`
+        the simulation's seed
+    **sim_kwargs
+        keyword arguments for Contagion (e.g. beta, gamma); omitted
+        arguments take their default values
+
+    Raises
+    ------
+    ValueError: when a parameter cannot be hashed by content.
+
+    Returns
+    -------
+    key : `str`
+        a hexadecimal digest
+    """
+    arguments = inspect.signature(contagion.Contagion).bind(
+        network, seed=seed, **sim_kwargs)
+    arguments.apply_defaults()
+    params = {
+        name: value for name, value in arguments.arguments.items()
+        if name not in _IGNORED}
+
+    h = hashlib.blake2b(digest_size=20)
+    _update(h, (_SCHEMA, _package_version()))
+    _update(h, type(network).__qualname__)
+    if hasattr(network, "pressure"):
+        _update(h, {
+            name: getattr(network, name) for name in _DYNAMIC_CONTACTS
+            if hasattr(network, name)})
+    else:
+        _update(h, network.A)
+    _update(h, {
+        name: getattr(network, name, None) for name in _NETWORK_STATE})
+    _update(h, params)
+    _update(h, float(steps))
+    return h.hexdigest()
+
+
+def _simulate(network, steps, seed, **sim_kwargs):
+    """Runs a simulation and collects its histories and summary statistics.
+    The network's compartments and immunization are restored afterwards.
+    """
+    # arrays are copied, as some are modified in place
+    saved = {
+        name: np.copy(getattr(network, name))
+        if isinstance(getattr(network, name), np.ndarray)
+        else getattr(network, name)
+        for name in _RESTORED if hasattr(network, name)}
+    with contagion.Contagion(
+            network, seed=seed, save_history=True, **sim_kwargs) as sim:
+        peak = sim.add_observer(observers.Peak())
+        sim.run_simulation(steps)
+    result = {}
+    for name in [
+            "Su_hist", "In_hist", "Re_hist", "Sy_hist", "EverTested_hist",
+            "NewPositiveTests_hist"]:
+        if hasattr(sim, name):
+            result[name] = np.asarray(getattr(sim, name), dtype=float)
+    if sim.model is not None:
+        for compartment, history in sim.hist.items():
+            result["hist_" + compartment] = np.asarray(history, dtype=float)
+    infected = result["In_hist"]
+    # nodes may return to the susceptible compartment, so infections are
+    # counted as they happen
+    result["final_size"] = float(peak.cumulative)
+    result["peak"] = infected.max()
+    result["peak_step"] = int(infected.argmax())
+    result["steps"] = sim.t
+    for name in _RESTORED:
+        if name in saved:
+            setattr(network, name, saved[name])
+        elif hasattr(network, name):
+            delattr(network, name)
+    return result
+
+
+def _freeze(result):
+    """Makes a result's arrays read-only, so cached results are not modified
+    by callers, and its scalars Python numbers."""
+    frozen = {}
+    for name, value in result.items():
+        value = np.asarray(value)
+        if value.ndim == 0:
+            frozen[name] = value.item()
+        else:
+            value = value.copy()
+            value.flags.writeable = False
+            frozen[name] = value
+    return frozen
+
+
+class ResultCache():
+    """A cache of simulation results, keyed by fingerprint(). Results are
+    dicts holding the run's histories (e.g. "In_hist", and "hist_<name>" for
+    each compartment of a compartment model) as read-only arrays, and the
+    summary statistics "final_size" (the cumulative number of infections,
+    including initial ones), "peak", "peak_step" and "steps". The most
+    recently used results are kept in memory; if a path is given, all
+    results are also written there, and the least recently used files are
+    deleted once the store exceeds max_bytes.
+    """
+
+    def __init__(self, path = None, max_bytes = 2**30, memory_items = 256):
+        """Constructor for the ResultCache class.
+
+        Parameters
+        ----------
+        path : `str`
+            directory of the on-disk store, which is created if needed. If
+            None, results are only cached in memory.
+        max_bytes : `int`
+            maximum size of the on-disk store
+        memory_items : `int`
+            maximum number of results kept in memory
+
+        Returns
+        -------
+        None
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        return None
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+        return None
+
+    def get(self, key):
+        """Looks up a result, in memory and then on disk.
+
+        Parameters
+        ----------
+        key : `str`
+            the run's key
+
+        Returns
+        -------
+        result : `dict`
+            the result, or None if it is not cached
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self.path is None or not os.path.exists(self._file(key)):
+            return None
+        try:
+            with np.load(self._file(key)) as data:
+                result = _freeze({name: data[name] for name in data.files})
+            _touch(self._file(key))
+        except (OSError, ValueError):
+            return None
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """Stores a result.
+
+        Parameters
+        ----------
+        key : `str`
+            the run's key
+        result : `dict`
+            the result
+
+        Returns
+        -------
+        result : `dict`
+            the stored, read-only result
+        """
+        result = _freeze(result)
+        self._remember(key, result)
+        if self.path is not None:
+            temporary = self._file(key) + ".tmp"
+            with open(temporary, "wb") as f:
+                np.savez(f, **result)
+            os.replace(temporary, self._file(key))
+            _touch(self._file(key))
+            self._evict()
+        return result
+
+    def _evict(self):
+        """Deletes the least recently used files until the store fits."""
+        files = [
+            entry for entry in os.scandir(self.path)
+            if entry.name.endswith(".npz")]
+        stats = [(entry.path, entry.stat()) for entry in files]
+        total = sum(stat.st_size for _, stat in stats)
+        for path, stat in sorted(stats, key=lambda s: s[1].st_mtime_ns):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= stat.st_size
+        return None
+
+    def clear(self):
+        """Removes every cached result, in memory and on disk.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self._memory.clear()
+        if self.path is not None:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".npz"):
+                    os.remove(entry.path)
+        return None
+
+    def run(self, network, steps = np.inf, seed = None, **sim_kwargs):
+        """Returns the result of a simulation run, simulating it only if it is
+        not cached. The network's compartments are left unchanged.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the network, in its initial state
+        steps : `float`
+            number of simulation steps
+        seed : `int`
+            the simulation's seed
+        **sim_kwargs
+            keyword arguments for Contagion (e.g. beta, gamma). Histories
+            are always saved, and observers are not supported.
+
+        Raises
+        ------
+        ValueError: when seed is None, observers are given, or a parameter
+        cannot be hashed by content.
+
+        Returns
+        -------
+        result : `dict`
+            the run's histories and summary statistics
+        """
+        if seed is None:
+            raise ValueError("Cached runs require a seed.")
+        if sim_kwargs.get("observers"):
+            raise ValueError("Cached runs do not support observers.")
+        sim_kwargs.pop("save_history", None)
+        sim_kwargs.pop("observers", None)
+        key = fingerprint(network, steps, seed, **sim_kwargs)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        return self.put(key, _simulate(network, steps, seed, **sim_kwargs))
+
+    def sweep(self, network, points, steps = np.inf, **sim_kwargs):
+        """Returns the results of a sweep over parameters, simulating only the
+        points that are not cached.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the network, in its initial state
+        points : `List`
+            one dict of Contagion keyword arguments per point, e.g.
+            [{"beta": 0.1, "seed": 0}, {"beta": 0.2, "seed": 0}], overriding
+            sim_kwargs
+        steps : `float`
+            number of simulation steps
+        **sim_kwargs
+            keyword arguments for Contagion shared by every point
+
+        Returns
+        -------
+        results : `List`
+            the result of each point
+        """
+        return [
+            self.run(network, steps, **{**sim_kwargs, **point})
+            for point in points]
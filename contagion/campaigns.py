@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""
+campaigns.py
+
+Rolling vaccination campaigns: nodes are vaccinated in priority order, at a
+limited number of doses per step, with optional second doses after a delay.
+Each vaccinated node draws a single uniform number at its first dose, which
+decides whether each of its doses protects it. Every step only touches the
+nodes dosed in that step, through index arrays, so a campaign costs time
+proportional to the number of doses rather than the size of the network.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+
+
+class Campaign():
+    """A vaccination campaign, passed to Contagion as its campaign argument.
+    At every step from start onwards, due second doses are given first, and
+    the remaining capacity goes to first doses, in priority order. A dose
+    protects a node if the node's uniform draw is below the dose's
+    (cumulative) efficacy; protected nodes that are susceptible at the time
+    move to the recovered compartment, and so are subject to re-susceptibility
+    (omega) like any recovered node.
+    """
+
+    def __init__(
+            self,
+            order,
+            capacity,
+            efficacy = 1.,
+            start = 0,
+            second_dose_after = None,
+            second_efficacy = None,
+            priority = None):
+        """Constructor for the Campaign class.
+
+        Parameters
+        ----------
+        order : `numpy.ndarray`
+            the node indices to vaccinate, highest priority first, or an
+            (n, 1) immunization array such as those returned by Immunization
+            methods, in which case the nodes with non-zero entries are
+            vaccinated
+        capacity : `int` or `numpy.ndarray`
+            doses available per step: a constant, or a 1-D schedule indexed by
+            simulation step, whose last value holds for all later steps
+        efficacy : `float`
+            probability that a first dose protects a node
+        start : `int`
+            step at which the campaign starts
+        second_dose_after : `int`
+            if provided, every vaccinated node is given a second dose this
+            many steps after its first
+        second_efficacy : `float`
+            probability that a node is protected after its second dose.
+            Defaults to efficacy.
+        priority : `numpy.ndarray`
+            for an immunization array, scores by which to order the selected
+            nodes, highest first (e.g. network.degrees). Defaults to index
+            order.
+
+        Raises
+        ------
+        ValueError: when a parameter is out of range.
+
+        Returns
+        -------
+        None
+        """
+        order = np.asarray(order)
+        if order.ndim == 2:
+            selected = np.flatnonzero(order.ravel() > 0)
+            if priority is not None:
+                scores = np.asarray(priority, dtype=float).ravel()[selected]
+                selected = selected[np.argsort(-scores, kind="stable")]
+            order = selected
+        self.order = order.astype(np.int64)
+        if len(np.unique(self.order)) != len(self.order):
+            raise ValueError("Campaign nodes must be distinct.")
+        self.capacity = np.asarray(capacity)
+        if np.any(self.capacity < 0) or self.capacity.ndim > 1:
+            raise ValueError(
+                "Capacity must be a non-negative constant or schedule.")
+        second_efficacy = efficacy if second_efficacy is None \
+            else second_efficacy
+        if not 0. <= efficacy <= second_efficacy <= 1.:
+            raise ValueError(
+                "Efficacies must satisfy 0 <= efficacy <= second_efficacy <= 1.")
+        self.efficacy = efficacy
+        self.second_efficacy = second_efficacy
+        self.start = start
+        self.second_dose_after = second_dose_after
+        self.reset()
+        return None
+
+    def reset(self):
+        """Returns the campaign to its start, before any doses are given.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.next = 0
+        self.first_doses = []
+        self.second_doses = []
+        self.protected = 0
+        # second doses due at each step: (nodes, uniform draws)
+        self._second_queue = {}
+        return None
+
+    def _capacity(self, t):
+        if self.capacity.ndim == 0:
+            return int(self.capacity)
+        return int(self.capacity[min(t, len(self.capacity) - 1)])
+
+    def _protect(self, network, nodes, draws, efficacy):
+        """Moves the susceptible nodes whose draws fall below efficacy to the
+        recovered compartment, and returns them.
+        """
+        nodes = nodes[draws < efficacy]
+        nodes = nodes[
+            (network.Su.ravel()[nodes] > 0)
+            & (network.In.ravel()[nodes] == 0)
+            & (network.Re.ravel()[nodes] == 0)]
+        network.Su[nodes] = 0.
+        network.Re[nodes] = 1.
+        self.protected += len(nodes)
+        return nodes
+
+    def step(self, sim):
+        """Gives the current step's doses. Called by Contagion at the start of
+        each step.
+
+        Parameters
+        ----------
+        sim : `Contagion`
+            the simulation
+
+        Returns
+        -------
+        protected : `numpy.ndarray`
+            the nodes newly moved to the recovered compartment
+        """
+        t = sim.t
+        if t < self.start:
+            return np.zeros(0, dtype=np.int64)
+        capacity = self._capacity(t)
+        protected = []
+
+        due_nodes, due_draws = self._second_queue.pop(
+            t, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+        if len(due_nodes) > capacity:
+            # doses beyond capacity are given at the next step
+            self._queue(
+                t + 1, due_nodes[capacity:], due_draws[capacity:], overdue=True)
+            due_nodes, due_draws = due_nodes[:capacity], due_draws[:capacity]
+        if len(due_nodes):
+            protected.append(self._protect(
+                sim.network, due_nodes, due_draws, self.second_efficacy))
+        self.second_doses.append(len(due_nodes))
+        capacity -= len(due_nodes)
+
+        nodes = self.order[self.next:self.next + capacity]
+        self.next += len(nodes)
+        draws = sim.rng.random(len(nodes))
+        protected.append(
+            self._protect(sim.network, nodes, draws, self.efficacy))
+        self.first_doses.append(len(nodes))
+        if self.second_dose_after is not None and len(nodes):
+            self._queue(t + self.second_dose_after, nodes, draws)
+        return np.concatenate(protected)
+
+    def _queue(self, t, nodes, draws, overdue = False):
+        """Files second doses due at step t; overdue doses go first."""
+        if t in self._second_queue:
+            queued_nodes, queued_draws = self._second_queue[t]
+            if overdue:
+                nodes, queued_nodes = queued_nodes, nodes
+                draws, queued_draws = queued_draws, draws
+            nodes = np.concatenate([queued_nodes, nodes])
+            draws = np.concatenate([queued_draws, draws])
+        self._second_queue[t] = (nodes, draws)
+        return None
+
+    def coverage(self):
+        """Returns the numbers of first and second doses given so far.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        first, second : `int`
+            the numbers of doses
+        """
+        return sum(self.first_doses), sum(self.second_doses)
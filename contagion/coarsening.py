@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+
+"""
+coarsening.py
+
+Graph coarsening for fast, approximate simulation of very large networks.
+Nodes are merged into weighted super-nodes: first structurally equivalent
+nodes (nodes with identical contacts) or given groups (e.g. households or
+communities), then neighboring nodes by repeated heavy-edge matching, until a
+target reduction ratio is reached. Each super-node of a CoarseNetwork stands
+for all of its members, which share its state; its contact weights are the
+mean number of contacts of a member with each other super-node, so that with
+weighted transmission the probability of a super-node's infection at a step
+is the probability of infection of a typical member. Trajectories are
+projected back to counts of the original population by weighting each
+super-node by its size, and error_report() measures the error of the
+approximation against full simulations, on the network or on a sample of it.
+"""
+
+__author__ = "Lucas McCabe"
+
+import copy
+import time
+import numpy as np
+import scipy.sparse as sp
+from contagion import comparison, contagion, observers, seeding
+
+
+def structural_classes(A):
+    """Labels the structural equivalence classes of a network: nodes with
+    exactly the same (weighted) contacts. Rows are compared through random
+    hashes of their neighbor sets, so the labels are computed in time
+    proportional to the number of edges. Isolated nodes are each left in
+    their own class.
+
+    Parameters
+    ----------
+    A : `scipy.sparse.spmatrix`
+        the (n, n) adjacency matrix
+
+    Returns
+    -------
+    labels : `numpy.ndarray`
+        the class of each node, numbered from 0
+    """
+    A = sp.csr_matrix(A, copy=True)
+    A.sort_indices()
+    n = A.shape[0]
+    degrees = np.diff(A.indptr)
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 2**63, size=n, dtype=np.uint64)
+    float_keys = rng.random(n)
+    connected = np.flatnonzero(degrees > 0)
+    starts = A.indptr[:-1][connected]
+    hashes = np.zeros((n, 3))
+    hashes[:, 0] = -1 - np.arange(n)
+    hashes[connected, 0] = degrees[connected]
+    if len(connected):
+        # unsigned sums wrap around, and are exact; the weighted sum is a
+        # float, but equal for identical sorted rows
+        hashes[connected, 1] = np.add.reduceat(
+            keys[A.indices], starts).astype(float)
+        hashes[connected, 2] = np.add.reduceat(
+            float_keys[A.indices]*A.data, starts)
+    return np.unique(hashes, axis=0, return_inverse=True)[1].ravel()
+
+
+def _coarse_edges(A, labels, k):
+    """Sums the contacts between each pair of distinct groups of nodes."""
+    n = A.shape[0]
+    P = sp.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, k))
+    E = (P.T @ A @ P).tocoo()
+    off = E.row != E.col
+    return sp.csr_matrix(
+        (E.data[off], (E.row[off], E.col[off])), shape=(k, k))
+
+
+def _match(E, sizes, limit, rng):
+    """One level of heavy-edge matching. Every group points to the neighbor
+    with which it has the most contacts relative to the groups' sizes; pairs
+    pointing to each other are merged, and groups pointing to a merged pair
+    join it. At most limit merges are made, heaviest first.
+
+    Parameters
+    ----------
+    E : `scipy.sparse.csr_matrix`
+        the (k, k) contacts between groups, without self-contacts
+    sizes : `numpy.ndarray`
+        the number of nodes in each group
+    limit : `int`
+        maximum number of merges
+    rng : `numpy.random.Generator`
+        random number generator for breaking ties
+
+    Returns
+    -------
+    labels : `numpy.ndarray`
+        the new group of each group, numbered from 0
+    """
+    k = E.shape[0]
+    rows = np.repeat(np.arange(k), np.diff(E.indptr))
+    scores = E.data/(sizes[rows]*sizes[E.indices])
+    order = np.lexsort((rng.random(len(rows)), scores, rows))
+    last = np.flatnonzero(np.diff(np.append(rows[order], k)))
+    best = np.full(k, -1)
+    best[rows[order][last]] = E.indices[order][last]
+    best_score = np.zeros(k)
+    best_score[rows[order][last]] = scores[order][last]
+
+    nodes = np.arange(k)
+    pointing = best >= 0
+    mutual = np.zeros(k, dtype=bool)
+    mutual[pointing] = best[best[pointing]] == nodes[pointing]
+    leaders = nodes[mutual & (nodes < best)]
+    paired = np.zeros(k, dtype=bool)
+    paired[leaders] = paired[best[leaders]] = True
+    joining = nodes[pointing & ~paired]
+    joining = joining[paired[best[joining]]]
+
+    if len(leaders) + len(joining) > limit:
+        merge_scores = np.concatenate(
+            [best_score[leaders], best_score[joining]])
+        keep = np.zeros(len(merge_scores), dtype=bool)
+        keep[np.argsort(-merge_scores, kind="stable")[:limit]] = True
+        # a group joining an unmerged pair member merges with it alone
+        leaders, joining = \
+            leaders[keep[:len(leaders)]], joining[keep[len(leaders):]]
+    labels = nodes.copy()
+    labels[best[leaders]] = leaders
+    labels[joining] = labels[best[joining]]
+    return np.unique(labels, return_inverse=True)[1].ravel()
+
+
+def coarsen(
+        network,
+        ratio = 0.1,
+        groups = None,
+        equivalence = True,
+        seed = None):
+    """Builds a coarse network with about ratio*n super-nodes. Structurally
+    equivalent nodes, or the given groups, are merged first, and then
+    neighboring groups by heavy-edge matching until the target is reached.
+
+    Parameters
+    ----------
+    network : `ContactNetwork`
+        the network to coarsen
+    ratio : `float`
+        the target number of super-nodes, as a fraction of the number of
+        nodes. With groups, a ratio of 1 merges exactly the groups.
+    groups : `numpy.ndarray`
+        a group label for each node (e.g. households or communities, as
+        returned by generators.household_workplace), whose members are
+        merged in place of structurally equivalent nodes
+    equivalence : `bool`
+        describes whether structurally equivalent nodes are merged, when no
+        groups are given
+    seed : `int`
+        seed for breaking ties in matching
+
+    Raises
+    ------
+    ValueError: when ratio is not in (0, 1].
+
+    Returns
+    -------
+    coarse : `CoarseNetwork`
+        the coarse network
+    """
+    if not 0. < ratio <= 1.:
+        raise ValueError("The reduction ratio must be in (0, 1].")
+    A = network.A
+    n = network.n
+    target = max(1, int(np.ceil(ratio*n)))
+    if groups is not None:
+        labels = np.unique(
+            np.asarray(groups).ravel(), return_inverse=True)[1].ravel()
+    elif equivalence:
+        labels = structural_classes(A)
+    else:
+        labels = np.arange(n)
+    rng = np.random.default_rng(seed)
+    k = labels.max() + 1
+    while k > target:
+        E = _coarse_edges(A, labels, k)
+        merged = _match(E, np.bincount(labels, minlength=k), k - target, rng)
+        if merged.max() + 1 == k:
+            break
+        labels = merged[labels]
+        k = labels.max() + 1
+    return CoarseNetwork(network, labels)
+
+
+class CoarseNetwork(contagion.ContactNetwork):
+    """A contact network of super-nodes, each standing for a group of nodes of
+    an original network. Row l of the adjacency matrix holds the contacts of
+    the members of super-node l with each other super-node, divided by the
+    size of l, i.e. the mean number of such contacts of a member of l;
+    contacts within a super-node are dropped. With weighted transmission, a
+    super-node is infected at a step with the probability of infection of a
+    typical member, so the expected number of original nodes infected
+    matches that of the original network in the same state. Simulations on a
+    coarse network should use weighted transmission (see simulate()), and
+    fractions of infected and recovered nodes refer to the original
+    population.
+    """
+
+    def __init__(self, network, membership):
+        """Constructor for the CoarseNetwork class.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the original network, whose fraction_infected and
+            fraction_recovered are kept
+        membership : `numpy.ndarray`
+            the super-node of each original node
+
+        Returns
+        -------
+        None
+        """
+        self.membership = np.unique(
+            np.asarray(membership).ravel(), return_inverse=True)[1].ravel()
+        self.sizes = np.bincount(self.membership)
+        self.population = len(self.membership)
+        k = len(self.sizes)
+        E = _coarse_edges(network.A, self.membership, k)
+        super().__init__(
+            fraction_infected = network.fraction_infected,
+            fraction_recovered = network.fraction_recovered,
+            A = sp.diags(1./self.sizes) @ E)
+        return None
+
+    def init_Su_In_Re(self, rng = None):
+        """Initializes the compartment arrays. Super-nodes are drawn at random
+        with probability proportional to their size, and are infected (then
+        recovered) until their members make up the fractions of the original
+        population nearest to fraction_infected (and fraction_recovered). At
+        least one super-node is infected.
+
+        Parameters
+        ----------
+        rng : `numpy.random.Generator`
+            random number generator. Defaults to NumPy's global random state.
+
+        Returns
+        -------
+        None
+        """
+        rng = seeding._generator(rng)
+        # weighted sampling without replacement by exponential keys
+        order = np.argsort(rng.exponential(size=self.n)/self.sizes)
+        midpoints = np.cumsum(self.sizes[order]) - self.sizes[order]/2.
+        infected = max(1, np.searchsorted(
+            midpoints, self.fraction_infected*self.population, side="right"))
+        recovered = max(infected, np.searchsorted(
+            midpoints,
+            (self.fraction_infected + self.fraction_recovered)*self.population,
+            side="right"))
+        self.seed(seeding.SeedSet(
+            order[:infected], order[infected:recovered]))
+        return None
+
+    def counts(self, x):
+        """Counts the original nodes in the super-nodes marked by a record.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            an (n, 1) or (n,) record of the coarse network, e.g. In
+
+        Returns
+        -------
+        count : `float`
+            the number of original nodes
+        """
+        return float(self.sizes @ np.asarray(x).ravel())
+
+    def project(self, x):
+        """Projects a record of the coarse network onto the original nodes,
+        each taking the value of its super-node.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            an (n, 1) or (n,) record of the coarse network, e.g. In
+
+        Returns
+        -------
+        projected : `numpy.ndarray`
+            the record of the original network
+        """
+        x = np.asarray(x)
+        return x[self.membership] if x.ndim == 1 \
+            else x[self.membership, :]
+
+
+class PopulationCounts(observers.Observer):
+    """Records the numbers of susceptible, infected and recovered nodes at each
+    step, counting each node of a CoarseNetwork as the number of original
+    nodes it stands for.
+    """
+
+    def __init__(self, capacity = None):
+        """Constructor for the PopulationCounts class.
+
+        Parameters
+        ----------
+        capacity : `int`
+            number of most recent steps retained. If None, every step is
+            retained.
+
+        Returns
+        -------
+        None
+        """
+        self.capacity = capacity
+        return None
+
+    def start(self, sim):
+        net = sim.network
+        self.sizes = net.sizes if isinstance(net, CoarseNetwork) \
+            else np.ones(net.n)
+        self.counts = [] if self.capacity is None \
+            else observers.RingBuffer(self.capacity, width=3)
+        self._record(net)
+        return None
+
+    def values(self):
+        """Returns the retained counts.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        counts : `numpy.ndarray`
+            a (steps, 3) array of the numbers of susceptible, infected and
+            recovered nodes, oldest first
+        """
+        if self.capacity is None:
+            return np.array(self.counts).reshape(-1, 3)
+        return self.counts.values()
+
+    def _record(self, net):
+        self.counts.append([
+            self.sizes @ net.Su.ravel(),
+            self.sizes @ net.In.ravel(),
+            self.sizes @ net.Re.ravel()])
+        return None
+
+    def observe(self, sim, step, deltas):
+        self._record(sim.network)
+        return False
+
+
+def simulate(network, steps = np.inf, seed = None, **sim_kwargs):
+    """Runs a simulation with weighted transmission, and returns its
+    trajectory in counts of the original population.
+
+    Parameters
+    ----------
+    network : `CoarseNetwork` or `ContactNetwork`
+        the network, whose current compartments are the initial conditions
+    steps : `float`
+        maximum number of simulation steps
+    seed : `int`
+        seed for the simulation
+    **sim_kwargs
+        keyword arguments for Contagion (e.g. beta, gamma)
+
+    Returns
+    -------
+    counts : `numpy.ndarray`
+        a (steps + 1, 3) array of the numbers of susceptible, infected and
+        recovered nodes at each step
+    """
+    sim_kwargs.setdefault("save_history", False)
+    with contagion.Contagion(
+            network, seed=seed, weighted_transmission=True,
+            **sim_kwargs) as sim:
+        counts = sim.add_observer(PopulationCounts())
+        sim.run_simulation(steps)
+    return counts.values()
+
+
+def _summary(runs, population):
+    """Mean final size, peak and peak step of trajectories, and their mean
+    infected fraction at each step."""
+    length = max(len(r) for r in runs)
+    infected = np.array([
+        np.pad(r[:, 1], (0, length - len(r)), mode="edge") for r in runs])
+    return {
+        "final_size": np.mean([
+            (r[-1, 1] + r[-1, 2] - r[0, 2])/population for r in runs]),
+        "peak": infected.max(axis=1).mean()/population,
+        "peak_step": infected.argmax(axis=1).mean(),
+        "curve": infected.mean(axis=0)/population}
+
+
+def error_report(
+        network,
+        ratio = 0.1,
+        groups = None,
+        sample = None,
+        runs = 10,
+        steps = np.inf,
+        seed = None,
+        **sim_kwargs):
+    """Measures the error of coarse simulations against full simulations. The
+    network, or a connected sample of it, is coarsened, and both are
+    simulated from the same random number seeds. Coarse networks carry no
+    immunization, so both are simulated without the network's immunization.
+
+    Parameters
+    ----------
+    network : `ContactNetwork`
+        the network, which is left unchanged
+    ratio, groups
+        as for coarsen()
+    sample : `int`
+        if provided, the comparison is run on the subnetwork induced by a
+        cluster of this many nodes around a random node, found by
+        breadth-first search
+    runs : `int`
+        number of replicates of each simulation
+    steps : `float`
+        maximum number of simulation steps
+    seed : `int`
+        seed for the sample, the coarsening and the replicates
+    **sim_kwargs
+        keyword arguments for Contagion (e.g. beta, gamma)
+
+    Returns
+    -------
+    report : `dict`
+        the numbers of nodes and super-nodes; for "final_size" (cumulative
+        infections) and "peak" (maximum number infected), as fractions of the
+        population, and for "peak_step", a dict of the "full" and "coarse"
+        means and the "relative_error"; "trajectory_rmse", the root mean
+        squared difference between the mean infected fractions of each step;
+        and the "time" taken by each simulation
+    """
+    sample_seed, coarsen_seed, run_seed = np.random.SeedSequence(seed).spawn(3)
+    if sample is not None and sample < network.n:
+        nodes = np.sort(seeding.by_cluster(
+            network.A, sample, rng=np.random.default_rng(sample_seed)).infected)
+        fraction_infected = network.fraction_infected \
+            if round(network.fraction_infected*len(nodes)) >= 1 else 0
+        network = contagion.ContactNetwork.from_csr(
+            network.A[nodes][:, nodes],
+            fraction_infected = fraction_infected,
+            fraction_recovered = network.fraction_recovered)
+        if groups is not None:
+            groups = np.asarray(groups).ravel()[nodes]
+    else:
+        # the replicates reseed a shallow copy, so the caller's seeds are left
+        # unchanged; coarse networks carry no immunization, so neither does
+        # the copy
+        network = copy.copy(network)
+        comparison._reset_immunization(network)
+    coarse = coarsen(
+        network,
+        ratio = ratio,
+        groups = groups,
+        seed = int(coarsen_seed.generate_state(1)[0]))
+
+    trajectories = {"full": [], "coarse": []}
+    elapsed = {"full": 0., "coarse": 0.}
+    for s in run_seed.spawn(runs):
+        init_seed, sim_seed = s.generate_state(2)
+        for name, net in [("full", network), ("coarse", coarse)]:
+            net.init_Su_In_Re(rng=np.random.default_rng(init_seed))
+            start = time.perf_counter()
+            trajectories[name].append(
+                simulate(net, steps, seed=int(sim_seed), **sim_kwargs))
+            elapsed[name] += time.perf_counter() - start
+
+    full = _summary(trajectories["full"], network.n)
+    approx = _summary(trajectories["coarse"], network.n)
+    report = {"nodes": network.n, "super_nodes": coarse.n}
+    for key in ["final_size", "peak", "peak_step"]:
+        report[key] = {
+            "full": full[key],
+            "coarse": approx[key],
+            "relative_error":
+                abs(approx[key] - full[key])/max(abs(full[key]), 1e-12)}
+    length = max(len(full["curve"]), len(approx["curve"]))
+    curves = [
+        np.pad(c, (0, length - len(c)), mode="edge")
+        for c in [full["curve"], approx["curve"]]]
+    report["trajectory_rmse"] = float(
+        np.sqrt(np.mean((curves[0] - curves[1])**2)))
+    report["time"] = elapsed
+    return report
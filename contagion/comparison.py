@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+"""
+comparison.py
+
+Comparison of immunization policies under common random numbers: in each
+replicate, every policy is simulated with the same initial infections and the
+same random number streams, so that differences between policies are measured
+on paired outcomes rather than swamped by run-to-run variation.
+"""
+
+__author__ = "Lucas McCabe"
+
+import copy
+import itertools
+import statistics
+import numpy as np
+from contagion import contagion
+from contagion import observers
+
+
+def _reset_immunization(network):
+    """Removes any immunization from a network."""
+    network.Mo = None
+    network.Im = None
+    network.mo_thresh = None
+    network.im_starts_after = 0
+    network.im_type = None
+    network.efficacy = 1.
+    return None
+
+
+def run_replicate(
+        network,
+        Im,
+        seed,
+        metric = "final_size",
+        steps = np.inf,
+        immunize_kwargs = None,
+        **sim_kwargs):
+    """Simulates one replicate of a policy. Two seeds are drawn from seed:
+    one selects the initially infected and recovered nodes, and the other
+    seeds the simulation, so that replicates sharing a seed share their
+    initial conditions and random number streams.
+
+    Parameters
+    ----------
+    network : `ContactNetwork`
+        the contact network, which is left unchanged: the replicate runs on a
+        shallow copy, whose compartments and immunization are reset
+    Im : `numpy.ndarray`
+        an (n, 1) immunization array, or None for no immunization
+    seed : `int` or `numpy.random.SeedSequence`
+        the replicate's seed
+    metric : `str` or callable
+        "final_size" (the cumulative number of infections, including initial
+        ones), "peak" (the maximum number infected), or a function of the
+        finished Contagion
+    steps : `float`
+        maximum number of simulation steps
+    immunize_kwargs : `dict`
+        keyword arguments for ContactNetwork.immunize_network(), e.g.
+        {"im_starts_after": 5}
+    **sim_kwargs
+        keyword arguments for Contagion (e.g. beta, gamma)
+
+    Returns
+    -------
+    value : `float`
+        the metric
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    init_seed, sim_seed = seed.generate_state(2)
+    # the copy shares the contacts, and gets its own compartment, seed and
+    # immunization arrays
+    network = copy.copy(network)
+    network.init_Su_In_Re(rng=np.random.default_rng(init_seed))
+    _reset_immunization(network)
+    if Im is not None:
+        network.immunize_network(
+            np.array(Im, dtype=float), **(immunize_kwargs or {}))
+    sim_kwargs.setdefault("save_history", False)
+    with contagion.Contagion(network, seed=int(sim_seed), **sim_kwargs) as sim:
+        peak = sim.add_observer(observers.Peak())
+        sim.run_simulation(steps)
+    if metric == "final_size":
+        return float(peak.cumulative)
+    if metric == "peak":
+        return float(peak.peak)
+    if callable(metric):
+        return float(metric(sim))
+    raise ValueError("Invalid metric provided.")
+
+
+def _summarize(names, values, z, lower_is_better):
+    """Ranks policies by their mean metric, and computes confidence intervals
+    for the paired differences between every pair of policies.
+    """
+    means = values.mean(axis=0)
+    order = np.argsort(means if lower_is_better else -means, kind="stable")
+    ranking = [names[i] for i in order]
+    differences = {}
+    runs = len(values)
+    for i, j in itertools.combinations(range(len(names)), 2):
+        d = values[:, i] - values[:, j]
+        half = z*d.std(ddof=1)/np.sqrt(runs) if runs > 1 else np.inf
+        differences[(names[i], names[j])] = (
+            d.mean(), d.mean() - half, d.mean() + half)
+    settled = True
+    for a, b in zip(order[:-1], order[1:]):
+        key = (names[min(a, b)], names[max(a, b)])
+        _, lo, hi = differences[key]
+        if lo <= 0 <= hi:
+            settled = False
+    return {
+        "policies": list(names),
+        "runs": runs,
+        "values": values,
+        "means": dict(zip(names, means)),
+        "differences": differences,
+        "ranking": ranking,
+        "settled": settled}
+
+
+def compare_policies(
+        network,
+        policies,
+        metric = "final_size",
+        min_runs = 10,
+        max_runs = 1000,
+        batch_size = 10,
+        confidence = 0.95,
+        lower_is_better = True,
+        seed = None,
+        steps = np.inf,
+        immunize_kwargs = None,
+        **sim_kwargs):
+    """Compares immunization policies under common random numbers. Replicates
+    are run in batches; in every replicate, each policy is simulated with the
+    same initial conditions and random number streams. After each batch, the
+    policies are ranked by their mean metric, and the comparison stops once
+    every pair of adjacently ranked policies differs significantly, i.e. once
+    the confidence interval of their paired difference excludes zero.
+    Intervals are Bonferroni-corrected over the adjacent pairs.
+
+    Parameters
+    ----------
+    network : `ContactNetwork`
+        the contact network
+    policies : `dict`
+        maps policy names to (n, 1) immunization arrays (or None for no
+        immunization)
+    metric : `str` or callable
+        the outcome to compare, as in run_replicate()
+    min_runs : `int`
+        minimum number of replicates
+    max_runs : `int`
+        maximum number of replicates
+    batch_size : `int`
+        number of replicates between checks of the ranking
+    confidence : `float`
+        confidence level of the intervals
+    lower_is_better : `bool`
+        describes whether policies with lower metrics rank first
+    seed : `int`
+        seed from which the replicates' seeds are drawn
+    steps : `float`
+        maximum number of simulation steps
+    immunize_kwargs : `dict`
+        keyword arguments for ContactNetwork.immunize_network()
+    **sim_kwargs
+        keyword arguments for Contagion (e.g. beta, gamma)
+
+    Returns
+    -------
+    results : `dict`
+        "policies", "runs", "values" (a (runs, policies) array), "means",
+        "differences" (maps pairs of policy names (a, b) to the mean and
+        confidence interval of a - b), "ranking" (best first) and "settled"
+    """
+    names = list(policies)
+    if len(names) < 2:
+        raise ValueError("At least two policies are required.")
+    pairs = len(names) - 1
+    z = statistics.NormalDist().inv_cdf(1 - (1 - confidence)/(2*pairs))
+    root = np.random.SeedSequence(seed)
+    values = np.zeros((0, len(names)))
+    while True:
+        seeds = root.spawn(min(batch_size, max_runs - len(values)))
+        block = np.array([
+            [run_replicate(
+                network, policies[name], s, metric, steps, immunize_kwargs,
+                **sim_kwargs)
+                for name in names]
+            for s in seeds])
+        values = np.concatenate([values, block])
+        results = _summarize(names, values, z, lower_is_better)
+        if len(values) >= max_runs \
+                or (len(values) >= min_runs and results["settled"]):
+            return results
@@ -2,31 +2,122 @@
 
 """
 contagion.py
+
+Contact networks, contagion simulation and immunization. This module imports
+only NumPy and SciPy's sparse matrices; NetworkX, Numba, SciPy's sparse
+graph and linear algebra routines and plotting libraries are imported when a
+feature that requires them is first used.
 """
 
 __author__ = "Lucas McCabe"
 
 import numpy as np
-import networkx as nx
 import random
 from typing import List
-import matplotlib.pyplot as plt
-import seaborn as sns
-import collections
-import math
-import scipy.special as scsp
-from scipy.optimize import minimize
-from numpy.linalg import matrix_power
+import scipy.sparse as sp
 import copy
+import warnings
+from contagion import models
+from contagion import profiling
+from contagion import seeding
+
+def _draw_seed(rng):
+    """Draws an integer seed from a random number generator, which may be a
+    `numpy.random.Generator` or the `numpy.random` module.
+
+    Parameters
+    ----------
+    rng : `numpy.random.Generator` or module
+        the random number generator
+
+    Returns
+    -------
+    seed : `int`
+        a seed in [0, 2**31 - 1)
+    """
+    if hasattr(rng, "integers"):
+        return int(rng.integers(2**31 - 1))
+    return int(rng.randint(2**31 - 1))
+
+
+def _have_numba():
+    """Returns True if Numba is installed, without importing it, so that the
+    compiled kernels are only loaded by simulations that use them.
+    """
+    import importlib.util
+    return importlib.util.find_spec("numba") is not None
+
+
+def _is_zero(rate):
+    """Returns True if a rate (a scalar, an array, or a tuple of these) is zero
+    everywhere.
+
+    Parameters
+    ----------
+    rate : `float`, `numpy.ndarray` or `tuple`
+        the rate
+
+    Returns
+    -------
+    is_zero : `bool`
+        whether the rate is zero everywhere
+    """
+    if isinstance(rate, tuple):
+        return all(_is_zero(r) for r in rate)
+    return not np.any(rate)
+
+
+def _rows(rate, r0, r1):
+    """Returns rows r0 to r1 of a per-node array, or a scalar rate unchanged.
+
+    Parameters
+    ----------
+    rate : `float` or `numpy.ndarray`
+        a scalar, or an (n, 1) per-node array
+    r0 : `int`
+        first row
+    r1 : `int`
+        row after the last
+
+    Returns
+    -------
+    rate : `float` or `numpy.ndarray`
+        the rate for the requested rows
+    """
+    if isinstance(rate, np.ndarray):
+        return rate[r0:r1]
+    return rate
+
+
+def _log1m(p):
+    """Returns log(1 - p), clipping p just below 1 so that certain
+    transmission gives a large but finite negative log-survival.
+
+    Parameters
+    ----------
+    p : `float` or `numpy.ndarray`
+        a probability, or an array of probabilities
+
+    Returns
+    -------
+    log_survival : `float` or `numpy.ndarray`
+        log(1 - p)
+    """
+    return np.log1p(-np.minimum(p, np.nextafter(1., 0.)))
+
 
 class ContactNetwork():
-    """For creating contact networks fron NetworkX graphs.
+    """For creating contact networks fron NetworkX graphs or sparse adjacency
+    matrices.
     """
     def __init__(
             self,
-            G: nx.Graph,
+            G: "nx.Graph" = None,
             fraction_infected: float = 0,
-            fraction_recovered: float = 0):
+            fraction_recovered: float = 0,
+            A: sp.spmatrix = None,
+            labels: np.ndarray = None,
+            weight: str = "weight"):
         """
         Constructor for the ContactNetwork class. Initializes a contact
         network with compartmental arrays.
@@ -34,21 +125,42 @@ class ContactNetwork():
         Parameters
         ----------
         G : `nx.Graph`
-            a NetworkX graph
+            a NetworkX graph. May be omitted if A is provided.
         fraction_infected : `float`
             portion of the population infected at initialization
             If not provided or provided with value 0, one node is selected
             to be infected.
         fraction_recovered : `float`
             portion of the population recovered at initialization
+        A : `scipy.sparse.spmatrix`
+            a symmetric (n, n) sparse adjacency matrix. Used in place of G.
+        labels : `numpy.ndarray`
+            the original label of each node index, if nodes were relabeled
+            (e.g. when reading an edge list)
+        weight : `str`
+            edge attribute of G holding edge weights (e.g. contact durations).
+            Edges without the attribute have weight 1. If None, all edges have
+            weight 1.
+
+        Raises
+        ------
+        ValueError: when neither G nor A is provided.
 
         Returns
         -------
         None
         """
-        self.A = nx.adjacency_matrix(G).todense()
-        self.n = len(self.A)
-        self.G = G
+        if G is not None:
+            import networkx as nx
+            self.A = sp.csr_matrix(nx.adjacency_matrix(G, weight=weight))
+        elif A is not None:
+            self.A = sp.csr_matrix(A)
+        else:
+            raise ValueError("A NetworkX graph or adjacency matrix is required.")
+        self.n = self.A.shape[0]
+        self._G = G
+        self.labels = labels
+        self.degrees = np.diff(self.A.indptr)
         self.Mo = None
         self.Im = None
         self.mo_thresh = None
@@ -71,10 +183,118 @@ class ContactNetwork():
         self.init_Su_In_Re()
         return None
 
-    def init_Su_In_Re(self):
+    @classmethod
+    def from_csr(
+            cls,
+            A: sp.spmatrix,
+            fraction_infected: float = 0,
+            fraction_recovered: float = 0,
+            labels: np.ndarray = None):
+        """Creates a contact network directly from a sparse adjacency matrix,
+        without building a NetworkX graph.
+
+        Parameters
+        ----------
+        A : `scipy.sparse.spmatrix`
+            a symmetric (n, n) sparse adjacency matrix
+        fraction_infected : `float`
+            portion of the population infected at initialization
+        fraction_recovered : `float`
+            portion of the population recovered at initialization
+        labels : `numpy.ndarray`
+            the original label of each node index
+
+        Returns
+        -------
+        network : `ContactNetwork`
+            the contact network
+        """
+        return cls(
+            fraction_infected = fraction_infected,
+            fraction_recovered = fraction_recovered,
+            A = A,
+            labels = labels)
+
+    @classmethod
+    def from_edgelist(
+            cls,
+            path: str,
+            fraction_infected: float = 0,
+            fraction_recovered: float = 0,
+            **kwargs):
+        """Creates a contact network by streaming a (possibly gzip-compressed)
+        edge-list or CSV file. Node labels are mapped to contiguous indices;
+        the original labels are kept in the labels attribute. See
+        edgelist.read_edgelist for the supported keyword arguments (delimiter,
+        columns, skip_header, comments, nodetype, weight_column, chunk_size,
+        tmpdir).
+
+        Parameters
+        ----------
+        path : `str`
+            path to the edge-list file
+        fraction_infected : `float`
+            portion of the population infected at initialization
+        fraction_recovered : `float`
+            portion of the population recovered at initialization
+
+        Returns
+        -------
+        network : `ContactNetwork`
+            the contact network
+        """
+        from contagion.edgelist import read_edgelist
+        A, labels = read_edgelist(path, **kwargs)
+        return cls.from_csr(
+            A,
+            fraction_infected = fraction_infected,
+            fraction_recovered = fraction_recovered,
+            labels = labels)
+
+    @property
+    def G(self):
+        """The NetworkX graph underlying the contact network. If the network
+        was created from an adjacency matrix, the graph is built on first
+        access.
+        """
+        if self._G is None:
+            import networkx as nx
+            if hasattr(nx, "from_scipy_sparse_array"):
+                self._G = nx.from_scipy_sparse_array(self.A)
+            else:
+                self._G = nx.from_scipy_sparse_matrix(self.A)
+        return self._G
+
+    @G.setter
+    def G(self, G):
+        self._G = G
+
+    def neighbors(self, i: int):
+        """Returns the neighbors of a node.
+
+        Parameters
+        ----------
+        i : `int`
+            a node index
+
+        Returns
+        -------
+        neighbors : `numpy.ndarray`
+            the indices of the node's neighbors
+        """
+        return self.A.indices[self.A.indptr[i]:self.A.indptr[i + 1]]
+
+    def init_Su_In_Re(self, rng = None):
         """Initializes susceptible, infected, and recovered arrays, ensuring
         there is no overlap/redundancy among them.
 
+        Parameters
+        ----------
+        rng : `numpy.random.Generator`
+            random number generator used to select the infected and recovered
+            nodes. Defaults to NumPy's global random state. Nodes are sampled
+            directly, without shuffling an array of every node.
+
         Initializes
         -----------
         susceptible : `numpy.ndarray`
@@ -88,27 +308,27 @@ class ContactNetwork():
         -------
         None
         """
-        infected_recovered = np.zeros(self.n)
-        infected_recovered[:round(self.fraction_infected*self.n)] = 1
-        infected_recovered[
-            round(self.fraction_infected*self.n):
-            round(
-                self.fraction_infected*self.n
-                + self.fraction_recovered*self.n)
-            ] = 2
-        np.random.shuffle(infected_recovered)
-        infected = np.array(
-            [1. if i == 1 else 0.
-                for i in infected_recovered]).reshape(self.n, 1)
-        recovered = np.array(
-            [1. if i == 2 else 0.
-                for i in infected_recovered]).reshape(self.n, 1)
-        susceptible = np.ones(self.n).reshape(self.n, 1) - infected - recovered
-        self.Su, self.In, self.Re = susceptible, infected, recovered
-        (self.og_Su, self.og_In, self.og_Re) = (
-            copy.deepcopy(susceptible),
-            copy.deepcopy(infected),
-            copy.deepcopy(recovered))
+        self.seed(seeding.by_fraction(
+            self.n, self.fraction_infected, self.fraction_recovered, rng))
+        return None
+
+    def seed(self, seeds):
+        """Initializes susceptible, infected, and recovered arrays from a seed
+        set, e.g. one drawn by a strategy of the seeding module. The seed set
+        also becomes the one restored by reset_Su_In_Re().
+
+        Parameters
+        ----------
+        seeds : `seeding.SeedSet`
+            the initially infected and recovered nodes
+
+        Returns
+        -------
+        None
+        """
+        self.Su, self.In, self.Re = seeds.to_arrays(self.n)
+        self.og_Su, self.og_In, self.og_Re = \
+            self.Su.copy(), self.In.copy(), self.Re.copy()
         return None
 
     def reset_Su_In_Re(self):
@@ -124,11 +344,55 @@ class ContactNetwork():
         None
         """
         self.Su, self.In, self.Re = \
-            copy.deepcopy(self.og_Su), \
-            copy.deepcopy(self.og_In), \
-            copy.deepcopy(self.og_Re)
+            self.og_Su.copy(), self.og_In.copy(), self.og_Re.copy()
         return None
 
+    def reorder_nodes(self, order = "rcm"):
+        """Relabels the nodes of the contact network to improve memory locality,
+        e.g. before partitioned simulation. The adjacency matrix, degrees,
+        compartmental arrays and immunization arrays are permuted
+        consistently, and the labels attribute records the original label (or
+        index) of each node. Any NetworkX graph is discarded and rebuilt from
+        the permuted adjacency matrix if needed.
+
+        Parameters
+        ----------
+        order : `str` or `numpy.ndarray`
+            either "rcm" (reverse Cuthill-McKee ordering) or a permutation of
+            the node indices, e.g. from an external graph partitioner, giving
+            the old index of each new node
+
+        Returns
+        -------
+        order : `numpy.ndarray`
+            the permutation applied
+
+        Raises
+        ------
+        ValueError: when order is not recognized or not a permutation.
+        """
+        if isinstance(order, str):
+            if order != "rcm":
+                raise ValueError("Invalid node ordering.")
+            from scipy.sparse import csgraph
+            order = csgraph.reverse_cuthill_mckee(self.A, symmetric_mode=True)
+        order = np.asarray(order)
+        if len(order) != self.n or \
+                not np.array_equal(np.sort(order), np.arange(self.n)):
+            raise ValueError("Node ordering must be a permutation.")
+
+        self.A = self.A[order][:, order].tocsr()
+        self.degrees = self.degrees[order]
+        self.labels = order.copy() if self.labels is None else self.labels[order]
+        self._G = None
+        for attr in [
+                "Su", "In", "Re", "og_Su", "og_In", "og_Re", "Im", "Mo", "Sy",
+                "EverTested", "NewPositiveTests"]:
+            arr = getattr(self, attr, None)
+            if arr is not None:
+                setattr(self, attr, arr[order])
+        return order
+
     def generate_random_walk(self, walk_length: int = 1):
         """Generates an unbiased random walk of a specified length along the
         nodes/edges of the contact network. Elements of the walk are node
@@ -144,11 +408,9 @@ class ContactNetwork():
         walk : `List`
             the node indices for the walk
         """
-        walk = [random.choice([g for g in self.G])]
+        walk = [random.randrange(self.n)]
         while len(walk) < walk_length:
-            walk.append(
-                random.choice(
-                    [n for n in self.G[walk[-1]]]))
+            walk.append(int(random.choice(self.neighbors(walk[-1]))))
         return walk
 
     def generate_random_walk_degree_sequence(self, walk_length: int = 1):
@@ -167,7 +429,7 @@ class ContactNetwork():
             the degree of each element of a random walk
         """
         walk = self.generate_random_walk(walk_length = walk_length)
-        degrees = [len(self.G[i]) for i in walk]
+        degrees = [int(self.degrees[i]) for i in walk]
         return degrees
 
     def immunize_network(
@@ -241,20 +503,35 @@ class Contagion():
             implement_testing: bool = False,
             testing_type: str = "random",
             test_rate: float = 0.,
-            contagion_type: str = "sir"):
+            contagion_type: str = "sir",
+            backend: str = "numpy",
+            partitions: int = None,
+            n_threads: int = None,
+            seed: int = None,
+            weighted_transmission: bool = False,
+            susceptibility: np.ndarray = None,
+            infectiousness: np.ndarray = None,
+            rates: dict = None,
+            scheduled_events: bool = False,
+            profile: bool = False,
+            observers: List = None,
+            compact_immune: bool = False,
+            campaign = None):
         """Constructor for the Contagion class.
 
         Parameters
         ----------
         network : `ContactNetwork`
             a specified contact network
-        beta : `float` or `List`
-            infection rate for susceptible nodes. A list (e.g.
-            [0.1, 0.1, 0.7, 0.7]) may be passed to implement variable
-            transmission rates. If the simulation time is longer than the length
-            of this list, the last rate in the list is maintained for the
-            remainder of the simulation.
-        gamma : `float`
+        beta : `float`, `List` or `numpy.ndarray`
+            infection rate for susceptible nodes. A list or 1-dimensional
+            array (e.g. [0.1, 0.1, 0.7, 0.7]) may be passed to implement
+            variable transmission rates, indexed by simulation step. If the
+            simulation time is longer than the length of this list, the last
+            rate in the list is maintained for the remainder of the simulation.
+            An (n, 1) array gives a per-node rate. The same forms are accepted
+            by gamma, psi and omega.
+        gamma : `float`, `List` or `numpy.ndarray`
             recovery rate for an infected node
         save_history : `bool`
             describes whether to save susceptible, infected, and recovered
@@ -262,14 +539,15 @@ class Contagion():
         track_symptomatic : `bool`
             describes whether to simulate the emergence of symptoms for
             modeling testing
-        psi : `float`
+        psi : `float`, `List` or `numpy.ndarray`
             the rate at which infected nodes become symptomatic
-        omega : `float` or `tuple`
+        omega : `float`, `List`, `numpy.ndarray` or `tuple`
             handles 'duration of immunity.' omega is the rate at which recovered
             nodes become susceptible again. if a tuple is passed, the first
             element refers to the re-susceptibility rate of "natural" recoveries
             (from the virus), whereas the second element refers to the
-            re-susceptibility rate from immunization
+            re-susceptibility rate from immunization. Each element of the tuple
+            may be a float or an (n, 1) array.
         implement_testing : `bool`
             describes whether to simulate testing of the symptomatic
             population
@@ -278,8 +556,86 @@ class Contagion():
         test_rate : `float`
             portion(s) of nodes from population to test randomly. Can be
             float or tuple.
-        contagion_type : `str`
-            area for future development. currently must be "sir"
+        contagion_type : `str` or `models.CompartmentModel`
+            the compartment model: "sir" (the default), one of the built-in
+            models "seir", "sis", "seirs" or "sird", or a user-defined
+            models.CompartmentModel. Models other than "sir" run on the
+            table-driven engine, which uses per-contact transmission (as with
+            weighted_transmission) and does not support symptoms, testing,
+            partial-efficacy vaccination, partitions or the numba backend.
+        backend : `str`
+            either "numpy" or "numba". The "numba" backend advances all nodes
+            through each step in a single compiled pass; it falls back to
+            "numpy" (with a warning) if Numba is not installed.
+        partitions : `int`
+            if provided, the adjacency matrix is split into this many row
+            blocks of roughly equal numbers of edges, and each step is carried
+            out block by block on a thread pool, with one random number stream
+            per block. Results depend on the number of partitions and the
+            seed, but not on the number of threads.
+        n_threads : `int`
+            number of worker threads for partitioned stepping. Defaults to
+            the number of partitions.
+        seed : `int`
+            seed for the simulation's random number generator. If not
+            provided, NumPy's global random state is used.
+        weighted_transmission : `bool`
+            if True, each contact with an infected neighbor transmits
+            independently, and an edge of weight w (e.g. contact duration)
+            transmits with probability 1 - (1 - beta)**w. A susceptible node
+            is then infected with probability 1 - prod(1 - p_e) over its
+            infected contacts. Otherwise, the count of infected neighbors is
+            scaled by a single uniform draw and compared with beta. On a
+            layers.MultiLayerNetwork, the weights of each layer's edges are
+            scaled by the layer's multiplier at the current step.
+        susceptibility : `numpy.ndarray`
+            an optional (n, 1) array of non-negative relative susceptibilities,
+            scaling each node's chance of being infected
+        infectiousness : `numpy.ndarray`
+            an optional (n, 1) array of non-negative relative
+            infectiousnesses, scaling each infected node's contribution to its
+            neighbors' infection pressure
+        rates : `dict`
+            additional rates used by compartment models, e.g. {"sigma": 0.2}
+            for the SEIR incubation rate or {"mu": 0.01} for the SIRD death
+            rate. Each rate accepts the same forms as beta.
+        scheduled_events : `bool`
+            if True, each node's recovery, symptom onset and waning of
+            immunity are drawn once, as geometrically distributed delays, when
+            the node enters the corresponding compartment, and are filed in
+            per-step queues; each step then only visits the nodes whose events
+            fall due. The outcome has the same distribution as per-step
+            draws, except that symptomatic nodes leave the symptomatic record
+            when they recover. Requires the numpy backend, the SIR model,
+            time-constant gamma, psi and omega, and full-efficacy vaccination.
+        profile : `bool`
+            if True, the wall time, call count and allocated bytes of each
+            phase of simulate_step() are recorded by a profiling.Profiler,
+            available as the profiler attribute. Profiling may also be
+            switched on by setting that attribute, or for a block of code with
+            a profiling.Profiler used as a context manager.
+        observers : `List`
+            observers.Observer instances to be called after every step; see
+            add_observer()
+        compact_immune : `bool`
+            if True, once full-efficacy vaccination takes effect, nodes that
+            are permanently immune (and not infected or symptomatic) are
+            dropped from the simulation: network becomes a compacted network
+            over the remaining nodes, with the induced adjacency matrix, and
+            node_index maps its nodes to those of the original network,
+            available as full_network. Histories still count every node, and
+            the original network's arrays are brought up to date by
+            expand_network(), which run_simulation() calls when it finishes.
+            Observers see the compacted network; GroupFractions and
+            monitoring.FirstInfection report on the original nodes. Requires
+            the numpy backend and the SIR model, without partitions,
+            scheduled events, testing or re-susceptibility of immunized
+            nodes.
+        campaign : `campaigns.Campaign`
+            a rolling vaccination campaign, which gives its doses at the start
+            of each step. Requires the numpy backend and the SIR model,
+            without partitions, and a network without vaccination by
+            immunize_network().
 
         Returns
         -------
@@ -288,43 +644,149 @@ class Contagion():
         self.network = network
         self.save_history = save_history
         self.track_symptomatic = track_symptomatic
+        self.profiler = profiling.Profiler() if profile else None
         self.implement_testing = implement_testing
         self.test_rate = test_rate
 
-        if contagion_type.lower() not in ["sir"]:
-            raise ValueError("Invalid contagion type provided.")
+        if isinstance(contagion_type, models.CompartmentModel):
+            self.model = contagion_type
+            self.contagion_type = contagion_type.name
+        elif contagion_type.lower() == "sir":
+            self.model = None
+            self.contagion_type = "sir"
         else:
+            self.model = models.get_model(contagion_type)
             self.contagion_type = contagion_type.lower()
 
-        if 0. <= gamma <= 1.:
-            # recovery rate for an infected node
-            self.gamma = gamma
+        if backend == "numba" and not _have_numba():
+            warnings.warn(
+                "Numba is not installed; falling back to the numpy backend.")
+            backend = "numpy"
+        if backend not in ["numpy", "numba"]:
+            raise ValueError("Invalid backend provided.")
+        self.backend = backend
+
+        self.weighted_transmission = weighted_transmission
+        # multi-layer and temporal networks compute their own infection
+        # pressure, from their layers or current snapshot
+        self._dynamic = hasattr(network, "pressure")
+        if hasattr(network, "layers"):
+            edge_weights = [layer.A.data for layer in network.layers]
         else:
-            raise ValueError('Gamma must be between 0 and 1.')
-
-        if isinstance(beta, (float, int)) and 0. <= beta <= 1.:
-            # infection rate for susceptible nodes
-            self.beta_queue = []
-            self.beta = beta
-        elif isinstance(beta, list) \
-                and [0. <= i <= 1. for i in beta] == [True]*len(beta):
-            self.beta_queue = beta[1:]
-            self.beta = beta[0]
-        else:
-            raise ValueError('Transmission rates must be between 0 and 1.')
+            edge_weights = [] if self._dynamic else [network.A.data]
+        if weighted_transmission and any(np.any(w < 0) for w in edge_weights):
+            raise ValueError("Edge weights must be non-negative.")
+        if self._dynamic and (backend != "numpy" or partitions is not None):
+            raise ValueError(
+                "Multi-layer and temporal networks require the numpy backend "
+                "without partitions.")
+        self._log_survival = None
+        self._log_survival_beta = None
 
-        if isinstance(omega, (float, int)) and 0. <= omega <= 1.:
-            self.omega = omega
-        elif isinstance(omega, tuple) and len(omega) == 2:
-            self.omega = omega
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
         else:
-            raise ValueError('Duration of immunity specified incorrectly.')
-
-        if 0. <= psi <= 1.:
-            # the rate at which infected nodes become symptomatic
-            self.psi = psi
+            self.rng = np.random
+
+        self.partitions = partitions
+        self.n_threads = n_threads
+        if partitions is not None:
+            if backend != "numpy":
+                raise ValueError(
+                    "Partitioned stepping requires the numpy backend.")
+            if implement_testing and testing_type == "contact":
+                raise ValueError(
+                    "Partitioned stepping does not support contact tracing.")
+            self._init_partitions(seed)
+
+        # rates may be scalars, per-node (n, 1) arrays, or step-indexed
+        # schedules, which are looked up (not consumed) at each step
+        self.t = 0
+        self._schedules = {}
+        # recovery rate for an infected node
+        self.gamma = self._parse_rate(
+            "gamma", gamma, 'Gamma must be between 0 and 1.')
+        # infection rate for susceptible nodes
+        self.beta = self._parse_rate(
+            "beta", beta, 'Transmission rates must be between 0 and 1.')
+        if isinstance(omega, tuple) and len(omega) == 2:
+            self.omega = tuple(
+                self._parse_rate(
+                    None, o, 'Duration of immunity specified incorrectly.')
+                for o in omega)
         else:
-            raise ValueError('Psi must be between 0 and 1.')
+            self.omega = self._parse_rate(
+                "omega", omega, 'Duration of immunity specified incorrectly.')
+        # the rate at which infected nodes become symptomatic
+        self.psi = self._parse_rate("psi", psi, 'Psi must be between 0 and 1.')
+
+        self.susceptibility = self._parse_node_factor(
+            susceptibility, "susceptibility")
+        self.infectiousness = self._parse_node_factor(
+            infectiousness, "infectiousness")
+
+        heterogeneous = any(
+            isinstance(r, np.ndarray)
+            for r in [self.beta, self.gamma, self.psi, self.susceptibility,
+                self.infectiousness]
+                + list(self.omega if isinstance(self.omega, tuple) else [self.omega]))
+        if heterogeneous and self.backend == "numba":
+            raise ValueError(
+                "The numba backend does not support per-node rates.")
+
+        self.model_rates = {}
+        for name, rate in (rates or {}).items():
+            self.model_rates[name] = self._parse_rate(
+                name, rate, 'Rates must be between 0 and 1.')
+        if self.model is not None:
+            self._init_model()
+
+        self.scheduled_events = scheduled_events
+        self._event_due = None
+        self.compact_immune = compact_immune
+        self.full_network = None
+        self.node_index = None
+        # compartment counts of the nodes dropped by compaction
+        self._removed = {"Su": 0., "Re": 0.}
+        self.campaign = campaign
+        if campaign is not None:
+            if self.model is not None or backend != "numpy" \
+                    or partitions is not None or compact_immune \
+                    or network.im_type == "vaccinate":
+                raise ValueError(
+                    "Campaigns require the numpy backend and the SIR model, "
+                    "without partitions, compaction or vaccination by "
+                    "immunize_network().")
+            campaign.reset()
+        if compact_immune:
+            if self.model is not None or backend != "numpy" \
+                    or partitions is not None or scheduled_events \
+                    or implement_testing or self._dynamic:
+                raise ValueError(
+                    "Compaction requires the numpy backend and the SIR model, "
+                    "without partitions, scheduled events, testing, or "
+                    "multi-layer or temporal networks.")
+            if network.im_type != "vaccinate" or network.efficacy != 1 \
+                    or (isinstance(self.omega, tuple)
+                        and not _is_zero(self.omega[1])):
+                raise ValueError(
+                    "Compaction requires full-efficacy vaccination with "
+                    "permanent immunity.")
+        if scheduled_events:
+            if self.model is not None or backend != "numpy" \
+                    or partitions is not None:
+                raise ValueError(
+                    "Scheduled events require the numpy backend and the SIR "
+                    "model.")
+            if any(r in self._schedules for r in ["gamma", "psi", "omega"]):
+                raise ValueError(
+                    "Scheduled events require time-constant gamma, psi and "
+                    "omega.")
+
+        # waning immunity and scheduled events write to Im, so read-only
+        # arrays (e.g. views of a SharedNetwork) are replaced by a private copy
+        if self.network.Im is not None and not self.network.Im.flags.writeable:
+            self.network.Im = self.network.Im.copy()
 
         self.new_transmissions = np.zeros((self.network.n, 1))
         self.new_recoveries = np.zeros((self.network.n, 1))
@@ -344,8 +806,209 @@ class Contagion():
 
         if save_history:
             self.init_histories()
+
+        self.observers = []
+        self.stop_requested = False
+        for observer in observers or []:
+            self.add_observer(observer)
+        return None
+
+    def add_observer(self, observer):
+        """Adds an observer, which is called after every simulation step with
+        the step's new transmissions, recoveries, symptomatic nodes and
+        positive tests. An observer may request that run_simulation() stops.
+
+        Parameters
+        ----------
+        observer : `observers.Observer`
+            the observer
+
+        Returns
+        -------
+        observer : `observers.Observer`
+            the observer
+        """
+        observer.start(self)
+        self.observers.append(observer)
+        return observer
+
+    def _notify_observers(self):
+        """Helper function for simulate_step(). Calls each observer with the
+        step's records, and notes any request to stop.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        deltas = {
+            "new_transmissions": self.new_transmissions,
+            "new_recoveries": self.new_recoveries,
+            "new_symptomatic": getattr(self, "new_symptomatic", None)
+                if self.track_symptomatic else None,
+            "new_tested": self.new_tested if self.implement_testing else None,
+            "NewPositiveTests": self.network.NewPositiveTests
+                if self.implement_testing else None}
+        for observer in self.observers:
+            if observer.observe(self, self.t, deltas):
+                self.stop_requested = True
+        return None
+
+    def _parse_rate(self, name, rate, message):
+        """Helper function for the constructor. Validates a rate, which may be a
+        scalar, a per-node (n, 1) array, or a step-indexed schedule (a list or
+        1-dimensional array), and registers schedules for lookup by
+        _advance_step().
+
+        Parameters
+        ----------
+        name : `str`
+            attribute name of the rate, or None if schedules are not accepted
+        rate : `float`, `List` or `numpy.ndarray`
+            the rate
+        message : `str`
+            error message for invalid rates
+
+        Returns
+        -------
+        rate : `float` or `numpy.ndarray`
+            the rate at the first simulation step
+
+        Raises
+        ------
+        ValueError: when the rate is invalid.
+        """
+        if isinstance(rate, (float, int, np.floating, np.integer)) \
+                and not isinstance(rate, bool):
+            values = np.array([rate], dtype=float)
+        elif isinstance(rate, np.ndarray) and rate.shape == (self.network.n, 1):
+            values = rate.astype(float)
+        elif isinstance(rate, (list, np.ndarray)) and name is not None \
+                and len(rate) > 0 and np.ndim(rate) == 1:
+            values = np.asarray(rate, dtype=float)
+            self._schedules[name] = values
+        else:
+            raise ValueError(message)
+        if not np.all((0. <= values) & (values <= 1.)):
+            raise ValueError(message)
+        if isinstance(rate, np.ndarray) and rate.ndim == 2:
+            return values
+        return values[0] if np.ndim(rate) == 1 else rate
+
+    def _parse_node_factor(self, factor, name):
+        """Helper function for the constructor. Validates a per-node
+        susceptibility or infectiousness array.
+
+        Parameters
+        ----------
+        factor : `numpy.ndarray`
+            an (n, 1) array of non-negative values, or None
+        name : `str`
+            name of the factor, for error messages
+
+        Returns
+        -------
+        factor : `numpy.ndarray`
+            the validated array, or None
+
+        Raises
+        ------
+        ValueError: when the array has the wrong dimensions or negative values.
+        """
+        if factor is None:
+            return None
+        factor = np.asarray(factor, dtype=float)
+        if factor.shape != (self.network.n, 1) or np.any(factor < 0):
+            raise ValueError(
+                "{} must be a non-negative (n, 1) array.".format(
+                    name.capitalize()))
+        return factor
+
+    @property
+    def beta_queue(self):
+        """The transmission rates scheduled for the steps after the current
+        one.
+        """
+        if "beta" not in self._schedules:
+            return []
+        return self._schedules["beta"][self.t + 1:].tolist()
+
+    def _advance_step(self):
+        """Advances the step index, and looks up the value of every scheduled
+        rate for the next step.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        return self._set_step(self.t + 1)
+
+    def _set_step(self, t):
+        """Sets the step index, and looks up the value of every scheduled rate
+        for that step.
+
+        Parameters
+        ----------
+        t : `int`
+            the step index
+
+        Returns
+        -------
+        None
+        """
+        self.t = t
+        for name, schedule in self._schedules.items():
+            value = schedule[min(self.t, len(schedule) - 1)]
+            if name in self.model_rates:
+                self.model_rates[name] = value
+            else:
+                setattr(self, name, value)
         return None
 
+    def _infected_pressure_source(self):
+        """Returns the infected record weighted by infectiousness, for use as
+        the right-hand side of infection-pressure matrix-vector products.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        In : `numpy.ndarray`
+            the (n, 1) infectiousness-weighted infected record
+        """
+        if self.infectiousness is None:
+            return self.network.In
+        return self.network.In*self.infectiousness
+
+    def _pressure(self, x):
+        """Returns the infection pressure A @ x. For a multi-layer network, this
+        is the sum of the open layers' products, weighted by their
+        multipliers at the current step; for a temporal network, A is the
+        current step's snapshot.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            the (n, 1) or (n,) infectiousness-weighted infected record
+
+        Returns
+        -------
+        pressure : `numpy.ndarray`
+            the pressure on each node
+        """
+        if self._dynamic:
+            return self.network.pressure(x, self.t)
+        return self.network.A @ x
+
     def init_histories(self):
         """Initializes history tracking for susceptible, infected, recovered,
         and (if paramaterized) symptomatic and tested nodes.
@@ -358,6 +1021,9 @@ class Contagion():
         -------
         None
         """
+        if self.model is not None:
+            return self._init_model_histories()
+
         self.Su_hist = [np.sum(self.network.Su)]
         self.In_hist = [np.sum(self.network.In)]
         self.Re_hist = [np.sum(self.network.Re)]
@@ -375,7 +1041,7 @@ class Contagion():
         """
         """
         if self.network.im_type == "vaccinate" and 0 < self.network.efficacy < 1:
-            random_arr = np.random.rand(self.network.n, 1)
+            random_arr = self.rng.random((self.network.n, 1))
             Im_random_filter = np.multiply(self.network.Im, random_arr)
             Im_random_filter = np.where(
                 (0 < Im_random_filter)
@@ -398,24 +1064,82 @@ class Contagion():
         new_transmissions : `np.ndarray`
             an array describing if nodes are new transmissions
         """
+        if self.weighted_transmission:
+            return self._get_new_transmissions_weighted()
+
         # calculate neighbors of infected nodes
         new_transmissions = np.multiply(
-                                np.matmul(
-                                    self.network.A,
-                                    self.network.In),
+                                self._pressure(self._infected_pressure_source()),
                                 self.network.Su)
         # random transmission opportunities
-        random_arr = np.random.rand(self.network.n, 1)
+        random_arr = self.rng.random((self.network.n, 1))
         new_transmissions = np.multiply(new_transmissions, random_arr)
         # filter with beta
+        beta = self.beta if self.susceptibility is None \
+            else self.beta*self.susceptibility
         new_transmissions = np.where(
             (0 < new_transmissions)
-            & (new_transmissions <= self.beta)
+            & (new_transmissions <= beta)
             & (self.network.Re == 0.), 1., 0.)
+        return new_transmissions
+
+    def _get_log_survival(self):
+        """Helper function for _get_new_transmissions_weighted(). Returns the
+        adjacency matrix with each edge's weight w replaced by the log of its
+        probability of not transmitting, w*log(1 - beta). A per-node beta
+        applies to the receiving node (the row). The matrix is rebuilt only
+        when beta changes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        log_survival : `scipy.sparse.csr_matrix`
+            the (n, n) log-survival matrix
+        """
+        if self._log_survival is None \
+                or not np.array_equal(self._log_survival_beta, self.beta):
+            if self._log_survival is None:
+                self._log_survival = self.network.A.astype(float)
+            log_survival = _log1m(self.beta)
+            if isinstance(log_survival, np.ndarray):
+                log_survival = np.repeat(
+                    log_survival.ravel(), np.diff(self.network.A.indptr))
+            self._log_survival.data = self.network.A.data*log_survival
+            self._log_survival_beta = self.beta
+        return self._log_survival
+
+    def _get_new_transmissions_weighted(self):
+        """Helper function for get_new_transmissions(). Calculates new
+        infections with independent, weighted per-contact transmission: the
+        log-probability of escaping infection is a single sparse
+        matrix-vector product with the log-survival matrix.
+
+        Parameters
+        ----------
+        None
 
-        if self.beta_queue:
-            self.beta = self.beta_queue[0]
-            self.beta_queue = self.beta_queue[1:]
+        Returns
+        -------
+        new_transmissions : `np.ndarray`
+            an array describing if nodes are new transmissions
+        """
+        if self._dynamic:
+            log_survival = _log1m(self.beta)*self._pressure(
+                self._infected_pressure_source())
+        else:
+            log_survival = \
+                self._get_log_survival() @ self._infected_pressure_source()
+        if self.susceptibility is not None:
+            log_survival *= self.susceptibility
+        infection_prob = -np.expm1(log_survival)
+        random_arr = self.rng.random((self.network.n, 1))
+        new_transmissions = np.where(
+            (random_arr < infection_prob)
+            & (self.network.Su > 0)
+            & (self.network.Re == 0.), 1., 0.)
         return new_transmissions
 
     def get_new_recoveries(self):
@@ -431,7 +1155,7 @@ class Contagion():
             an array describing if nodes are new recoveries
         """
         # random recovery opportunities
-        random_arr = np.random.rand(self.network.n, 1)
+        random_arr = self.rng.random((self.network.n, 1))
         new_recoveries = np.multiply(self.network.In, random_arr)
         # filter with gamma
         new_recoveries = np.where(
@@ -451,7 +1175,7 @@ class Contagion():
             an array describing if nodes are newly-symptomatic nodes
         """
         asymptomatic_infected = self.network.In - self.network.Sy
-        random_arr = np.random.rand(self.network.n, 1)
+        random_arr = self.rng.random((self.network.n, 1))
         new_symptomatic = np.multiply(asymptomatic_infected, random_arr)
         new_symptomatic = np.where(
             (0 < new_symptomatic) & (new_symptomatic <= self.psi), 1., 0.)
@@ -477,7 +1201,7 @@ class Contagion():
         if type(self.test_rate) is float:
             # if only one test rate is passed, interpret it as a naive
             # probability of any node being tested
-            random_arr = np.random.rand(self.network.n, 1)
+            random_arr = self.rng.random((self.network.n, 1))
             new_tested = np.where(random_arr <= self.test_rate, 1., 0.)
         elif type(self.test_rate) is tuple:
             # if multiple test rates are passed, we specify different groups of
@@ -485,7 +1209,7 @@ class Contagion():
             if len(self.test_rate) == 2:
                 # interpret as (asymptomatic test rate, symptomatic test rate)
                 # assumes recovered nodes do not get re-tested
-                random_arr = np.random.rand(self.network.n, 1)
+                random_arr = self.rng.random((self.network.n, 1))
                 # asymptomatics are individuals who are neither symptomatic
                 # nor recovered
                 asym = np.ones(
@@ -606,7 +1330,7 @@ class Contagion():
         """
         self.network.Su -= self.new_transmissions
         if self.save_history:
-            self.Su_hist.append(np.sum(self.network.Su))
+            self.Su_hist.append(np.sum(self.network.Su) + self._removed["Su"])
         return None
 
     def update_In(self):
@@ -646,10 +1370,10 @@ class Contagion():
             self.network.Re += self.new_recoveries
             self.network.Re = np.where(self.network.Re > 0, 1., 0.)
 
-            if self.omega != 0:
-                random_arr = np.random.rand(self.network.n, 1)
+            if not _is_zero(self.omega):
+                random_arr = self.rng.random((self.network.n, 1))
 
-                if isinstance(self.omega, (int, float)):
+                if not isinstance(self.omega, tuple):
                     if self.network.im_type == "vaccinate":
                         Re_to_Su = np.where(
                             (self.network.Re > 0) \
@@ -665,7 +1389,7 @@ class Contagion():
                             0.)
                     self.network.Re -= Re_to_Su
                     self.network.Su += Re_to_Su
-                elif isinstance(self.omega, tuple):
+                else:
                     # if True, then self.network.im_type == "vaccinate":
                     Re_to_Su = np.where(
                         (self.network.Re > 0) \
@@ -673,7 +1397,7 @@ class Contagion():
                             & (self.network.Im == 0),
                         1.,
                         0.)
-                    random_arr = np.random.rand(self.network.n, 1)
+                    random_arr = self.rng.random((self.network.n, 1))
                     Im_to_Su = np.where(
                         (self.network.Im > 0) \
                             & (random_arr <= self.omega[1]),
@@ -684,12 +1408,9 @@ class Contagion():
                     self.network.Su += Re_to_Su + Im_to_Su
 
                     self.network.Im = np.where(self.network.Im > 0, 1., 0.)
-                else:
-                    raise ValueError(
-                        'Duration of immunity specified incorrectly.')
 
             if self.save_history:
-                self.Re_hist.append(np.sum(self.network.Re))
+                self.Re_hist.append(np.sum(self.network.Re) + self._removed["Re"])
         else:
             raise ValueError("Invalid contagion type.")
 
@@ -742,9 +1463,29 @@ class Contagion():
         li : `List`
             list of new nodes for the contact queue
         """
-        contact_arr = np.dot(self.network.A, self.network.NewPositiveTests)
+        contact_arr = self._pressure(self.network.NewPositiveTests)
         return [i for i in range(self.network.n) if contact_arr[i] > 0]
 
+    def _phase(self, name):
+        """Returns a context manager timing a phase of the simulation with the
+        simulation's profiler, or else the active profiler. If profiling is
+        disabled, the phase records nothing.
+
+        Parameters
+        ----------
+        name : `str`
+            name of the phase
+
+        Returns
+        -------
+        phase : context manager
+            the phase
+        """
+        profiler = self.profiler or profiling.active()
+        if profiler is None:
+            return profiling.NULL_PHASE
+        return profiler.phase(name)
+
     def simulate_step(self):
         """Iterates a single simulation time step, updating susceptible,
         infected, and recovered records with new transmissions and recoveries.
@@ -758,81 +1499,1054 @@ class Contagion():
         -------
         None
         """
-        if self.network.im_type == "vaccinate" \
-                and self.network.efficacy == 1 \
-                and len(self.In_hist) - 1 == self.network.im_starts_after:
-            self.network.Re += self.network.Im
-            self.network.Re = np.where(self.network.Re > 0, 1., 0.)
+        with self._phase("simulate_step"):
+            if self.model is not None:
+                self._simulate_step_model()
+            elif self.backend == "numba":
+                self._simulate_step_fused()
+            elif self.partitions is not None:
+                self._simulate_step_partitioned()
+            elif self.scheduled_events:
+                self._simulate_step_scheduled()
+            else:
+                self._simulate_step_numpy()
+            if self.observers:
+                with self._phase("observers"):
+                    self._notify_observers()
+        return None
 
-        if self.network.im_type == "vaccinate" \
-                and 0 < self.network.efficacy < 1 \
-                and len(self.In_hist) - 1 >= self.network.im_starts_after:
-            if len(self.In_hist) - 1 > self.network.im_starts_after:
-                self.network.Re -= self.Im_this_step
-            self.network.Re = np.where(self.network.Re >  0, 1., 0.)
-            self.Im_this_step = self.get_Im_random_filter()
-            self.network.Re += self.Im_this_step
-            self.network.Re = np.where(self.network.Re > 0, 1., 0.)
+    def _simulate_step_numpy(self):
+        """Helper function for simulate_step(). Iterates a single simulation
+        time step with whole-network array operations.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        with self._phase("vaccination"):
+            if self.network.im_type == "vaccinate" \
+                    and self.network.efficacy == 1 \
+                    and self.t == self.network.im_starts_after:
+                self.network.Re += self.network.Im
+                self.network.Re = np.where(self.network.Re > 0, 1., 0.)
+                if self.compact_immune:
+                    self._compact_network()
+
+            if self.campaign is not None:
+                self.campaign.step(self)
+
+            if self.network.im_type == "vaccinate" \
+                    and 0 < self.network.efficacy < 1 \
+                    and self.t >= self.network.im_starts_after:
+                if self.t > self.network.im_starts_after:
+                    self.network.Re -= self.Im_this_step
+                self.network.Re = np.where(self.network.Re >  0, 1., 0.)
+                self.Im_this_step = self.get_Im_random_filter()
+                self.network.Re += self.Im_this_step
+                self.network.Re = np.where(self.network.Re > 0, 1., 0.)
 
         # update new records
-        self.new_transmissions = self.get_new_transmissions()
-        self.new_recoveries = self.get_new_recoveries()
+        with self._phase("transmission") as phase:
+            self.new_transmissions = self.get_new_transmissions()
+            phase.allocated(self.new_transmissions)
+        with self._phase("recovery") as phase:
+            self.new_recoveries = self.get_new_recoveries()
+            phase.allocated(self.new_recoveries)
 
         if self.track_symptomatic:
-            self.new_symptomatic = self.get_new_symptomatic()
+            with self._phase("symptoms") as phase:
+                self.new_symptomatic = self.get_new_symptomatic()
+                phase.allocated(self.new_symptomatic)
 
         if self.implement_testing:
-            self.new_tested, self.new_ever_tested = self.get_new_tested()
-            self.network.NewPositiveTests = self.get_new_testedpositive()
+            with self._phase("testing") as phase:
+                self.new_tested, self.new_ever_tested = self.get_new_tested()
+                self.network.NewPositiveTests = self.get_new_testedpositive()
+                phase.allocated(
+                    self.new_tested,
+                    self.new_ever_tested,
+                    self.network.NewPositiveTests)
 
             if self.testing_type == "contact":
-                self.contact_queue += self._get_new_contact_queue()
+                with self._phase("tracing"):
+                    self.contact_queue += self._get_new_contact_queue()
         # update historical records
-        self.update_Su()
-        self.update_In()
-        self.update_Re()
-        if self.track_symptomatic:
-            self.update_Sy()
-        if self.implement_testing:
-            self.update_EverTested()
-            self.NewPositiveTests_hist.append(
-                np.sum(self.network.NewPositiveTests))
+        with self._phase("update"):
+            self.update_Su()
+            self.update_In()
+            self.update_Re()
+            if self.track_symptomatic:
+                self.update_Sy()
+            if self.implement_testing:
+                self.update_EverTested()
+                if self.save_history:
+                    self.NewPositiveTests_hist.append(
+                        np.sum(self.network.NewPositiveTests))
+        self._advance_step()
         return None
 
-    def run_simulation(self, steps: float = np.inf):
-        """Runs a contagion simulation for the specified number of steps. If
-        step count is not provided, runs until infectivity subsides.
+    def _init_model(self):
+        """Helper function for the constructor. Compiles the compartment model
+        and initializes each node's integer state code from the network's
+        susceptible, infected and recovered arrays.
 
-        Paramaters
+        Parameters
         ----------
-        steps : `float`
-            number of simulation steps to run.
+        None
 
         Returns
         -------
         None
+
+        Raises
+        ------
+        ValueError: when the model requires an unavailable rate or feature.
         """
-        # turn histories on
-        if not self.save_history:
-            self.init_histories()
-            self.save_history = True
-        # run simulation
-        i = 0
-        while i < steps:
-            if len(self.In_hist) > 5 and \
-                    (self.In_hist[-1] == 0 or self.In_hist[-1] == self.network.n):
-                break
-            self.simulate_step()
-            i += 1
+        model = self.model
+        if self.track_symptomatic or self.implement_testing:
+            raise ValueError(
+                "Compartment models do not support symptoms or testing.")
+        if self.backend != "numpy" or self.partitions is not None:
+            raise ValueError(
+                "Compartment models require the numpy backend without "
+                "partitions.")
+        if isinstance(self.omega, tuple):
+            raise ValueError(
+                "Compartment models take a single omega rate.")
+        if self.network.im_type == "vaccinate" \
+                and (self.network.efficacy != 1 or model.recovered is None):
+            raise ValueError(
+                "Compartment models support full-efficacy vaccination into a "
+                "recovered compartment only.")
+        for name in model.rate_names():
+            if name not in ["beta", "gamma", "psi", "omega"] \
+                    and name not in self.model_rates:
+                raise ValueError(
+                    "Rate '{}' required by the {} model was not provided.".format(
+                        name, model.name))
+
+        self._compiled_model = model.compile()
+        self._model_infected = np.isin(
+            np.arange(len(model.compartments)),
+            [model.codes[c] for c in model.infected])
+        net = self.network
+        state = np.full(net.n, model.codes[model.susceptible], dtype=np.int8)
+        state[net.In.ravel() > 0] = model.codes[model.seed]
+        if np.any(net.Re > 0):
+            if model.recovered is None:
+                raise ValueError(
+                    "The {} model has no recovered compartment.".format(
+                        model.name))
+            state[net.Re.ravel() > 0] = model.codes[model.recovered]
+        net.state = state
         return None
 
-    def run_simulation_get_max_infected(self, steps: float = np.inf):
-        """Runs a contagion simulation and returns the maximum number of
-        infected individuals at any step.
+    def _model_rate(self, rate):
+        """Helper function for _simulate_step_model(). Returns the current
+        value of a compartment model's transition rate.
 
         Parameters
         ----------
-        steps : `float`
+        rate : `str` or `float`
+            a rate name or constant
+
+        Returns
+        -------
+        rate : `float` or `numpy.ndarray`
+            the current rate, as a scalar or an (n,) per-node array
+        """
+        if not isinstance(rate, str):
+            return rate
+        if rate in self.model_rates:
+            value = self.model_rates[rate]
+        else:
+            value = getattr(self, rate)
+        if isinstance(value, np.ndarray):
+            return value.ravel()
+        return value
+
+    def _init_model_histories(self):
+        """Helper function for init_histories(). Initializes per-compartment
+        histories, along with susceptible, infected and recovered totals.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        counts = np.bincount(
+            self.network.state, minlength=len(self.model.compartments))
+        self.hist = {
+            c: [counts[k]] for k, c in enumerate(self.model.compartments)}
+        self.Su_hist, self.In_hist, self.Re_hist = [], [], []
+        self._append_model_histories(counts)
+        return None
+
+    def _append_model_histories(self, counts):
+        """Helper function for _simulate_step_model(). Records compartment
+        counts, and the susceptible, infected and recovered totals.
+
+        Parameters
+        ----------
+        counts : `numpy.ndarray`
+            the number of nodes in each compartment
+
+        Returns
+        -------
+        None
+        """
+        model = self.model
+        self.Su_hist.append(counts[model.codes[model.susceptible]])
+        self.In_hist.append(np.sum(counts[self._model_infected]))
+        self.Re_hist.append(
+            counts[model.codes[model.recovered]]
+            if model.recovered is not None else 0)
+        return None
+
+    def _simulate_step_model(self):
+        """Helper function for simulate_step(). Iterates a single simulation
+        time step of a compartment model. Each node draws one uniform number,
+        which selects among the transitions out of its compartment according
+        to their cumulative probabilities; network-driven transitions take
+        their probability from one sparse matrix-vector product of infection
+        pressure.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        net = self.network
+        n = net.n
+        model = self.model
+        state = net.state
+
+        if net.im_type == "vaccinate" \
+                and self.t == net.im_starts_after:
+            vaccinated = (net.Im.ravel() > 0) \
+                & (state == model.codes[model.susceptible])
+            state[vaccinated] = model.codes[model.recovered]
+
+        random_arr = self.rng.random(n)
+        new_state = state.copy()
+        cumulative = np.zeros(n)
+        new_transmissions = np.zeros(n, dtype=bool)
+        for source, target, rate, weights in self._compiled_model:
+            in_source = state == source
+            rate = self._model_rate(rate)
+            if weights is None:
+                prob = np.where(in_source, rate, 0.)
+            else:
+                pressure_source = weights[state]
+                if self.infectiousness is not None:
+                    pressure_source = pressure_source*self.infectiousness.ravel()
+                log_survival = self._pressure(pressure_source)*_log1m(rate)
+                if self.susceptibility is not None:
+                    log_survival *= self.susceptibility.ravel()
+                prob = np.where(in_source, -np.expm1(log_survival), 0.)
+            upper = cumulative + prob
+            fire = in_source & (random_arr >= cumulative) & (random_arr < upper)
+            new_state[fire] = target
+            if weights is not None:
+                new_transmissions |= fire
+            cumulative = upper
+        net.state = new_state
+
+        self.new_transmissions = new_transmissions.reshape(n, 1).astype(float)
+        self.new_recoveries = (
+            self._model_infected[state]
+            & ~self._model_infected[new_state]).reshape(n, 1).astype(float)
+        net.Su = (new_state == model.codes[model.susceptible]).reshape(
+            n, 1).astype(float)
+        net.In = self._model_infected[new_state].reshape(n, 1).astype(float)
+        if model.recovered is not None:
+            net.Re = (new_state == model.codes[model.recovered]).reshape(
+                n, 1).astype(float)
+        else:
+            net.Re = np.zeros((n, 1))
+
+        if self.save_history:
+            counts = np.bincount(new_state, minlength=len(model.compartments))
+            for k, c in enumerate(model.compartments):
+                self.hist[c].append(counts[k])
+            self._append_model_histories(counts)
+        self._advance_step()
+        return None
+
+    def _init_partitions(self, seed):
+        """Helper function for the constructor. Splits the adjacency matrix into
+        row blocks with roughly equal numbers of edges, and creates one random
+        number stream per block.
+
+        Parameters
+        ----------
+        seed : `int`
+            seed for the per-partition random number streams. If None, the
+            streams are seeded from self.rng.
+
+        Returns
+        -------
+        None
+        """
+        A = self.network.A
+        P = max(1, min(int(self.partitions), self.network.n))
+        targets = np.linspace(0, A.nnz, P + 1)
+        bounds = np.searchsorted(A.indptr, targets, side="left")
+        bounds[0], bounds[-1] = 0, self.network.n
+        bounds = np.maximum.accumulate(bounds)
+        self._partition_bounds = [
+            (int(bounds[p]), int(bounds[p + 1])) for p in range(P)]
+        self._partition_adjacency = [A[r0:r1] for r0, r1 in self._partition_bounds]
+        if seed is None:
+            seed = _draw_seed(self.rng)
+        self._partition_rngs = [
+            np.random.default_rng(s)
+            for s in np.random.SeedSequence(seed).spawn(P)]
+        self._executor = None
+        return None
+
+    def close(self):
+        """Shuts down the thread pool of a partitioned simulation. The
+        simulation may still be run afterwards, in which case a new pool is
+        started. A Contagion may also be used as a context manager, which
+        closes it on exit.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.shutdown(wait=True)
+            self._executor = None
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _simulate_step_partitioned(self):
+        """Helper function for simulate_step(). Iterates a single simulation
+        time step block by block on a thread pool. Each block reads the
+        start-of-step infected record of the whole network and writes only its
+        own rows, so blocks can run concurrently; NumPy and SciPy release the
+        GIL for the bulk of the work.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        net = self.network
+        n = net.n
+
+        vacc_mode = None
+        if net.im_type == "vaccinate":
+            step = self.t
+            if net.efficacy == 1 and step == net.im_starts_after:
+                vacc_mode = "full"
+            elif 0 < net.efficacy < 1 and step == net.im_starts_after:
+                vacc_mode = "partial_first"
+                self.Im_this_step = np.zeros((n, 1))
+            elif 0 < net.efficacy < 1 and step > net.im_starts_after:
+                vacc_mode = "partial"
+
+        # blocks update the compartment arrays in place
+        net.Su = np.ascontiguousarray(net.Su, dtype=float)
+        net.Re = np.ascontiguousarray(net.Re, dtype=float)
+        if net.Im is not None:
+            net.Im = np.ascontiguousarray(net.Im, dtype=float)
+        In_out = np.empty((n, 1))
+        self.new_transmissions = np.empty((n, 1))
+        self.new_recoveries = np.empty((n, 1))
+        if self.track_symptomatic:
+            self.new_symptomatic = np.empty((n, 1))
+        if self.implement_testing:
+            self.new_tested = np.empty((n, 1))
+            self.new_ever_tested = np.empty((n, 1))
+            net.NewPositiveTests = np.empty((n, 1))
+
+        In_source = self._infected_pressure_source()
+        P = len(self._partition_bounds)
+        threads = self.n_threads or P
+        if threads > 1 and P > 1:
+            if self._executor is None:
+                import concurrent.futures
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=threads)
+            sums = list(self._executor.map(
+                lambda p: self._step_partition(p, In_source, In_out, vacc_mode),
+                range(P)))
+        else:
+            sums = [
+                self._step_partition(p, In_source, In_out, vacc_mode)
+                for p in range(P)]
+        net.In = In_out
+        self._advance_step()
+
+        if self.save_history:
+            su_sum, in_sum, re_sum, sy_sum, et_sum, pos_sum = np.sum(sums, axis=0)
+            self.Su_hist.append(su_sum)
+            self.In_hist.append(in_sum)
+            self.Re_hist.append(re_sum)
+            if self.track_symptomatic:
+                self.Sy_hist.append(sy_sum)
+            if self.implement_testing:
+                self.EverTested_hist.append(et_sum)
+                self.NewPositiveTests_hist.append(pos_sum)
+        return None
+
+    def _step_partition(self, p, In_source, In_out, vacc_mode):
+        """Helper function for _simulate_step_partitioned(). Advances the nodes
+        of a single row block through one step, using the block's own random
+        number stream.
+
+        Parameters
+        ----------
+        p : `int`
+            the partition index
+        In_source : `numpy.ndarray`
+            the (n, 1) infectiousness-weighted start-of-step infected record
+        In_out : `numpy.ndarray`
+            the (n, 1) array receiving the updated infected record
+        vacc_mode : `str`
+            None, "full", "partial_first" or "partial"
+
+        Returns
+        -------
+        sums : `tuple`
+            the block's contributions to the Su, In, Re, Sy, EverTested and
+            NewPositiveTests histories
+        """
+        net = self.network
+        r0, r1 = self._partition_bounds[p]
+        rng = self._partition_rngs[p]
+        k = r1 - r0
+        Su, In, Re = net.Su[r0:r1], net.In[r0:r1], net.Re[r0:r1]
+        Im = net.Im[r0:r1] if net.Im is not None else None
+
+        if vacc_mode == "full":
+            Re[:] = np.where(Re + Im > 0, 1., 0.)
+        elif vacc_mode in ["partial_first", "partial"]:
+            if vacc_mode == "partial":
+                Re -= self.Im_this_step[r0:r1]
+                Re[:] = np.where(Re > 0, 1., 0.)
+            Im_random_filter = np.multiply(Im, rng.random((k, 1)))
+            Im_random_filter = np.where(
+                (0 < Im_random_filter) & (Im_random_filter <= net.efficacy),
+                1.,
+                0.)
+            self.Im_this_step[r0:r1] = Im_random_filter
+            Re[:] = np.where(Re + Im_random_filter > 0, 1., 0.)
+
+        # per-node rates apply to the block's own rows
+        beta, gamma, psi = [
+            _rows(rate, r0, r1) for rate in [self.beta, self.gamma, self.psi]]
+        susceptibility = _rows(self.susceptibility, r0, r1)
+
+        # transmissions, recoveries and symptoms
+        pressure = self._partition_adjacency[p] @ In_source
+        if self.weighted_transmission:
+            log_survival = pressure*_log1m(beta)
+            if susceptibility is not None:
+                log_survival *= susceptibility
+            trans = np.where(
+                (rng.random((k, 1)) < -np.expm1(log_survival))
+                & (Su > 0)
+                & (Re == 0.), 1., 0.)
+        else:
+            if susceptibility is not None:
+                beta = beta*susceptibility
+            trans = np.multiply(pressure, Su)
+            trans = np.multiply(trans, rng.random((k, 1)))
+            trans = np.where(
+                (0 < trans) & (trans <= beta) & (Re == 0.), 1., 0.)
+        rec = np.multiply(In, rng.random((k, 1)))
+        rec = np.where((0 < rec) & (rec <= gamma), 1., 0.)
+        self.new_transmissions[r0:r1] = trans
+        self.new_recoveries[r0:r1] = rec
+        sy_sum = 0.
+        if self.track_symptomatic:
+            Sy = net.Sy[r0:r1]
+            sym = np.multiply(In - Sy, rng.random((k, 1)))
+            sym = np.where((0 < sym) & (sym <= psi), 1., 0.)
+            self.new_symptomatic[r0:r1] = sym
+
+        # testing
+        et_sum = pos_sum = 0.
+        if self.implement_testing:
+            random_arr = rng.random((k, 1))
+            if type(self.test_rate) is float:
+                tested = np.where(random_arr <= self.test_rate, 1., 0.)
+            elif type(self.test_rate) is tuple and len(self.test_rate) == 2:
+                asym = 1. - net.Sy[r0:r1] - Re
+                tested = np.where(
+                    (random_arr <= self.test_rate[0]) & (asym == 1.), 1., 0.) \
+                    + np.where(
+                    (random_arr <= self.test_rate[1]) & (net.Sy[r0:r1] == 1.),
+                    1.,
+                    0.)
+            else:
+                raise NotImplementedError
+            EverTested = net.EverTested[r0:r1]
+            new_ever_tested = np.where(
+                (tested == 1.) & (EverTested == 0.), 1., 0.)
+            positives = np.where((tested == 1.) & (In == 1.), 1., 0.)
+            self.new_tested[r0:r1] = tested
+            self.new_ever_tested[r0:r1] = new_ever_tested
+            net.NewPositiveTests[r0:r1] = positives
+            EverTested += new_ever_tested
+            et_sum, pos_sum = np.sum(EverTested), np.sum(positives)
+
+        # compartment updates
+        Su -= trans
+        su_sum = np.sum(Su)
+        In_out[r0:r1] = In + trans - rec
+        Re[:] = np.where(Re + rec > 0, 1., 0.)
+        if isinstance(self.omega, tuple):
+            Re_to_Su = np.where(
+                (Re > 0)
+                & (rng.random((k, 1)) <= _rows(self.omega[0], r0, r1))
+                & (Im == 0),
+                1.,
+                0.)
+            Im_to_Su = np.where(
+                (Im > 0) & (rng.random((k, 1)) <= _rows(self.omega[1], r0, r1)),
+                1.,
+                0.)
+            Re -= Re_to_Su
+            Im[:] = np.where(Im - Im_to_Su > 0, 1., 0.)
+            Su += Re_to_Su + Im_to_Su
+        elif not _is_zero(self.omega):
+            Re_to_Su = (Re > 0) \
+                & (rng.random((k, 1)) <= _rows(self.omega, r0, r1))
+            if net.im_type == "vaccinate":
+                Re_to_Su &= (Im == 0)
+            Re -= Re_to_Su
+            Su += Re_to_Su
+        Re[:] = np.where(Re > 0, 1., 0.)
+        Su[:] = np.where(Su > 0, 1., 0.)
+        if self.track_symptomatic:
+            Sy += sym - rec
+            sy_sum = np.sum(Sy)
+        return (
+            su_sum, np.sum(In_out[r0:r1]), np.sum(Re), sy_sum, et_sum, pos_sum)
+
+    def _simulate_step_fused(self):
+        """Helper function for simulate_step(). Iterates a single simulation
+        time step with the compiled kernel in _kernels, which performs the
+        vaccination, transmission, recovery, symptom, testing and compartment
+        updates for each node in one pass.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        from contagion import _kernels
+        net = self.network
+        n = net.n
+
+        vacc_mode = _kernels.VACC_NONE
+        if net.im_type == "vaccinate":
+            step = self.t
+            if net.efficacy == 1 and step == net.im_starts_after:
+                vacc_mode = _kernels.VACC_FULL
+            elif 0 < net.efficacy < 1 and step == net.im_starts_after:
+                vacc_mode = _kernels.VACC_PARTIAL_FIRST
+                self.Im_this_step = np.zeros((n, 1))
+            elif 0 < net.efficacy < 1 and step > net.im_starts_after:
+                vacc_mode = _kernels.VACC_PARTIAL
+
+        wane_mode = _kernels.WANE_NONE
+        omega = (0., 0.)
+        if isinstance(self.omega, tuple):
+            wane_mode = _kernels.WANE_SPLIT
+            omega = self.omega
+        elif not _is_zero(self.omega):
+            wane_mode = _kernels.WANE_NATURAL \
+                if net.im_type == "vaccinate" else _kernels.WANE_ALL
+            omega = (self.omega, 0.)
+
+        test_mode = _kernels.TEST_NONE
+        test_rate = (0., 0.)
+        if self.implement_testing:
+            if self.testing_type == "contact":
+                test_mode = _kernels.TEST_GIVEN
+                self.new_tested = self._get_new_tested_contact()
+            elif type(self.test_rate) is float:
+                test_mode = _kernels.TEST_RANDOM
+                test_rate = (self.test_rate, 0.)
+            elif type(self.test_rate) is tuple and len(self.test_rate) == 2:
+                test_mode = _kernels.TEST_RANDOM_SPLIT
+                test_rate = self.test_rate
+            else:
+                raise NotImplementedError
+            if test_mode != _kernels.TEST_GIVEN:
+                self.new_tested = np.zeros((n, 1))
+
+        # the kernel works on flat float64 views of the compartment arrays
+        net.Su = np.ascontiguousarray(net.Su, dtype=float)
+        net.In = np.ascontiguousarray(net.In, dtype=float)
+        net.Re = np.ascontiguousarray(net.Re, dtype=float)
+        if net.Im is not None:
+            net.Im = np.ascontiguousarray(net.Im, dtype=float)
+        empty = np.zeros(0)
+        Im = net.Im if net.Im is not None else np.zeros((n, 1))
+        Sy = net.Sy if self.track_symptomatic else empty
+        Im_this_step = self.Im_this_step \
+            if vacc_mode in [_kernels.VACC_PARTIAL_FIRST, _kernels.VACC_PARTIAL] \
+            else empty
+        if self.implement_testing:
+            EverTested, NewPositiveTests, new_tested = \
+                net.EverTested, net.NewPositiveTests, self.new_tested
+        else:
+            EverTested = NewPositiveTests = new_tested = empty
+        if getattr(self, "_fused_adjacency", None) is None:
+            self._fused_adjacency = (
+                net.A.indptr,
+                net.A.indices,
+                np.ascontiguousarray(net.A.data, dtype=float))
+        indptr, indices, data = self._fused_adjacency
+
+        In_out = np.empty((n, 1))
+        self.new_transmissions = np.empty((n, 1))
+        self.new_recoveries = np.empty((n, 1))
+        self.new_symptomatic = np.zeros((n, 1)) \
+            if self.track_symptomatic else empty
+
+        _kernels.seed(_draw_seed(self.rng))
+        with self._phase("kernel"):
+            sums = _kernels.fused_step(
+                indptr, indices, data,
+                net.Su.ravel(), net.In.ravel(), In_out.ravel(), net.Re.ravel(),
+                Sy.ravel(), Im.ravel(), Im_this_step.ravel(),
+                EverTested.ravel(), NewPositiveTests.ravel(),
+                self.new_transmissions.ravel(), self.new_recoveries.ravel(),
+                self.new_symptomatic.ravel(), new_tested.ravel(),
+                float(self.beta), float(self.gamma), float(self.psi),
+                float(omega[0]), float(omega[1]), float(net.efficacy),
+                float(test_rate[0]), float(test_rate[1]),
+                vacc_mode, test_mode, wane_mode, self.track_symptomatic,
+                self.weighted_transmission, _log1m(self.beta))
+        net.In = In_out
+        self._advance_step()
+        if self.implement_testing and self.testing_type == "contact":
+            self.contact_queue += self._get_new_contact_queue()
+
+        if self.save_history:
+            su_sum, in_sum, re_sum, sy_sum, et_sum, pos_sum = sums
+            self.Su_hist.append(su_sum)
+            self.In_hist.append(in_sum)
+            self.Re_hist.append(re_sum)
+            if self.track_symptomatic:
+                self.Sy_hist.append(sy_sum)
+            if self.implement_testing:
+                self.EverTested_hist.append(et_sum)
+                self.NewPositiveTests_hist.append(pos_sum)
+        return None
+
+    def _natural_omega(self):
+        """Returns the waning rate of naturally-acquired immunity.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        omega : `float` or `numpy.ndarray`
+            the natural waning rate
+        """
+        return self.omega[0] if isinstance(self.omega, tuple) else self.omega
+
+    def _init_events(self):
+        """Helper function for _simulate_step_scheduled(). Creates the event
+        queues, and schedules the pending events of the network's currently
+        infected and recovered nodes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError: when the network is vaccinated with partial efficacy.
+        """
+        net = self.network
+        if net.im_type == "vaccinate" and net.efficacy < 1:
+            raise ValueError(
+                "Scheduled events do not support partial-efficacy "
+                "vaccination.")
+        kinds = ["recovery", "symptoms", "waning", "immunity"]
+        # the step each node's pending event of each kind falls due, or -1;
+        # queued events that no longer match are stale and are skipped
+        self._event_due = {k: np.full(net.n, -1, dtype=np.int64) for k in kinds}
+        self._event_queues = {k: {} for k in kinds}
+
+        infected = np.flatnonzero(net.In.ravel() > 0)
+        self._schedule_events("recovery", infected, self.gamma, self.t)
+        if self.track_symptomatic:
+            asymptomatic = infected[net.Sy.ravel()[infected] == 0]
+            self._schedule_events("symptoms", asymptomatic, self.psi, self.t)
+        self._schedule_waning(np.flatnonzero(net.Re.ravel() > 0), self.t)
+        if isinstance(self.omega, tuple) and net.Im is not None:
+            self._schedule_events(
+                "immunity",
+                np.flatnonzero(net.Im.ravel() > 0),
+                self.omega[1],
+                self.t)
+        return None
+
+    def _schedule_events(self, kind, nodes, rate, start):
+        """Helper function for _simulate_step_scheduled(). Draws a
+        geometrically distributed delay for each node, so that its event falls
+        due at step start with probability rate, at the following step with
+        probability rate*(1 - rate), and so on, and files the nodes in the
+        queue of the step their events fall due. Nodes with a zero rate are
+        not scheduled.
+
+        Parameters
+        ----------
+        kind : `str`
+            the kind of event
+        nodes : `numpy.ndarray`
+            indices of the nodes
+        rate : `float` or `numpy.ndarray`
+            the per-step event rate, a scalar or an (n, 1) array
+        start : `int`
+            the first step at which the events may fall due
+
+        Returns
+        -------
+        None
+        """
+        if isinstance(rate, np.ndarray):
+            rate = rate.ravel()[nodes]
+        else:
+            rate = np.full(len(nodes), float(rate))
+        nodes = nodes[rate > 0]
+        if len(nodes) == 0:
+            return None
+        due = start - 1 + self.rng.geometric(rate[rate > 0])
+        self._event_due[kind][nodes] = due
+        order = np.argsort(due, kind="stable")
+        due, nodes = due[order], nodes[order]
+        steps, first = np.unique(due, return_index=True)
+        queue = self._event_queues[kind]
+        for step, group in zip(steps.tolist(), np.split(nodes, first[1:])):
+            queue.setdefault(step, []).append(group)
+        return None
+
+    def _schedule_waning(self, nodes, start):
+        """Helper function for _simulate_step_scheduled(). Schedules the waning
+        of naturally-acquired immunity for recovered nodes. Immunized nodes do
+        not lose natural immunity while their immunization lasts.
+
+        Parameters
+        ----------
+        nodes : `numpy.ndarray`
+            indices of the recovered nodes
+        start : `int`
+            the first step at which immunity may wane
+
+        Returns
+        -------
+        None
+        """
+        if _is_zero(self._natural_omega()):
+            return None
+        if self.network.Im is not None and (
+                isinstance(self.omega, tuple)
+                or self.network.im_type == "vaccinate"):
+            nodes = nodes[self.network.Im.ravel()[nodes] == 0]
+        self._schedule_events("waning", nodes, self._natural_omega(), start)
+        return None
+
+    def _pop_events(self, kind):
+        """Helper function for _simulate_step_scheduled(). Removes and returns
+        the nodes whose events of the given kind fall due at the current step.
+
+        Parameters
+        ----------
+        kind : `str`
+            the kind of event
+
+        Returns
+        -------
+        nodes : `numpy.ndarray`
+            indices of the nodes
+        """
+        groups = self._event_queues[kind].pop(self.t, None)
+        if not groups:
+            return np.zeros(0, dtype=np.int64)
+        nodes = np.unique(np.concatenate(groups))
+        due = self._event_due[kind]
+        nodes = nodes[due[nodes] == self.t]
+        due[nodes] = -1
+        return nodes
+
+    def _simulate_step_scheduled(self):
+        """Helper function for simulate_step(). Iterates a single simulation
+        time step with pre-drawn event times: recoveries, symptom onsets and
+        waning immunity are read from the current step's event queues, and
+        newly infected and recovered nodes have their events scheduled, so
+        that random numbers are only drawn when nodes change compartment.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        net = self.network
+        n = net.n
+        if self._event_due is None:
+            self._init_events()
+        t = self.t
+
+        if net.im_type == "vaccinate" and t == net.im_starts_after:
+            net.Re = np.where(net.Re + net.Im > 0, 1., 0.)
+        if self.campaign is not None:
+            self._schedule_waning(self.campaign.step(self), t)
+
+        with self._phase("transmission") as phase:
+            self.new_transmissions = self.get_new_transmissions()
+            phase.allocated(self.new_transmissions)
+        recovered = self._pop_events("recovery")
+        self.new_recoveries = np.zeros((n, 1))
+        self.new_recoveries[recovered] = 1.
+
+        if self.track_symptomatic:
+            onset = self._pop_events("symptoms")
+            onset = onset[
+                (net.In.ravel()[onset] > 0) & (net.Sy.ravel()[onset] == 0)]
+            self.new_symptomatic = np.zeros((n, 1))
+            self.new_symptomatic[onset] = 1.
+
+        if self.implement_testing:
+            self.new_tested, self.new_ever_tested = self.get_new_tested()
+            self.network.NewPositiveTests = self.get_new_testedpositive()
+
+            if self.testing_type == "contact":
+                self.contact_queue += self._get_new_contact_queue()
+
+        infected = np.flatnonzero(self.new_transmissions.ravel())
+        self._schedule_events("recovery", infected, self.gamma, t + 1)
+        self.update_Su()
+        self.update_In()
+
+        net.Re[recovered] = 1.
+        self._schedule_waning(recovered, t)
+        waned = self._pop_events("waning")
+        net.Re[waned] = 0.
+        net.Su[waned] = 1.
+        if isinstance(self.omega, tuple) and net.Im is not None:
+            # lapsed immunizations leave natural immunity to wane from the
+            # next step
+            lapsed = self._pop_events("immunity")
+            net.Im[lapsed] = 0.
+            net.Su[lapsed] = 1.
+            self._schedule_waning(lapsed[net.Re.ravel()[lapsed] > 0], t + 1)
+        if self.save_history:
+            self.Re_hist.append(np.sum(net.Re))
+
+        if self.track_symptomatic:
+            self._schedule_events("symptoms", infected, self.psi, t + 1)
+            net.Sy[onset] = 1.
+            net.Sy[recovered] = 0.
+            if self.save_history:
+                self.Sy_hist.append(np.sum(net.Sy))
+        if self.implement_testing:
+            self.update_EverTested()
+            if self.save_history:
+                self.NewPositiveTests_hist.append(np.sum(net.NewPositiveTests))
+        self._advance_step()
+        return None
+
+    def _require_histories(self):
+        """Turns history tracking on, if it is off.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if not self.save_history:
+            self.init_histories()
+            self.save_history = True
+        return None
+
+    def _population(self):
+        """Returns the number of nodes in the original network."""
+        if self.full_network is not None:
+            return self.full_network.n
+        return self.network.n
+
+    def _compact_network(self):
+        """Helper function for _simulate_step_numpy(). Drops permanently
+        immune nodes that are neither infected nor symptomatic, replacing the
+        network with a shallow copy over the remaining nodes, and slicing
+        per-node arrays to match.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        net = self.network
+        removed = (net.Im.ravel() > 0) & (net.In.ravel() == 0)
+        if self.track_symptomatic:
+            removed &= net.Sy.ravel() == 0
+        keep = np.flatnonzero(~removed)
+        for name in self._removed:
+            self._removed[name] += np.sum(getattr(net, name)[removed])
+
+        compact = copy.copy(net)
+        compact.A = net.A[keep][:, keep].tocsr()
+        compact.n = len(keep)
+        compact.degrees = np.diff(compact.A.indptr)
+        compact._G = None
+        compact.labels = None
+        compact.Mo = None
+        for name in [
+                "Su", "In", "Re", "Sy", "Im", "og_Su", "og_In", "og_Re"]:
+            if getattr(net, name, None) is not None:
+                setattr(compact, name, getattr(net, name)[keep])
+
+        n = net.n
+        for name in [
+                "beta", "gamma", "psi", "susceptibility", "infectiousness",
+                "new_transmissions", "new_recoveries"]:
+            value = getattr(self, name)
+            if isinstance(value, np.ndarray) and value.shape == (n, 1):
+                setattr(self, name, value[keep])
+        if isinstance(self.omega, tuple):
+            self.omega = tuple(
+                o[keep] if isinstance(o, np.ndarray) else o
+                for o in self.omega)
+        elif isinstance(self.omega, np.ndarray):
+            self.omega = self.omega[keep]
+        self._log_survival = None
+        self._log_survival_beta = None
+
+        if self.full_network is None:
+            self.full_network, self.node_index = net, keep
+        else:
+            self.node_index = self.node_index[keep]
+        self.network = compact
+        return None
+
+    def expand_network(self):
+        """Copies the compartment records of a compacted network back into the
+        original network's full-size arrays; see compact_immune.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        network : `ContactNetwork`
+            the original network
+        """
+        if self.full_network is None:
+            return self.network
+        full, index = self.full_network, self.node_index
+        for name in ["Su", "In", "Re", "Sy"]:
+            if getattr(self.network, name, None) is not None:
+                getattr(full, name)[index] = getattr(self.network, name)
+        return full
+
+    def _infected_count(self):
+        """Returns the current number of infected nodes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        num : `float`
+            the number of infected nodes
+        """
+        if self.save_history:
+            return self.In_hist[-1]
+        return np.sum(self.network.In)
+
+    def run_simulation(self, steps: float = np.inf):
+        """Runs a contagion simulation for the specified number of steps. If
+        step count is not provided, runs until infectivity subsides, or until
+        an observer requests that the run stops. Histories are only recorded
+        if save_history is True; observers can be used to aggregate metrics
+        in constant memory instead.
+
+        Paramaters
+        ----------
+        steps : `float`
+            number of simulation steps to run.
+
+        Returns
+        -------
+        None
+        """
+        self.stop_requested = False
+        # run simulation
+        i = 0
+        while i < steps:
+            if self.t >= 5 and \
+                    self._infected_count() in [0, self._population()]:
+                break
+            self.simulate_step()
+            i += 1
+            if self.stop_requested:
+                break
+        if self.full_network is not None:
+            self.expand_network()
+        return None
+
+    def run_simulation_get_max_infected(self, steps: float = np.inf):
+        """Runs a contagion simulation and returns the maximum number of
+        infected individuals at any step.
+
+        Parameters
+        ----------
+        steps : `float`
             number of simulation steps to run.
 
         Returns
@@ -840,6 +2554,7 @@ class Contagion():
         num : `int`
             maximum number of infected individuals at any simulation step.
         """
+        self._require_histories()
         self.run_simulation(steps)
         return np.max(self.In_hist)
 
@@ -857,10 +2572,7 @@ class Contagion():
             time-step when threshold number of monitored individual were (ever)
             infected
         """
-        # turn histories on
-        if not self.save_history:
-            self.init_histories()
-            self.save_history = True
+        self._require_histories()
 
         if self.network.Mo is None or self.network.mo_thresh is None:
             raise ValueError("Monitoring not initialized.")
@@ -899,42 +2611,18 @@ class Contagion():
 
     def plot_simulation(self, steps: float = np.inf):
         """Runs an epidemic simulation and produces a corresponding simulation
-        history figure.
+        history figure. To plot a simulation that has already been run, use
+        plotting.plot_simulation(), which renders the stored histories.
 
         Parameters
         ----------
         steps : `float`
             number of simulation steps to run.
         """
-        # run simulation
+        self._require_histories()
         self.run_simulation(steps)
-
-        # generate figure
-        sns.set_style("white")
-        plt.plot(self.Su_hist, label="Susceptible")
-        plt.plot(self.Re_hist, label="Recovered")
-
-        if self.track_symptomatic:
-            plt.plot(self.In_hist, label="Infected Total")
-            plt.plot(self.Sy_hist, label="Infected Symptomatic")
-            infected_asymptomatic = [
-                self.In_hist[i] - self.Sy_hist[i] \
-                for i in range(len(self.In_hist))]
-            plt.plot(infected_asymptomatic, label="Infected Asymptomatic")
-        else:
-            plt.plot(self.In_hist, label="Infected")
-
-        if self.implement_testing:
-            plt.plot(self.EverTested_hist, label="Nodes Ever Tested")
-            plt.plot(self.NewPositiveTests_hist, label="New Positive Tests")
-
-        plt.title("Simulation Compartmental Histories")
-        plt.xlabel("Simulation Time")
-        plt.ylabel("Count of Nodes")
-        plt.ylim(0., self.network.n)
-        plt.legend()
-        sns.despine()
-        plt.show()
+        from contagion import plotting
+        plotting.plot_simulation(self)
         return None
 
 class Immunization():
@@ -953,8 +2641,72 @@ class Immunization():
         None
         """
         self.network = network
+        # a profiling.Profiler recording calls of the generate_* methods
+        self.profiler = None
         return None
 
+    def _eigenvector_centrality(self):
+        """Helper function for generate_centrality_immunization_array().
+        Computes eigenvector centralities from the leading eigenvector of the
+        unweighted adjacency matrix, as NetworkX's eigenvector_centrality()
+        does by default.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        centralities : `numpy.ndarray`
+            the eigenvector centrality of each node
+        """
+        A = sp.csr_matrix(self.network.A, dtype=float, copy=True)
+        A.eliminate_zeros()
+        A.data[:] = 1.
+        if self.network.n < 3:
+            _, vecs = np.linalg.eigh(A.toarray())
+        else:
+            from scipy.sparse.linalg import eigsh
+            _, vecs = eigsh(A, k=1, which="LA")
+        v = np.abs(vecs[:, -1])
+        return v/np.linalg.norm(v)
+
+    def _traversal_order(self, traversal, Q):
+        """Helper function for generate_bfs_immunization_array() and
+        generate_dfs_immunization_array(). Traverses each connected component
+        in turn, starting from its lowest-indexed node, until Q nodes have been
+        encountered.
+
+        Parameters
+        ----------
+        traversal : callable
+            either csgraph.breadth_first_order or csgraph.depth_first_order
+        Q : `int`
+            number of nodes to return
+
+        Returns
+        -------
+        order : `numpy.ndarray`
+            the first Q node indices encountered
+        """
+        from scipy.sparse import csgraph
+        _, components = csgraph.connected_components(
+            self.network.A, directed=False)
+        _, starts = np.unique(components, return_index=True)
+        order = []
+        found = 0
+        for start in starts:
+            if found >= Q:
+                break
+            nodes = traversal(
+                self.network.A, start, directed=False, return_predecessors=False)
+            order.append(nodes)
+            found += len(nodes)
+        if not order:
+            return np.array([], dtype=int)
+        return np.concatenate(order)[:Q]
+
+    @profiling.profiled
     def generate_random_immunization_array(self, Q = 1):
         """
         Generates an immunization array with Q nodes randomly immunized.
@@ -974,6 +2726,7 @@ class Immunization():
         np.random.shuffle(Im)
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_highest_degrees_immunization_array(self, Q = 1):
         """
         Generates an immunization array with the Q highest-degree nodes
@@ -990,11 +2743,10 @@ class Immunization():
             an (n, 1) array with 1 at indices to be immunized and 0 elsewhere
         """
         Im = np.zeros(self.network.n)
-        for i in [node[0] for node in \
-                sorted(self.network.G.degree, key=lambda x: x[1], reverse=True)][:Q]:
-            Im[i] = 1
+        Im[np.argsort(-self.network.degrees, kind="stable")[:Q]] = 1
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_lowest_degrees_immunization_array(self, Q = 1):
         """
         Generates an immunization array with the Q lowest-degree nodes
@@ -1011,11 +2763,10 @@ class Immunization():
             an (n, 1) array with 1 at indices to be immunized and 0 elsewhere
         """
         Im = np.zeros(self.network.n)
-        for i in [node[0] for node in \
-                sorted(self.network.G.degree, key=lambda x: x[1], reverse=False)][:Q]:
-            Im[i] = 1
+        Im[np.argsort(self.network.degrees, kind="stable")[:Q]] = 1
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_centrality_immunization_array(
             self,
             Q = 1,
@@ -1024,7 +2775,10 @@ class Immunization():
         """
         Generates an immunization array with the Q lowest or highest centrality
         nodes immunized. Three measures of centrality are implemented:
-        betweenness, eigenvector, and closeness.
+        betweenness, eigenvector, and closeness. Eigenvector centrality is
+        computed from the unweighted adjacency matrix; betweenness and
+        closeness require the NetworkX graph, which is built on demand if
+        necessary.
 
         Parameters
         ----------
@@ -1045,12 +2799,13 @@ class Immunization():
         NotImplementedError : for invalid centrality type or how not in
             ["highest", "lowest"]
         """
+        import networkx as nx
         Im = np.zeros(self.network.n)
 
         if centrality_type == "betweenness":
             centralities = nx.betweenness_centrality(self.network.G)
         elif centrality_type == "eigenvector":
-            centralities = nx.eigenvector_centrality(self.network.G)
+            centralities = dict(enumerate(self._eigenvector_centrality()))
         elif centrality_type == "closeness":
             centralities = nx.closeness_centrality(self.network.G)
         else:
@@ -1068,6 +2823,7 @@ class Immunization():
             raise NotImplementedError
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_largest_cliques_immunization_array(
             self,
             Q = 1):
@@ -1089,6 +2845,7 @@ class Immunization():
         ------
         ValueError : if no cliques are found.
         """
+        import networkx as nx
         Im = np.zeros(self.network.n)
         cliques = [i for i in nx.enumerate_all_cliques(self.network.G)]
         if not cliques:
@@ -1105,6 +2862,7 @@ class Immunization():
 
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_smallest_cliques_immunization_array(
             self,
             Q = 1):
@@ -1126,6 +2884,7 @@ class Immunization():
         ------
         ValueError : if no cliques are found.
         """
+        import networkx as nx
         Im = np.zeros(self.network.n)
         cliques = [i for i in nx.enumerate_all_cliques(self.network.G) if len(i) > 1]
         if not cliques:
@@ -1142,6 +2901,7 @@ class Immunization():
 
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_longest_chains_immunization_array(
             self,
             Q = 1):
@@ -1163,6 +2923,7 @@ class Immunization():
         ------
         ValueError : if no cliques are found.
         """
+        import networkx as nx
         Im = np.zeros(self.network.n)
         cliques = [i for i in nx.chain_decomposition(self.network.G)]
         if not cliques:
@@ -1179,12 +2940,15 @@ class Immunization():
 
         return Im.reshape(self.network.n, 1)
 
+    @profiling.profiled
     def generate_bfs_immunization_array(
             self,
             Q = 1):
         """
         Generates an immunization array consisting of Q first nodes encountered
-        in a breadth-first search.
+        in a breadth-first search, in traversal order: each connected component
+        is searched in turn from its lowest-indexed node, visiting neighbors
+        in index order, as NetworkX's search from the same node does.
 
         Parameters
         ----------
@@ -1201,28 +2965,26 @@ class Immunization():
         ValueError : if BFS fails.
         """
         Im = np.zeros(self.network.n)
-        search = nx.algorithms.coloring.strategy_connected_sequential_bfs(
-            self.network.G,
-            1) #note: colors = 1 is ignored in this nx method
-        search = list(set([i for i in search]))
+        from scipy.sparse import csgraph
+        search = self._traversal_order(csgraph.breadth_first_order, Q)
 
-        if not search:
+        if len(search) == 0:
             raise ValueError("BFS failed.")
 
-        Im_bfs = search[:Q]
-
-        for i in Im_bfs:
-            Im[i] = 1
+        Im[search] = 1
 
         return Im.reshape(self.network.n, 1)
 
 
+    @profiling.profiled
     def generate_dfs_immunization_array(
             self,
             Q = 1):
         """
         Generates an immunization array consisting of Q first nodes encountered
-        in a depth-first search.
+        in a depth-first search, in traversal order: each connected component
+        is searched in turn from its lowest-indexed node, visiting neighbors
+        in index order, as NetworkX's search from the same node does.
 
         Parameters
         ----------
@@ -1239,17 +3001,54 @@ class Immunization():
         ValueError : if DFS fails.
         """
         Im = np.zeros(self.network.n)
-        search = nx.algorithms.coloring.strategy_connected_sequential_dfs(
-            self.network.G,
-            1) #note: colors = 1 is ignored in this nx method
-        search = list(set([i for i in search]))
+        from scipy.sparse import csgraph
+        search = self._traversal_order(csgraph.depth_first_order, Q)
 
-        if not search:
-            raise ValueError("BFS failed.")
+        if len(search) == 0:
+            raise ValueError("DFS failed.")
 
-        Im_bfs = search[:Q]
-
-        for i in Im_bfs:
-            Im[i] = 1
+        Im[search] = 1
 
         return Im.reshape(self.network.n, 1)
+
+    @profiling.profiled
+    def generate_greedy_immunization_array(
+            self,
+            Q = 1,
+            beta = 0.1,
+            gamma = 0.1,
+            runs = 100,
+            seed = None,
+            candidates = None):
+        """
+        Generates an immunization array of Q nodes chosen greedily by their
+        estimated reduction in expected outbreak size, using bond-percolation
+        estimates under common random numbers and CELF lazy evaluation; see
+        optimization.greedy_immunization().
+
+        Parameters
+        ----------
+        Q : `int`
+            Number of individuals to immunize; default to 1
+        beta : `float`
+            per-step transmission probability of a contact of weight 1
+        gamma : `float`
+            per-step recovery probability
+        runs : `int`
+            number of percolation realizations
+        seed : `int`
+            seed for the realizations
+        candidates : `numpy.ndarray`
+            indices of the nodes that may be immunized. Defaults to all nodes.
+
+        Returns
+        -------
+        Im : `numpy.ndarray`
+            an (n, 1) array with 1 at indices to be immunized and 0 elsewhere
+        """
+        from contagion import optimization
+        estimator = optimization.PercolationEstimator(
+            self.network, beta, gamma, runs=runs, seed=seed)
+        Im, _, _ = optimization.greedy_immunization(
+            estimator, Q, candidates=candidates)
+        return Im
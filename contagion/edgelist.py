@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+
+"""
+edgelist.py
+
+Streaming construction of sparse adjacency matrices from (possibly very large,
+possibly gzip-compressed) edge-list and CSV files, without building a NetworkX
+graph.
+"""
+
+__author__ = "Lucas McCabe"
+
+import gzip
+import itertools
+import tempfile
+import numpy as np
+import scipy.sparse as sp
+
+
+def _open_text(path):
+    """Opens a plain-text or gzip-compressed file for reading. Compression is
+    detected from the file's magic bytes rather than its extension.
+
+    Parameters
+    ----------
+    path : `str`
+        path to the file
+
+    Returns
+    -------
+    fh : file object
+        a text-mode file handle
+    """
+    with open(path, "rb") as fh:
+        magic = fh.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def _parse_chunk(lines, delimiter, columns, comments, weight_column = None):
+    """Splits a chunk of edge-list lines into source and target label lists,
+    and optionally a list of edge weights.
+
+    Parameters
+    ----------
+    lines : `List`
+        raw lines read from the file
+    delimiter : `str`
+        field delimiter. None splits on whitespace.
+    columns : `tuple`
+        indices of the source and target fields
+    comments : `str`
+        lines starting with this prefix are skipped
+    weight_column : `int`
+        index of the weight field, if any
+
+    Returns
+    -------
+    labels : `numpy.ndarray`
+        the source labels followed by the target labels
+    weights : `numpy.ndarray`
+        the edge weights, or None if weight_column is None
+    """
+    src, dst, weights = [], [], []
+    c0, c1 = columns
+    for line in lines:
+        line = line.strip()
+        if not line or (comments and line.startswith(comments)):
+            continue
+        fields = line.split(delimiter)
+        src.append(fields[c0].strip())
+        dst.append(fields[c1].strip())
+        if weight_column is not None:
+            weights.append(float(fields[weight_column]))
+    if weight_column is None:
+        return np.array(src + dst, dtype=str), None
+    return np.array(src + dst, dtype=str), np.array(weights, dtype=float)
+
+
+def edges_to_csr(rows, cols, n, weights = None, chunk_size = 1000000):
+    """Builds a symmetric, deduplicated CSR adjacency matrix from an undirected
+    edge list. Self-loops are dropped. The edges may be given in either or
+    both orientations; if weights are provided, the weights of repeated edges
+    (in either orientation) are summed.
+
+    Parameters
+    ----------
+    rows : `numpy.ndarray`
+        integer source node ids
+    cols : `numpy.ndarray`
+        integer target node ids
+    n : `int`
+        number of nodes
+    weights : `numpy.ndarray`
+        edge weights (e.g. contact durations). Defaults to 1 for every edge,
+        with repeated edges counted once.
+    chunk_size : `int`
+        number of edges processed at a time
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    keep = rows != cols
+    pairs = np.stack(
+        [np.minimum(rows[keep], cols[keep]), np.maximum(rows[keep], cols[keep])],
+        axis=1)
+    if weights is not None:
+        weights = np.broadcast_to(
+            np.asarray(weights, dtype=float), rows.shape)[keep]
+    return _pairs_to_csr(
+        [(pairs[i:i + chunk_size],
+            None if weights is None else weights[i:i + chunk_size])
+            for i in range(0, len(pairs), chunk_size)],
+        n,
+        chunk_size)
+
+
+def _pairs_to_csr(blocks, n, chunk_size):
+    """Builds a symmetric, deduplicated CSR adjacency matrix from blocks of
+    canonical (u < v) node pairs. Called with a re-iterable source of blocks,
+    since the pairs are visited twice: once to count degrees, and once to
+    scatter neighbors into place.
+
+    Parameters
+    ----------
+    blocks : callable or iterable
+        a zero-argument callable returning an iterator over (pairs, weights)
+        tuples, or an iterable of such tuples, where pairs is a (k, 2) integer
+        array and weights is a length-k float array or None. If weights are
+        given, the weights of duplicate pairs are summed; otherwise every
+        entry of the matrix is 1.
+    n : `int`
+        number of nodes
+    chunk_size : `int`
+        maximum number of adjacency entries deduplicated at a time
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    if not callable(blocks):
+        blocks = list(blocks)
+        get_blocks = lambda: iter(blocks)
+    else:
+        get_blocks = blocks
+
+    # first pass: count (possibly duplicated) adjacency entries per row
+    counts = np.zeros(n, dtype=np.int64)
+    weighted = False
+    for pairs, weights in get_blocks():
+        counts += np.bincount(pairs[:, 0], minlength=n)
+        counts += np.bincount(pairs[:, 1], minlength=n)
+        weighted = weighted or weights is not None
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    index_dtype = np.int32 if max(n, indptr[-1]) < 2**31 else np.int64
+    indices = np.empty(indptr[-1], dtype=index_dtype)
+    data = np.empty(indptr[-1]) if weighted else None
+
+    # second pass: scatter both orientations of every pair into their rows
+    fill = indptr[:-1].copy()
+    for pairs, weights in get_blocks():
+        r = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        c = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        order = np.argsort(r, kind="stable")
+        r, c = r[order], c[order]
+        uniq, first, cnt = np.unique(r, return_index=True, return_counts=True)
+        rank = np.arange(len(r)) - np.repeat(first, cnt)
+        indices[fill[r] + rank] = c
+        if weighted:
+            if weights is None:
+                weights = np.ones(len(pairs))
+            data[fill[r] + rank] = np.concatenate([weights, weights])[order]
+        fill[uniq] += cnt
+
+    # sort and deduplicate each row, compacting in place, a block of rows at
+    # a time so that the temporaries stay bounded by chunk_size
+    new_counts = np.zeros(n, dtype=np.int64)
+    write = 0
+    r0 = 0
+    while r0 < n:
+        r1 = int(np.searchsorted(
+            indptr, indptr[r0] + max(chunk_size, 1), side="right")) - 1
+        r1 = min(max(r1, r0 + 1), n)
+        seg = indices[indptr[r0]:indptr[r1]]
+        row_ids = np.repeat(np.arange(r0, r1), counts[r0:r1])
+        order = np.lexsort((seg, row_ids))
+        seg, row_ids = seg[order], row_ids[order]
+        keep = np.ones(len(seg), dtype=bool)
+        keep[1:] = (seg[1:] != seg[:-1]) | (row_ids[1:] != row_ids[:-1])
+        if weighted and len(seg):
+            w = np.add.reduceat(
+                data[indptr[r0]:indptr[r1]][order], np.flatnonzero(keep))
+            data[write:write + len(w)] = w
+        seg = seg[keep]
+        new_counts[r0:r1] = np.bincount(row_ids[keep] - r0, minlength=r1 - r0)
+        indices[write:write + len(seg)] = seg
+        write += len(seg)
+        r0 = r1
+
+    indptr = np.zeros(n + 1, dtype=index_dtype)
+    np.cumsum(new_counts, out=indptr[1:])
+    indices = indices[:write].copy()
+    data = data[:write].copy() if weighted else np.ones(write)
+    return sp.csr_matrix((data, indices, indptr), shape=(n, n))
+
+
+def _sorted_run(pairs, weights):
+    """Sorts canonical node pairs and merges duplicates, summing their
+    weights.
+
+    Parameters
+    ----------
+    pairs : `numpy.ndarray`
+        a (k, 2) integer array of (u < v) node pairs
+    weights : `numpy.ndarray`
+        a length-k float array of edge weights, or None
+
+    Returns
+    -------
+    pairs : `numpy.ndarray`
+        the distinct pairs, in (u, v) order
+    weights : `numpy.ndarray`
+        the summed weight of each distinct pair, or None
+    """
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    pairs = pairs[order]
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = np.any(pairs[1:] != pairs[:-1], axis=1)
+    if weights is not None and len(pairs):
+        weights = np.add.reduceat(weights[order], np.flatnonzero(first))
+    return pairs[first], weights
+
+
+def _merge_runs(spill, weight_spill, runs, n, block_size):
+    """Merges sorted, deduplicated runs of node pairs spilled to disk (an
+    external k-way merge), reading at most block_size pairs of each run at a
+    time. Pairs repeated across runs are merged, summing their weights.
+
+    Parameters
+    ----------
+    spill : file object
+        the file holding the runs' pairs, as int64 (u, v) records
+    weight_spill : file object
+        the file holding the runs' weights, as float64 records, or None
+    runs : `List`
+        the (start, stop) record offsets of each run
+    n : `int`
+        number of nodes
+    block_size : `int`
+        number of records read from a run at a time
+
+    Yields
+    ------
+    pairs : `numpy.ndarray`
+        a block of distinct pairs, in (u, v) order across blocks
+    weights : `numpy.ndarray`
+        the summed weight of each pair, or None
+    """
+    def read(r):
+        count = min(block_size, stops[r] - positions[r])
+        spill.seek(16*positions[r])
+        pairs = np.fromfile(spill, dtype=np.int64, count=2*count).reshape(-1, 2)
+        weights = None
+        if weight_spill is not None:
+            weight_spill.seek(8*positions[r])
+            weights = np.fromfile(weight_spill, dtype=np.float64, count=count)
+        positions[r] += count
+        # pairs are ordered by the key u*n + v
+        keys = pairs[:, 0].astype(np.uint64)*np.uint64(n) \
+            + pairs[:, 1].astype(np.uint64)
+        return [pairs, keys, weights]
+
+    positions = [start for start, _ in runs]
+    stops = [stop for _, stop in runs]
+    buffers = [read(r) for r in range(len(runs))]
+    while any(len(b[0]) for b in buffers):
+        # every pair up to the smallest last buffered key of the runs that
+        # are not exhausted has been read, so it may be emitted
+        bound = min(
+            (b[1][-1] for r, b in enumerate(buffers)
+                if len(b[0]) and positions[r] < stops[r]),
+            default=np.iinfo(np.uint64).max)
+        parts = []
+        for b in buffers:
+            cut = np.searchsorted(b[1], bound, side="right")
+            parts.append([x[:cut] if x is not None else None for x in b])
+            b[:] = [x[cut:] if x is not None else None for x in b]
+        keys = np.concatenate([p[1] for p in parts])
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        pairs = np.concatenate([p[0] for p in parts])[order][first]
+        weights = None
+        if weight_spill is not None and len(keys):
+            weights = np.add.reduceat(
+                np.concatenate([p[2] for p in parts])[order],
+                np.flatnonzero(first))
+        if len(pairs):
+            yield pairs, weights
+        for r, b in enumerate(buffers):
+            if not len(b[0]) and positions[r] < stops[r]:
+                buffers[r] = read(r)
+
+
+def read_edgelist(
+        path,
+        delimiter = None,
+        columns = (0, 1),
+        skip_header = False,
+        comments = "#",
+        nodetype = None,
+        weight_column = None,
+        chunk_size = 1000000,
+        tmpdir = None):
+    """Streams an edge-list or CSV file into a symmetric CSR adjacency matrix.
+    The file is read in chunks of lines; node labels are mapped to contiguous
+    integer ids, chunk by chunk, with the labels new to each chunk numbered in
+    sorted order. Each chunk's id pairs, with reversed edges folded together
+    and self-loops dropped, are sorted, deduplicated and spilled to a
+    temporary file on disk as a run, and the runs are merged on disk (an
+    external sort), so that duplicates across the whole file are removed
+    before the adjacency matrix is built by a counting sort. Peak memory is
+    bounded by the size of the output matrix plus a chunk of the input. If a
+    weight column is given (e.g. contact durations), the weights of repeated
+    edges are summed.
+
+    Parameters
+    ----------
+    path : `str`
+        path to an edge-list file, optionally gzip-compressed
+    delimiter : `str`
+        field delimiter (e.g. ","). Defaults to whitespace.
+    columns : `tuple`
+        indices of the source and target fields
+    skip_header : `bool`
+        describes whether the first line is a header
+    comments : `str`
+        lines starting with this prefix are skipped
+    nodetype : callable
+        if provided, applied to the node labels (e.g. int)
+    weight_column : `int`
+        index of the edge weight field, if any
+    chunk_size : `int`
+        number of lines (and adjacency entries) processed at a time
+    tmpdir : `str`
+        directory for the temporary spill file
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix, binary unless weight_column is given
+    labels : `numpy.ndarray`
+        the original label of each node id
+
+    Raises
+    ------
+    ValueError: when the file contains no edges.
+    """
+    index = {}
+    runs = []
+    m = 0
+    with tempfile.TemporaryFile(dir=tmpdir) as spill, \
+            tempfile.TemporaryFile(dir=tmpdir) as weight_spill:
+        with _open_text(path) as fh:
+            if skip_header:
+                next(fh, None)
+            while True:
+                lines = list(itertools.islice(fh, chunk_size))
+                if not lines:
+                    break
+                labels, weights = _parse_chunk(
+                    lines, delimiter, columns, comments, weight_column)
+                if len(labels) == 0:
+                    continue
+                uniq, inv = np.unique(labels, return_inverse=True)
+                ids = np.fromiter(
+                    (index.setdefault(lab, len(index)) for lab in uniq.tolist()),
+                    dtype=np.int64,
+                    count=len(uniq))
+                k = len(labels) // 2
+                u, v = ids[inv[:k]], ids[inv[k:]]
+                keep = u != v
+                pairs, weights = _sorted_run(
+                    np.stack(
+                        [np.minimum(u[keep], v[keep]),
+                            np.maximum(u[keep], v[keep])],
+                        axis=1),
+                    None if weights is None else weights[keep])
+                spill.seek(16*m)
+                pairs.tofile(spill)
+                if weights is not None:
+                    weight_spill.seek(8*m)
+                    weights.tofile(weight_spill)
+                runs.append((m, m + len(pairs)))
+                m += len(pairs)
+        if not index:
+            raise ValueError("The edge list contains no edges.")
+
+        block_size = max(1, chunk_size // max(1, len(runs)))
+        A = _pairs_to_csr(
+            lambda: _merge_runs(
+                spill,
+                weight_spill if weight_column is not None else None,
+                runs,
+                len(index),
+                block_size),
+            len(index),
+            chunk_size)
+
+    labels = list(index)
+    if nodetype is not None:
+        labels = [nodetype(lab) for lab in labels]
+    return A, np.array(labels)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+"""
+generators.py
+
+Vectorized random graph generators that build sparse adjacency matrices
+directly, without NetworkX: the configuration model, Chung-Lu, Erdős-Rényi,
+stochastic block models, and projections of group memberships such as
+households and workplaces. All generators take a seed or a NumPy Generator,
+and return a symmetric CSR matrix, which can be passed to
+ContactNetwork.from_csr().
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+from contagion.edgelist import edges_to_csr
+
+
+def _triangular_pairs(k):
+    """Decodes indices into the strict lower triangle, k = v(v-1)/2 + u with
+    0 <= u < v, into node pairs.
+
+    Parameters
+    ----------
+    k : `numpy.ndarray`
+        pair indices
+
+    Returns
+    -------
+    u, v : `numpy.ndarray`
+        the pairs
+    """
+    k = np.asarray(k, dtype=np.int64)
+    v = ((1 + np.sqrt(1 + 8*k.astype(float)))/2).astype(np.int64)
+    # correct for floating-point error in the square root
+    v -= v*(v - 1)//2 > k
+    v += (v + 1)*v//2 <= k
+    return k - v*(v - 1)//2, v
+
+
+def _sample_pairs(num_pairs, p, rng):
+    """Samples each of num_pairs pairs independently with probability p, by
+    drawing the number of pairs and then that many distinct pair indices.
+    """
+    m = rng.binomial(num_pairs, p)
+    return rng.choice(num_pairs, size=m, replace=False)
+
+
+def erdos_renyi(n, p, seed = None):
+    """Generates an Erdős-Rényi G(n, p) random graph, in time proportional to
+    its number of edges.
+
+    Parameters
+    ----------
+    n : `int`
+        number of nodes
+    p : `float`
+        probability of each edge
+    seed : `int` or `numpy.random.Generator`
+        random seed
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    if not 0. <= p <= 1.:
+        raise ValueError("Edge probability must be between 0 and 1.")
+    rng = np.random.default_rng(seed)
+    u, v = _triangular_pairs(_sample_pairs(n*(n - 1)//2, p, rng))
+    return edges_to_csr(u, v, n)
+
+
+def stochastic_block_model(sizes, P, seed = None):
+    """Generates a stochastic block model, in which a node of block r and a
+    node of block s are adjacent with probability P[r][s].
+
+    Parameters
+    ----------
+    sizes : `List`
+        number of nodes in each block. Nodes are numbered block by block.
+    P : `numpy.ndarray`
+        a symmetric matrix of edge probabilities between blocks
+    seed : `int` or `numpy.random.Generator`
+        random seed
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    P = np.asarray(P, dtype=float)
+    K = len(sizes)
+    if P.shape != (K, K) or not np.allclose(P, P.T) \
+            or np.any((P < 0) | (P > 1)):
+        raise ValueError(
+            "Block probabilities must be a symmetric matrix of probabilities.")
+    rng = np.random.default_rng(seed)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    rows, cols = [], []
+    for r in range(K):
+        for s in range(r, K):
+            if r == s:
+                u, v = _triangular_pairs(
+                    _sample_pairs(sizes[r]*(sizes[r] - 1)//2, P[r, r], rng))
+            else:
+                k = _sample_pairs(sizes[r]*sizes[s], P[r, s], rng)
+                u, v = k//sizes[s], k % sizes[s]
+            rows.append(u + offsets[r])
+            cols.append(v + offsets[s])
+    return edges_to_csr(np.concatenate(rows), np.concatenate(cols), offsets[-1])
+
+
+def configuration_model(degrees, seed = None):
+    """Generates a random graph with (approximately) the given degree sequence
+    by pairing edge stubs uniformly at random. Self-loops and repeated edges
+    are dropped, so high-degree nodes may fall slightly short of their
+    degrees; if the degrees sum to an odd number, one stub is dropped.
+
+    Parameters
+    ----------
+    degrees : `numpy.ndarray`
+        the degree of each node
+    seed : `int` or `numpy.random.Generator`
+        random seed
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    degrees = np.asarray(degrees, dtype=np.int64)
+    if np.any(degrees < 0):
+        raise ValueError("Degrees must be non-negative.")
+    rng = np.random.default_rng(seed)
+    stubs = rng.permutation(np.repeat(np.arange(len(degrees)), degrees))
+    stubs = stubs[:len(stubs) - len(stubs) % 2]
+    return edges_to_csr(stubs[0::2], stubs[1::2], len(degrees))
+
+
+def chung_lu(weights, seed = None):
+    """Generates a Chung-Lu random graph, in which each node's expected degree
+    is (approximately) its weight. A Poisson number of edges, with mean half
+    the total weight, is drawn, and both endpoints of each edge are chosen
+    with probability proportional to weight; self-loops and repeated edges are
+    dropped. For sparse graphs this closely approximates the model in which
+    nodes u and v are adjacent with probability w_u*w_v/sum(w).
+
+    Parameters
+    ----------
+    weights : `numpy.ndarray`
+        the expected degree of each node
+    seed : `int` or `numpy.random.Generator`
+        random seed
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    weights = np.asarray(weights, dtype=float)
+    if np.any(weights < 0):
+        raise ValueError("Weights must be non-negative.")
+    rng = np.random.default_rng(seed)
+    total = weights.sum()
+    m = rng.poisson(total/2)
+    cumulative = np.cumsum(weights)
+    u = np.searchsorted(cumulative, rng.random(m)*total, side="right")
+    v = np.searchsorted(cumulative, rng.random(m)*total, side="right")
+    n = len(weights)
+    return edges_to_csr(np.minimum(u, n - 1), np.minimum(v, n - 1), n)
+
+
+def group_projection(groups, n = None, weight = 1.):
+    """Projects group memberships (e.g. households) onto a contact network in
+    which the members of each group form a clique.
+
+    Parameters
+    ----------
+    groups : `numpy.ndarray`
+        the group of each node, or a negative number for none
+    n : `int`
+        number of nodes. Defaults to len(groups).
+    weight : `float`
+        weight of the projected edges
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    """
+    rows, cols = _group_pairs(groups)
+    n = len(groups) if n is None else n
+    if weight == 1.:
+        return edges_to_csr(rows, cols, n)
+    return edges_to_csr(rows, cols, n, weights=np.full(len(rows), weight))
+
+
+def _group_pairs(groups):
+    """Helper function for group_projection(). Returns every pair of nodes in
+    the same group, processing groups of equal size together.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    nodes = np.flatnonzero(groups >= 0)
+    order = np.argsort(groups[nodes], kind="stable")
+    nodes = nodes[order]
+    _, first, counts = np.unique(
+        groups[nodes], return_index=True, return_counts=True)
+    rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for size in np.unique(counts[counts > 1]):
+        starts = first[counts == size]
+        members = nodes[starts[:, None] + np.arange(size)]
+        iu, ju = np.triu_indices(size, 1)
+        rows.append(members[:, iu].ravel())
+        cols.append(members[:, ju].ravel())
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def household_workplace(
+        n,
+        mean_household_size = 3.,
+        mean_workplace_size = 10.,
+        employment = 0.6,
+        household_weight = 1.,
+        workplace_weight = 1.,
+        seed = None):
+    """Generates a contact network by projecting random households and
+    workplaces: every node belongs to a household, a fraction of nodes belong
+    to a workplace, and the members of each household and workplace are in
+    contact. Group sizes are 1 plus a Poisson number. Edge weights of contacts
+    shared in both settings are summed.
+
+    Parameters
+    ----------
+    n : `int`
+        number of nodes
+    mean_household_size : `float`
+        mean household size (at least 1)
+    mean_workplace_size : `float`
+        mean workplace size (at least 1)
+    employment : `float`
+        fraction of nodes with a workplace
+    household_weight : `float`
+        weight of household contacts
+    workplace_weight : `float`
+        weight of workplace contacts
+    seed : `int` or `numpy.random.Generator`
+        random seed
+
+    Returns
+    -------
+    A : `scipy.sparse.csr_matrix`
+        an (n, n) adjacency matrix
+    households : `numpy.ndarray`
+        the household of each node
+    workplaces : `numpy.ndarray`
+        the workplace of each node, or -1
+    """
+    rng = np.random.default_rng(seed)
+
+    def assign(members, mean_size):
+        # consecutive runs of randomly ordered members form the groups
+        sizes = 1 + rng.poisson(
+            mean_size - 1, size=len(members)//max(int(mean_size), 1) + 1)
+        while sizes.sum() < len(members):
+            sizes = np.concatenate([sizes, 1 + rng.poisson(mean_size - 1, len(sizes))])
+        labels = np.repeat(np.arange(len(sizes)), sizes)[:len(members)]
+        groups = np.full(n, -1, dtype=np.int64)
+        groups[rng.permutation(members)] = labels
+        return groups
+
+    households = assign(np.arange(n), mean_household_size)
+    employed = np.flatnonzero(rng.random(n) < employment)
+    workplaces = assign(employed, mean_workplace_size)
+
+    h_rows, h_cols = _group_pairs(households)
+    w_rows, w_cols = _group_pairs(workplaces)
+    weights = np.concatenate([
+        np.full(len(h_rows), float(household_weight)),
+        np.full(len(w_rows), float(workplace_weight))])
+    A = edges_to_csr(
+        np.concatenate([h_rows, w_rows]),
+        np.concatenate([h_cols, w_cols]),
+        n,
+        weights=weights)
+    return A, households, workplaces
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+"""
+layers.py
+
+Multi-layer contact networks, in which contacts in different settings (e.g.
+households, schools, workplaces and the community) are held in separate
+sparse adjacency layers, each with its own time-varying transmission
+multiplier and closure schedule. Infection pressure is a weighted sum of
+per-layer matrix-vector products, so the combined matrix is never built
+during simulation.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+import scipy.sparse as sp
+from contagion import contagion
+
+
+class Layer():
+    """One layer of a MultiLayerNetwork: a sparse adjacency matrix together
+    with a transmission multiplier and the steps during which the layer is
+    closed.
+    """
+
+    def __init__(self, A, name = None, multiplier = 1., closed = None):
+        """Constructor for the Layer class.
+
+        Parameters
+        ----------
+        A : `scipy.sparse.spmatrix`
+            a symmetric (n, n) sparse adjacency matrix, whose edge weights are
+            the layer's contact weights (e.g. contact durations)
+        name : `str`
+            the layer's name, e.g. "school"
+        multiplier : `float` or `numpy.ndarray`
+            the layer's transmission multiplier, which scales the weight of its
+            contacts: either a constant or a 1-D schedule indexed by
+            simulation step, whose last value holds for all later steps
+        closed : `List`
+            (start, stop) step intervals during which the layer is switched
+            off; a stop of None leaves the layer closed indefinitely
+
+        Raises
+        ------
+        ValueError: when the multiplier is negative or the matrix is not
+        square.
+
+        Returns
+        -------
+        None
+        """
+        self.A = sp.csr_matrix(A)
+        if self.A.shape[0] != self.A.shape[1]:
+            raise ValueError("Layer adjacency matrices must be square.")
+        self.name = name
+        self.multiplier = np.asarray(multiplier, dtype=float)
+        if self.multiplier.ndim > 1 or np.any(self.multiplier < 0):
+            raise ValueError(
+                "Layer multipliers must be a non-negative constant or "
+                "schedule.")
+        self.closed = [
+            (start, np.inf if stop is None else stop)
+            for start, stop in (closed or [])]
+        return None
+
+    def close(self, start, stop = None):
+        """Switches the layer off from step start until (but not including)
+        step stop, e.g. layer.close(30) closes schools from day 30 onwards.
+
+        Parameters
+        ----------
+        start : `int`
+            first closed step
+        stop : `int`
+            first step after the closure. If None, the layer stays closed.
+
+        Returns
+        -------
+        None
+        """
+        self.closed.append((start, np.inf if stop is None else stop))
+        return None
+
+    def weight(self, t):
+        """Returns the layer's multiplier at a step, or 0 if it is closed.
+
+        Parameters
+        ----------
+        t : `int`
+            the step index
+
+        Returns
+        -------
+        weight : `float`
+            the multiplier
+        """
+        if any(start <= t < stop for start, stop in self.closed):
+            return 0.
+        if self.multiplier.ndim == 0:
+            return float(self.multiplier)
+        return float(self.multiplier[min(t, len(self.multiplier) - 1)])
+
+
+class MultiLayerNetwork(contagion.ContactNetwork):
+    """A contact network made of several Layers over the same nodes. It may be
+    used wherever a ContactNetwork is used by the numpy backend; infection
+    pressure at step t is the sum over open layers of the layer's weight at t
+    times its matrix-vector product with the infected record. The combined
+    adjacency matrix A, the sum of the layers' matrices, is only built if a
+    method that requires it (e.g. an immunization strategy) is called, and
+    degrees count a contact once per layer in which it occurs.
+    """
+
+    def __init__(
+            self,
+            layers,
+            fraction_infected = 0,
+            fraction_recovered = 0,
+            labels = None):
+        """Constructor for the MultiLayerNetwork class.
+
+        Parameters
+        ----------
+        layers : `List`
+            the Layers, or sparse adjacency matrices to be wrapped in Layers
+        fraction_infected : `float`
+            portion of the population infected at initialization
+        fraction_recovered : `float`
+            portion of the population recovered at initialization
+        labels : `numpy.ndarray`
+            the original label of each node index
+
+        Raises
+        ------
+        ValueError: when no layers are given or their sizes differ.
+
+        Returns
+        -------
+        None
+        """
+        self.layers = [
+            layer if isinstance(layer, Layer) else Layer(layer)
+            for layer in layers]
+        if not self.layers:
+            raise ValueError("At least one layer is required.")
+        n = self.layers[0].A.shape[0]
+        if any(layer.A.shape != (n, n) for layer in self.layers):
+            raise ValueError("Layers must have the same number of nodes.")
+        super().__init__(
+            fraction_infected = fraction_infected,
+            fraction_recovered = fraction_recovered,
+            A = sp.csr_matrix((n, n)),
+            labels = labels)
+        self._A = None
+        self.degrees = sum(np.diff(layer.A.indptr) for layer in self.layers)
+        return None
+
+    @property
+    def A(self):
+        """The sum of the layers' adjacency matrices, built on first access."""
+        if self._A is None:
+            self._A = sum(layer.A for layer in self.layers).tocsr()
+        return self._A
+
+    @A.setter
+    def A(self, A):
+        self._A = A
+
+    def layer(self, name):
+        """Returns the layer with a given name.
+
+        Parameters
+        ----------
+        name : `str`
+            the layer's name
+
+        Returns
+        -------
+        layer : `Layer`
+            the layer
+        """
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(name)
+
+    def pressure(self, x, t):
+        """Computes the infection pressure sum_l w_l(t) A_l x, skipping closed
+        layers.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            an (n, 1) or (n,) infectiousness-weighted infected record
+        t : `int`
+            the step index
+
+        Returns
+        -------
+        pressure : `numpy.ndarray`
+            the pressure on each node, shaped like x
+        """
+        pressure = np.zeros(np.shape(x))
+        for layer in self.layers:
+            w = layer.weight(t)
+            if w > 0:
+                pressure += w*(layer.A @ x)
+        return pressure
+
+    def reorder_nodes(self, order = "rcm"):
+        """Relabels the nodes of the network and of every layer consistently;
+        see ContactNetwork.reorder_nodes(). The combined matrix stays unbuilt
+        if it had not been built.
+
+        Parameters
+        ----------
+        order : `str` or `numpy.ndarray`
+            either "rcm" (reverse Cuthill-McKee ordering of the combined
+            matrix) or a permutation of the node indices, giving the old index
+            of each new node
+
+        Returns
+        -------
+        order : `numpy.ndarray`
+            the permutation applied
+
+        Raises
+        ------
+        ValueError: when order is not recognized or not a permutation.
+        """
+        built = self._A is not None
+        order = super().reorder_nodes(order)
+        for layer in self.layers:
+            layer.A = layer.A[order][:, order].tocsr()
+        if not built:
+            self._A = None
+        return order
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+"""
+models.py
+
+Declarative compartment models (SIR, SEIR, SIS, SEIRS, SIRD, or user-defined)
+for Contagion's table-driven simulation engine.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+
+
+class Transition():
+    """A transition between two compartments of a CompartmentModel."""
+
+    def __init__(self, source, target, rate, infectious = None):
+        """Constructor for the Transition class.
+
+        Parameters
+        ----------
+        source : `str`
+            compartment the transition leaves
+        target : `str`
+            compartment the transition enters
+        rate : `str` or `float`
+            per-step transition probability, either as a constant or as the
+            name of a Contagion rate (e.g. "beta", "gamma", or a key of the
+            rates argument)
+        infectious : `tuple` or `dict`
+            if provided, the transition is driven by infection pressure from
+            neighbors in these compartments, and rate is the per-contact
+            transmission probability. A dict maps compartments to their
+            relative infectiousness.
+
+        Returns
+        -------
+        None
+        """
+        self.source = source
+        self.target = target
+        self.rate = rate
+        if infectious is not None and not isinstance(infectious, dict):
+            infectious = {c: 1. for c in infectious}
+        self.infectious = infectious
+        return None
+
+
+class CompartmentModel():
+    """A compartment model, given as a table of transitions and compiled into
+    integer state codes.
+    """
+
+    def __init__(
+            self,
+            name,
+            compartments,
+            transitions,
+            susceptible = "S",
+            seed = "I",
+            recovered = None,
+            infected = None):
+        """Constructor for the CompartmentModel class.
+
+        Parameters
+        ----------
+        name : `str`
+            name of the model
+        compartments : `List`
+            compartment names; a node's state code is its compartment's index
+        transitions : `List`
+            the model's Transitions. Transitions out of the same compartment
+            compete for a single uniform draw per node, in the order given, so
+            their probabilities should sum to at most 1.
+        susceptible : `str`
+            compartment of initially susceptible nodes
+        seed : `str`
+            compartment of initially infected nodes
+        recovered : `str`
+            compartment of initially recovered and vaccinated nodes, if any
+        infected : `tuple`
+            compartments counted as infected in In_hist, and whose emptying
+            ends a simulation. Defaults to (seed,).
+
+        Raises
+        ------
+        ValueError: when a transition or role refers to an unknown compartment.
+
+        Returns
+        -------
+        None
+        """
+        self.name = name
+        self.compartments = list(compartments)
+        self.codes = {c: i for i, c in enumerate(self.compartments)}
+        self.transitions = list(transitions)
+        self.susceptible = susceptible
+        self.seed = seed
+        self.recovered = recovered
+        self.infected = tuple(infected) if infected is not None else (seed,)
+
+        roles = [susceptible, seed] + list(self.infected)
+        if recovered is not None:
+            roles.append(recovered)
+        for t in self.transitions:
+            roles += [t.source, t.target] + list(t.infectious or [])
+        for c in roles:
+            if c not in self.codes:
+                raise ValueError("Unknown compartment: {}.".format(c))
+        return None
+
+    def compile(self):
+        """Compiles the transition table into integer codes. Each compiled
+        transition is a tuple (source code, target code, rate, infectiousness),
+        where infectiousness is None for spontaneous transitions, or an array
+        giving the relative infectiousness of each state code.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        compiled : `List`
+            the compiled transitions
+        """
+        compiled = []
+        for t in self.transitions:
+            weights = None
+            if t.infectious is not None:
+                weights = np.zeros(len(self.compartments))
+                for c, w in t.infectious.items():
+                    weights[self.codes[c]] = w
+            compiled.append(
+                (self.codes[t.source], self.codes[t.target], t.rate, weights))
+        return compiled
+
+    def rate_names(self):
+        """Returns the names of the Contagion rates the model refers to.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        names : `List`
+            rate names, in order of first use
+        """
+        names = []
+        for t in self.transitions:
+            if isinstance(t.rate, str) and t.rate not in names:
+                names.append(t.rate)
+        return names
+
+
+SIR = CompartmentModel(
+    "sir",
+    ["S", "I", "R"],
+    [Transition("S", "I", "beta", infectious=("I",)),
+        Transition("I", "R", "gamma")],
+    recovered = "R")
+
+SEIR = CompartmentModel(
+    "seir",
+    ["S", "E", "I", "R"],
+    [Transition("S", "E", "beta", infectious=("I",)),
+        Transition("E", "I", "sigma"),
+        Transition("I", "R", "gamma")],
+    recovered = "R",
+    infected = ("E", "I"))
+
+SIS = CompartmentModel(
+    "sis",
+    ["S", "I"],
+    [Transition("S", "I", "beta", infectious=("I",)),
+        Transition("I", "S", "gamma")])
+
+SEIRS = CompartmentModel(
+    "seirs",
+    ["S", "E", "I", "R"],
+    [Transition("S", "E", "beta", infectious=("I",)),
+        Transition("E", "I", "sigma"),
+        Transition("I", "R", "gamma"),
+        Transition("R", "S", "omega")],
+    recovered = "R",
+    infected = ("E", "I"))
+
+SIRD = CompartmentModel(
+    "sird",
+    ["S", "I", "R", "D"],
+    [Transition("S", "I", "beta", infectious=("I",)),
+        Transition("I", "R", "gamma"),
+        Transition("I", "D", "mu")],
+    recovered = "R")
+
+MODELS = {m.name: m for m in [SIR, SEIR, SIS, SEIRS, SIRD]}
+
+
+def get_model(name):
+    """Returns a built-in compartment model by name.
+
+    Parameters
+    ----------
+    name : `str`
+        one of "sir", "seir", "sis", "seirs" or "sird" (case-insensitive)
+
+    Returns
+    -------
+    model : `CompartmentModel`
+        the model
+
+    Raises
+    ------
+    ValueError: when the model is not recognized.
+    """
+    if name.lower() not in MODELS:
+        raise ValueError("Invalid contagion type provided.")
+    return MODELS[name.lower()]
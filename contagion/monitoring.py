@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+monitoring.py
+
+Batched evaluation of monitor (sensor) placements. A simulation records each
+node's first-infection time once; the detection times of any number of
+monitor sets, given as a sparse node-by-set incidence matrix with one
+threshold per set, are then computed in a single vectorized pass.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+import scipy.sparse as sp
+from contagion import observers
+
+
+def _incidence_matrix(incidence, n):
+    """Validates a node-by-set incidence matrix.
+
+    Parameters
+    ----------
+    incidence : `scipy.sparse.spmatrix` or `numpy.ndarray`
+        an (n, K) matrix whose nonzero entries mark the nodes of each set
+    n : `int`
+        number of nodes
+
+    Returns
+    -------
+    incidence : `scipy.sparse.csc_matrix`
+        the binary (n, K) incidence matrix
+
+    Raises
+    ------
+    ValueError: when the matrix does not have n rows.
+    """
+    incidence = sp.csc_matrix(incidence)
+    if incidence.shape[0] != n:
+        raise ValueError("Incidence matrix must have one row per node.")
+    incidence.eliminate_zeros()
+    incidence.sum_duplicates()
+    incidence.data = np.ones_like(incidence.data, dtype=float)
+    return incidence
+
+
+def _thresholds(thresholds, K):
+    """Broadcasts monitor thresholds to one positive integer per set."""
+    thresholds = np.broadcast_to(
+        np.asarray(thresholds, dtype=np.int64), (K,)).copy()
+    if np.any(thresholds < 1):
+        raise ValueError("Monitor thresholds must be positive.")
+    return thresholds
+
+
+def detection_times(first_infection, incidence, thresholds):
+    """Computes the detection time of each monitor set: the step at which the
+    number of its nodes ever infected first reaches its threshold, i.e. the
+    threshold-th smallest first-infection time among its nodes.
+
+    Parameters
+    ----------
+    first_infection : `numpy.ndarray`
+        each node's first-infection time, negative if never infected
+    incidence : `scipy.sparse.spmatrix` or `numpy.ndarray`
+        an (n, K) matrix whose nonzero entries mark the nodes of each set
+    thresholds : `int` or `numpy.ndarray`
+        the number of infected nodes needed to detect each set
+
+    Returns
+    -------
+    times : `numpy.ndarray`
+        a length-K array of detection times, inf for undetected sets
+    """
+    first_infection = np.asarray(first_infection).ravel()
+    incidence = _incidence_matrix(incidence, len(first_infection))
+    K = incidence.shape[1]
+    thresholds = _thresholds(thresholds, K)
+
+    times = first_infection[incidence.indices].astype(float)
+    times[times < 0] = np.inf
+    sizes = np.diff(incidence.indptr)
+    sets = np.repeat(np.arange(K), sizes)
+    times = times[np.lexsort((times, sets))]
+
+    detected = np.full(K, np.inf)
+    feasible = thresholds <= sizes
+    detected[feasible] = times[
+        incidence.indptr[:-1][feasible] + thresholds[feasible] - 1]
+    return detected
+
+
+class FirstInfection(observers.Observer):
+    """Records the step at which each node is first infected (0, or the step
+    the observer was added, for initially infected nodes), indexed by the
+    nodes of the original network if immune nodes are compacted out. If
+    monitor sets are given, the observer requests that the run stops once
+    every set has been detected.
+    """
+
+    def __init__(self, incidence = None, thresholds = 1):
+        """Constructor for the FirstInfection class.
+
+        Parameters
+        ----------
+        incidence : `scipy.sparse.spmatrix` or `numpy.ndarray`
+            an optional (n, K) monitor-set incidence matrix
+        thresholds : `int` or `numpy.ndarray`
+            the number of infected nodes needed to detect each set
+
+        Returns
+        -------
+        None
+        """
+        self.incidence = incidence
+        self.thresholds = thresholds
+        return None
+
+    def start(self, sim):
+        index = observers._original_index(sim)
+        n = sim.network.n if index is None else sim.full_network.n
+        infected = np.flatnonzero(sim.network.In.ravel() > 0)
+        self.times = np.full(n, -1, dtype=np.int64)
+        self.times[infected if index is None else index[infected]] = sim.t
+        if self.incidence is not None:
+            self._rows = _incidence_matrix(self.incidence, n).tocsr()
+            self._thresholds = _thresholds(
+                self.thresholds, self._rows.shape[1])
+            self._counts = np.asarray(
+                self._rows[self.times >= 0].sum(axis=0)).ravel()
+        return None
+
+    def observe(self, sim, step, deltas):
+        new = np.flatnonzero(deltas["new_transmissions"].ravel())
+        index = observers._original_index(sim)
+        if index is not None:
+            new = index[new]
+        new = new[self.times[new] < 0]
+        self.times[new] = step
+        if self.incidence is None:
+            return False
+        if len(new):
+            self._counts += np.asarray(self._rows[new].sum(axis=0)).ravel()
+        return bool(np.all(self._counts >= self._thresholds))
+
+
+def evaluate_placements(
+        sim_factory,
+        incidence,
+        thresholds = 1,
+        runs = 1,
+        steps = np.inf):
+    """Simulates an ensemble of runs, and computes the detection times of K
+    monitor placements in each. Every run records first-infection times once,
+    and stops once all placements are detected or the epidemic ends.
+
+    Parameters
+    ----------
+    sim_factory : callable
+        called as sim_factory(run) to create the Contagion for each run,
+        e.g. lambda run: Contagion(network, beta=0.1, seed=run) after
+        resetting the network's compartments
+    incidence : `scipy.sparse.spmatrix` or `numpy.ndarray`
+        an (n, K) matrix whose nonzero entries mark the nodes of each set
+    thresholds : `int` or `numpy.ndarray`
+        the number of infected nodes needed to detect each set
+    runs : `int`
+        number of simulation runs
+    steps : `float`
+        maximum number of steps per run
+
+    Returns
+    -------
+    times : `numpy.ndarray`
+        a (runs, K) array of detection times, inf for undetected sets
+    """
+    times = []
+    for run in range(runs):
+        sim = sim_factory(run)
+        first = sim.add_observer(FirstInfection(incidence, thresholds))
+        sim.run_simulation(steps)
+        times.append(detection_times(first.times, incidence, thresholds))
+    return np.array(times)
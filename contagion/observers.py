@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+"""
+observers.py
+
+Observers are called by Contagion.simulate_step() after every step with the
+step's new transmissions, recoveries, symptomatic nodes and positive tests.
+They aggregate metrics online, in fixed-size buffers, and may request that a
+run stops early, so long simulations need not retain their full history.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+
+
+def _original_index(sim):
+    """Returns the original index of each node of a simulation's network, or
+    None if the network has not been compacted (see Contagion's
+    compact_immune).
+    """
+    if getattr(sim, "full_network", None) is None:
+        return None
+    return sim.node_index
+
+
+class RingBuffer():
+    """A fixed-capacity buffer of per-step values, which keeps the most recent
+    values once full.
+    """
+
+    def __init__(self, capacity, width = None, dtype = float):
+        """Constructor for the RingBuffer class.
+
+        Parameters
+        ----------
+        capacity : `int`
+            maximum number of values retained
+        width : `int`
+            if provided, each value is an array of this length
+        dtype : `numpy.dtype`
+            type of the values
+
+        Returns
+        -------
+        None
+        """
+        if capacity < 1:
+            raise ValueError("Capacity must be positive.")
+        shape = (capacity,) if width is None else (capacity, width)
+        self._data = np.zeros(shape, dtype=dtype)
+        self.capacity = capacity
+        self.count = 0
+        return None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, value):
+        """Appends a value, overwriting the oldest value if the buffer is full.
+
+        Parameters
+        ----------
+        value : `float` or `numpy.ndarray`
+            the value
+
+        Returns
+        -------
+        None
+        """
+        self._data[self.count % self.capacity] = value
+        self.count += 1
+        return None
+
+    def values(self):
+        """Returns the retained values, oldest first.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        values : `numpy.ndarray`
+            the values
+        """
+        if self.count <= self.capacity:
+            return self._data[:self.count].copy()
+        k = self.count % self.capacity
+        return np.concatenate([self._data[k:], self._data[:k]])
+
+
+class Observer():
+    """Base class for simulation observers. Subclasses override observe(), and
+    optionally start().
+    """
+
+    def start(self, sim):
+        """Called when the observer is added to a Contagion, e.g. to allocate
+        buffers.
+
+        Parameters
+        ----------
+        sim : `Contagion`
+            the simulation
+
+        Returns
+        -------
+        None
+        """
+        return None
+
+    def observe(self, sim, step, deltas):
+        """Called after each simulation step.
+
+        Parameters
+        ----------
+        sim : `Contagion`
+            the simulation, whose network holds the current compartments.
+            Once immune nodes are compacted out, the network and deltas only
+            cover the remaining nodes, whose original indices are
+            sim.node_index.
+        step : `int`
+            the number of steps completed
+        deltas : `dict`
+            the step's "new_transmissions", "new_recoveries",
+            "new_symptomatic", "new_tested" and "NewPositiveTests" (n, 1)
+            arrays. Entries for features that are not simulated are None.
+
+        Returns
+        -------
+        stop : `bool`
+            True to request that the run stops after this step
+        """
+        return False
+
+
+class NewCases(Observer):
+    """Records the number of new transmissions at each step."""
+
+    def __init__(self, capacity = 10000):
+        """Constructor for the NewCases class.
+
+        Parameters
+        ----------
+        capacity : `int`
+            number of most recent steps retained
+
+        Returns
+        -------
+        None
+        """
+        self.cases = RingBuffer(capacity)
+        self.total = 0.
+        return None
+
+    def observe(self, sim, step, deltas):
+        new_cases = np.sum(deltas["new_transmissions"])
+        self.cases.append(new_cases)
+        self.total += new_cases
+        return False
+
+
+class Peak(Observer):
+    """Tracks the peak number of infected nodes, the step it was reached, and
+    the cumulative number of infections, in constant memory.
+    """
+
+    def start(self, sim):
+        self.peak = float(np.sum(sim.network.In))
+        self.peak_step = sim.t
+        self.cumulative = self.peak
+        return None
+
+    def observe(self, sim, step, deltas):
+        infected = float(np.sum(sim.network.In))
+        if infected > self.peak:
+            self.peak = infected
+            self.peak_step = step
+        self.cumulative += np.sum(deltas["new_transmissions"])
+        return False
+
+
+class GroupFractions(Observer):
+    """Records the fraction of each group (e.g. community) that is infected at
+    each step. Groups are labelled by the nodes of the original network, and
+    keep their full sizes once immune nodes are compacted out.
+    """
+
+    def __init__(self, groups, capacity = 10000):
+        """Constructor for the GroupFractions class.
+
+        Parameters
+        ----------
+        groups : `numpy.ndarray`
+            a length-n array of non-negative integer group labels
+        capacity : `int`
+            number of most recent steps retained
+
+        Returns
+        -------
+        None
+        """
+        self.groups = np.asarray(groups, dtype=np.int64).ravel()
+        self.sizes = np.bincount(self.groups)
+        self.fractions = RingBuffer(capacity, width=len(self.sizes))
+        return None
+
+    def observe(self, sim, step, deltas):
+        index = _original_index(sim)
+        infected = np.bincount(
+            self.groups if index is None else self.groups[index],
+            weights=sim.network.In.ravel(),
+            minlength=len(self.sizes))
+        self.fractions.append(infected/np.maximum(self.sizes, 1))
+        return False
+
+
+class TestPositivity(Observer):
+    """Records the fraction of each step's tests that are positive."""
+
+    def __init__(self, capacity = 10000):
+        """Constructor for the TestPositivity class.
+
+        Parameters
+        ----------
+        capacity : `int`
+            number of most recent steps retained
+
+        Returns
+        -------
+        None
+        """
+        self.positivity = RingBuffer(capacity)
+        self.tests = 0.
+        self.positives = 0.
+        return None
+
+    def observe(self, sim, step, deltas):
+        if deltas["new_tested"] is None:
+            raise ValueError("Testing is not implemented.")
+        tests = np.sum(deltas["new_tested"] > 0)
+        positives = np.sum(deltas["NewPositiveTests"])
+        self.tests += tests
+        self.positives += positives
+        self.positivity.append(positives/tests if tests > 0 else np.nan)
+        return False
+
+
+class StopWhen(Observer):
+    """Requests early termination once a condition holds."""
+
+    def __init__(self, condition):
+        """Constructor for the StopWhen class.
+
+        Parameters
+        ----------
+        condition : callable
+            called as condition(sim, step, deltas) after each step; the run
+            stops once it returns True
+
+        Returns
+        -------
+        None
+        """
+        self.condition = condition
+        return None
+
+    def observe(self, sim, step, deltas):
+        return bool(self.condition(sim, step, deltas))
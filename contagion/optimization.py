@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+"""
+optimization.py
+
+Greedy, simulation-based selection of nodes to immunize. The expected
+outbreak size under a candidate immunization is estimated on a fixed set of
+random realizations (common random numbers), either by bond percolation,
+which reduces each realization of an SIR outbreak to a reachability search,
+or by simulation. Nodes are added one at a time by largest estimated
+reduction in outbreak size, with CELF lazy evaluation: candidates are kept
+in a priority queue by upper bounds on their marginal gains, and only the
+top candidate's gain is computed exactly.
+"""
+
+__author__ = "Lucas McCabe"
+
+import copy
+import heapq
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from contagion import comparison
+
+
+def _reach(P, seeds, blocked, tree = False):
+    """Finds the nodes reachable from seeds along the edges of P, without
+    entering blocked nodes, by breadth-first search over CSR rows.
+
+    Parameters
+    ----------
+    P : `scipy.sparse.csr_matrix`
+        a directed graph; row i holds the nodes that i transmits to
+    seeds : `numpy.ndarray`
+        indices of the initially infected nodes
+    blocked : `numpy.ndarray`
+        a boolean array marking immune nodes
+    tree : `bool`
+        if True, also returns the levels of a breadth-first search tree
+
+    Returns
+    -------
+    reached : `numpy.ndarray`
+        the indices of the reached nodes, including the seeds
+    levels : `List`
+        if tree is True, the (nodes, parents) of each level after the seeds
+    """
+    visited = blocked.copy()
+    visited[seeds] = True
+    reached = [seeds]
+    levels = []
+    frontier = seeds
+    while len(frontier):
+        starts, ends = P.indptr[frontier], P.indptr[frontier + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        neighbors = P.indices[offsets + np.arange(lengths.sum())]
+        new = ~visited[neighbors]
+        parents = np.repeat(frontier, lengths)[new]
+        frontier, first = np.unique(neighbors[new], return_index=True)
+        visited[frontier] = True
+        reached.append(frontier)
+        if tree and len(frontier):
+            levels.append((frontier, parents[first]))
+    if tree:
+        return np.concatenate(reached), levels
+    return np.concatenate(reached)
+
+
+class PercolationEstimator():
+    """Estimates outbreak sizes of discrete-time SIR epidemics by bond
+    percolation. In each realization, the initially infected nodes are drawn
+    as by ContactNetwork.init_Su_In_Re(), each node draws a geometrically
+    distributed infectious period D with parameter gamma, and each contact of
+    weight w transmits from node i with probability 1 - (1 - beta)**(w*D_i),
+    as with weighted_transmission. The outbreak is the set of nodes reachable
+    from the initially infected nodes along transmitting contacts, avoiding
+    immune nodes. This assumes constant beta and gamma and permanent
+    immunity.
+    """
+
+    def __init__(self, network, beta, gamma, runs = 100, seed = None):
+        """Constructor for the PercolationEstimator class.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the contact network, whose fraction_infected and
+            fraction_recovered set the initial conditions
+        beta : `float`
+            per-step transmission probability of a contact of weight 1
+        gamma : `float`
+            per-step recovery probability
+        runs : `int`
+            number of realizations
+        seed : `int`
+            seed for the realizations
+
+        Returns
+        -------
+        None
+        """
+        # initial conditions are drawn on a shallow copy, so the caller's
+        # seeds are left unchanged
+        network = copy.copy(network)
+        self.n = n = network.n
+        A = network.A.tocsr()
+        rows = np.repeat(np.arange(n), np.diff(A.indptr))
+        self.graphs, self.seeds, self.initially_immune = [], [], []
+        # each realization is also kept with an extra source node, n, that
+        # points to the initially infected nodes, for compiled searches
+        self._sourced, self._entry_rows = [], []
+        for s in np.random.SeedSequence(seed).spawn(runs):
+            init_seed, realization_seed = s.generate_state(2)
+            network.init_Su_In_Re(rng=np.random.default_rng(init_seed))
+            seeds = np.flatnonzero(network.In.ravel())
+            self.seeds.append(seeds)
+            self.initially_immune.append(network.Re.ravel() > 0)
+            rng = np.random.default_rng(realization_seed)
+            duration = rng.geometric(gamma, size=n)
+            keep = rng.random(A.nnz) < -np.expm1(
+                A.data*duration[rows]*np.log1p(-beta))
+            P = sp.csr_matrix(
+                (np.ones(keep.sum(), dtype=np.int8), (rows[keep], A.indices[keep])),
+                shape=(n, n))
+            self.graphs.append(P)
+            sourced = sp.csr_matrix(
+                (np.ones(P.nnz + len(seeds), dtype=np.int8),
+                    np.concatenate([P.indices, seeds]),
+                    np.append(P.indptr, P.nnz + len(seeds))),
+                shape=(n + 1, n + 1))
+            self._sourced.append(sourced)
+            self._entry_rows.append(
+                np.repeat(np.arange(n + 1), np.diff(sourced.indptr)))
+        return None
+
+    def outbreaks(self, immune, runs = None):
+        """Computes the nodes reached in each realization.
+
+        Parameters
+        ----------
+        immune : `numpy.ndarray`
+            a boolean array marking immunized nodes
+        runs : `List`
+            the realizations to compute. Defaults to all of them.
+
+        Returns
+        -------
+        outbreaks : `List`
+            the indices of the nodes reached in each realization
+        """
+        runs = range(len(self.graphs)) if runs is None else runs
+        outbreaks = []
+        for r in runs:
+            # blocked nodes keep their place in the search, but their
+            # contacts are redirected to themselves; initially infected
+            # nodes transmit even if immunized
+            blocked = np.append(immune | self.initially_immune[r], False)
+            blocked[self.seeds[r]] = False
+            G = self._sourced[r]
+            entry_rows = self._entry_rows[r]
+            redirect = blocked[entry_rows]
+            if redirect.any():
+                indices = G.indices.copy()
+                indices[redirect] = entry_rows[redirect]
+                G = sp.csr_matrix((G.data, indices, G.indptr), shape=G.shape)
+            order = csgraph.breadth_first_order(
+                G, self.n, directed=True, return_predecessors=False)[1:]
+            outbreaks.append(order[~blocked[order]])
+        return outbreaks
+
+    def gain_bounds(self, immune):
+        """Bounds the expected reduction in outbreak size from immunizing each
+        node: in each realization, immunizing a node can only cut off the
+        nodes in its subtree of a breadth-first search tree of the outbreak.
+
+        Parameters
+        ----------
+        immune : `numpy.ndarray`
+            a boolean array marking immunized nodes
+
+        Returns
+        -------
+        bounds : `numpy.ndarray`
+            the mean subtree size of each node over the realizations
+        """
+        bounds = np.zeros(self.n)
+        for r in range(len(self.graphs)):
+            reached, levels = _reach(
+                self.graphs[r],
+                self.seeds[r],
+                immune | self.initially_immune[r],
+                tree=True)
+            subtree = np.zeros(self.n)
+            subtree[reached] = 1.
+            for nodes, parents in reversed(levels):
+                np.add.at(subtree, parents, subtree[nodes])
+            # immunizing an initially infected node does not stop it
+            subtree[self.seeds[r]] = 0.
+            bounds += subtree
+        return bounds/len(self.graphs)
+
+    def sizes(self, immune):
+        """Computes the outbreak size of each realization.
+
+        Parameters
+        ----------
+        immune : `numpy.ndarray`
+            a boolean array marking immunized nodes
+
+        Returns
+        -------
+        sizes : `numpy.ndarray`
+            the number of nodes ever infected in each realization
+        """
+        return np.array([len(o) for o in self.outbreaks(immune)], dtype=float)
+
+
+class SimulationEstimator():
+    """Estimates outbreak sizes by simulating a fixed set of replicates with
+    comparison.run_replicate(), so that every immunization is evaluated under
+    the same initial conditions and random number streams.
+    """
+
+    def __init__(
+            self,
+            network,
+            runs = 20,
+            seed = None,
+            metric = "final_size",
+            steps = np.inf,
+            **sim_kwargs):
+        """Constructor for the SimulationEstimator class.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the contact network
+        runs : `int`
+            number of replicates
+        seed : `int`
+            seed from which the replicates' seeds are drawn
+        metric : `str` or callable
+            the outcome to minimize, as in comparison.run_replicate()
+        steps : `float`
+            maximum number of simulation steps
+        **sim_kwargs
+            keyword arguments for Contagion (e.g. beta, gamma)
+
+        Returns
+        -------
+        None
+        """
+        self.network = network
+        self.n = network.n
+        self.replicate_seeds = np.random.SeedSequence(seed).spawn(runs)
+        self.metric = metric
+        self.steps = steps
+        self.sim_kwargs = sim_kwargs
+        return None
+
+    def sizes(self, immune):
+        """Computes the metric of each replicate.
+
+        Parameters
+        ----------
+        immune : `numpy.ndarray`
+            a boolean array marking immunized nodes
+
+        Returns
+        -------
+        sizes : `numpy.ndarray`
+            the metric in each replicate
+        """
+        Im = immune.astype(float).reshape(self.n, 1) if immune.any() else None
+        return np.array([
+            comparison.run_replicate(
+                self.network, Im, s, self.metric, self.steps, **self.sim_kwargs)
+            for s in self.replicate_seeds])
+
+
+def greedy_immunization(estimator, Q, candidates = None):
+    """Selects Q nodes to immunize greedily, by largest estimated reduction in
+    expected outbreak size, with CELF lazy evaluation: candidates are kept in
+    a priority queue by an upper bound on their gain, and only the candidate
+    at the top is evaluated, being selected once its gain is current.
+
+    With a PercolationEstimator, the bounds are recomputed at every round
+    from the subtree sizes of breadth-first search trees of the outbreaks (a
+    node can only cut off its own subtree), so each selection is the exact
+    greedy choice; gains are only computed on the realizations that reach
+    the candidate. With a SimulationEstimator, every candidate's gain is
+    computed once, and earlier gains serve as bounds, which assumes that
+    gains shrink as the immunized set grows.
+
+    Parameters
+    ----------
+    estimator : `PercolationEstimator` or `SimulationEstimator`
+        the outbreak-size estimator
+    Q : `int`
+        number of nodes to immunize
+    candidates : `numpy.ndarray`
+        indices of the nodes that may be immunized. Defaults to all nodes.
+
+    Returns
+    -------
+    Im : `numpy.ndarray`
+        an (n, 1) array with 1 at indices to be immunized and 0 elsewhere
+    benefit : `numpy.ndarray`
+        the estimated expected outbreak size with the first k selected nodes
+        immunized, for k = 0, ..., Q
+    evaluations : `int`
+        the number of marginal gains computed
+    """
+    n = estimator.n
+    candidates = np.arange(n) if candidates is None \
+        else np.asarray(candidates, dtype=np.int64)
+    immune = np.zeros(n, dtype=bool)
+    percolation = isinstance(estimator, PercolationEstimator)
+
+    def gain(v):
+        trial = immune.copy()
+        trial[v] = True
+        if not percolation:
+            return sizes.mean() - estimator.sizes(trial).mean()
+        runs = np.flatnonzero(reached[:, v])
+        reduced = estimator.outbreaks(trial, runs)
+        return sum(
+            sizes[r] - len(o) for r, o in zip(runs, reduced))/len(sizes)
+
+    def evaluate():
+        if not percolation:
+            return estimator.sizes(immune), None
+        outbreaks = estimator.outbreaks(immune)
+        mask = np.zeros((len(outbreaks), n), dtype=bool)
+        for r, o in enumerate(outbreaks):
+            mask[r, o] = True
+        return np.array([len(o) for o in outbreaks], dtype=float), mask
+
+    sizes, reached = evaluate()
+    benefit = [sizes.mean()]
+    evaluations = 0
+    heap = []
+    if not percolation:
+        for v in candidates:
+            heapq.heappush(heap, (-gain(v), int(v), 0))
+            evaluations += 1
+
+    while len(benefit) <= Q:
+        if percolation:
+            # bounds for the current immunized set; round -1 marks a bound
+            # that has not been evaluated
+            bounds = estimator.gain_bounds(immune)
+            heap = [(-bounds[v], int(v), -1) for v in candidates if not immune[v]]
+            heapq.heapify(heap)
+        while heap:
+            neg_gain, v, round_evaluated = heapq.heappop(heap)
+            if round_evaluated == len(benefit) - 1 or neg_gain == 0.:
+                break
+            heapq.heappush(heap, (-gain(v), v, len(benefit) - 1))
+            evaluations += 1
+        else:
+            break
+        immune[v] = True
+        sizes, reached = evaluate()
+        benefit.append(sizes.mean())
+
+    Im = immune.astype(float).reshape(n, 1)
+    return Im, np.array(benefit), evaluations
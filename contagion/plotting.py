@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+plotting.py
+
+Figures of simulation histories. Plots are rendered from stored histories,
+either those of a finished Contagion or a dict of history arrays (e.g. a
+result of cache.ResultCache), without running any simulation. Matplotlib is
+required, and Seaborn's styling is applied if it is installed; neither is
+imported until this module is.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+try:
+    import seaborn as sns
+except ImportError:
+    sns = None
+
+# histories that may be plotted
+_HISTORIES = [
+    "Su_hist", "In_hist", "Re_hist", "Sy_hist", "EverTested_hist",
+    "NewPositiveTests_hist"]
+
+
+def plot_histories(histories, population = None, ax = None, show = True):
+    """Plots compartment histories.
+
+    Parameters
+    ----------
+    histories : `dict`
+        history arrays by name: "Su_hist", "In_hist" and "Re_hist", and
+        optionally "Sy_hist", "EverTested_hist" and "NewPositiveTests_hist"
+    population : `int`
+        number of nodes, the upper limit of the y axis. Defaults to the
+        largest total of the susceptible, infected and recovered histories.
+    ax : `matplotlib.axes.Axes`
+        the axes to draw on. Defaults to new axes.
+    show : `bool`
+        describes whether the figure is shown
+
+    Returns
+    -------
+    ax : `matplotlib.axes.Axes`
+        the axes
+    """
+    histories = {
+        name: np.asarray(histories[name]) for name in _HISTORIES
+        if histories.get(name) is not None}
+    if population is None:
+        population = np.max(
+            histories["Su_hist"] + histories["In_hist"] + histories["Re_hist"])
+    if sns is not None:
+        sns.set_style("white")
+    if ax is None:
+        _, ax = plt.subplots()
+
+    ax.plot(histories["Su_hist"], label="Susceptible")
+    ax.plot(histories["Re_hist"], label="Recovered")
+    if "Sy_hist" in histories:
+        ax.plot(histories["In_hist"], label="Infected Total")
+        ax.plot(histories["Sy_hist"], label="Infected Symptomatic")
+        ax.plot(
+            histories["In_hist"] - histories["Sy_hist"],
+            label="Infected Asymptomatic")
+    else:
+        ax.plot(histories["In_hist"], label="Infected")
+    if "EverTested_hist" in histories:
+        ax.plot(histories["EverTested_hist"], label="Nodes Ever Tested")
+    if "NewPositiveTests_hist" in histories:
+        ax.plot(histories["NewPositiveTests_hist"], label="New Positive Tests")
+
+    ax.set_title("Simulation Compartmental Histories")
+    ax.set_xlabel("Simulation Time")
+    ax.set_ylabel("Count of Nodes")
+    ax.set_ylim(0., population)
+    ax.legend()
+    if sns is not None:
+        sns.despine(ax=ax)
+    if show:
+        plt.show()
+    return ax
+
+
+def plot_simulation(sim, ax = None, show = True):
+    """Plots the histories of a simulation that has been run with
+    save_history, without running it further.
+
+    Parameters
+    ----------
+    sim : `Contagion`
+        the simulation
+    ax : `matplotlib.axes.Axes`
+        the axes to draw on. Defaults to new axes.
+    show : `bool`
+        describes whether the figure is shown
+
+    Raises
+    ------
+    ValueError: when the simulation has no histories.
+
+    Returns
+    -------
+    ax : `matplotlib.axes.Axes`
+        the axes
+    """
+    if not sim.save_history:
+        raise ValueError("The simulation has no histories to plot.")
+    histories = {name: getattr(sim, name, None) for name in _HISTORIES}
+    if not sim.track_symptomatic:
+        histories["Sy_hist"] = None
+    if not sim.implement_testing:
+        histories["EverTested_hist"] = None
+        histories["NewPositiveTests_hist"] = None
+    return plot_histories(
+        histories, population=sim._population(), ax=ax, show=show)
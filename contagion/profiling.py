@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+"""
+profiling.py
+
+Optional, low-overhead instrumentation of simulation phases and immunization
+methods: cumulative wall time, call counts and sizes of allocated arrays,
+exported as a dict or in the collapsed-stack format read by flame graph tools.
+"""
+
+__author__ = "Lucas McCabe"
+
+import functools
+import time
+
+
+_active = []
+
+
+def active():
+    """Returns the innermost profiler activated with a with statement, or None.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    profiler : `Profiler`
+        the active profiler, or None
+    """
+    return _active[-1] if _active else None
+
+
+class _NullPhase():
+    """A phase that records nothing, used when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def allocated(self, *arrays):
+        return None
+
+
+NULL_PHASE = _NullPhase()
+
+
+class _Phase():
+    """A timed phase of a Profiler."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.profiler._stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack
+        self.profiler._record(";".join(stack), elapsed, self.nbytes)
+        stack.pop()
+        return False
+
+    def allocated(self, *arrays):
+        """Records the sizes of arrays allocated during the phase.
+
+        Parameters
+        ----------
+        arrays : `numpy.ndarray`
+            the allocated arrays
+
+        Returns
+        -------
+        None
+        """
+        for a in arrays:
+            self.nbytes += getattr(a, "nbytes", 0)
+        return None
+
+
+class Profiler():
+    """Records cumulative wall time, call counts and allocated bytes per
+    phase. Phases nest: a phase entered while another is running is recorded
+    under the path "outer;inner".
+
+    A profiler can be attached to a Contagion (Contagion(profile=True), or by
+    setting its profiler attribute) or an Immunization, or activated for
+    everything run inside a with statement:
+
+        with profiling.Profiler() as prof:
+            sim.run_simulation()
+        prof.as_dict()
+    """
+
+    def __init__(self):
+        """Constructor for the Profiler class.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.stats = {}
+        self._stack = []
+        return None
+
+    def __enter__(self):
+        _active.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.remove(self)
+        return False
+
+    def phase(self, name):
+        """Returns a context manager that times a phase.
+
+        Parameters
+        ----------
+        name : `str`
+            name of the phase
+
+        Returns
+        -------
+        phase : context manager
+            the phase, whose allocated() method records array sizes
+        """
+        return _Phase(self, name)
+
+    def _record(self, path, elapsed, nbytes):
+        entry = self.stats.get(path)
+        if entry is None:
+            self.stats[path] = [elapsed, 1, nbytes]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+            entry[2] += nbytes
+
+    def reset(self):
+        """Discards all recorded statistics.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.stats = {}
+        return None
+
+    def as_dict(self):
+        """Exports the recorded statistics.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        stats : `dict`
+            maps each phase path to a dict with its cumulative wall "time" (in
+            seconds, including nested phases), "calls" and allocated "bytes"
+        """
+        return {
+            path: {"time": t, "calls": calls, "bytes": nbytes}
+            for path, (t, calls, nbytes) in self.stats.items()}
+
+    def to_collapsed(self, path = None):
+        """Exports the recorded statistics in the collapsed-stack format read
+        by flame graph tools (e.g. flamegraph.pl or speedscope): one line per
+        phase path, with the time spent in the phase itself, excluding nested
+        phases, in microseconds.
+
+        Parameters
+        ----------
+        path : `str`
+            if provided, the output is also written to this file
+
+        Returns
+        -------
+        collapsed : `str`
+            the collapsed stacks
+        """
+        self_time = {p: entry[0] for p, entry in self.stats.items()}
+        for p, entry in self.stats.items():
+            parent = p.rpartition(";")[0]
+            if parent in self_time:
+                self_time[parent] -= entry[0]
+        collapsed = "".join(
+            "{} {}\n".format(p, max(0, int(round(t*1e6))))
+            for p, t in self_time.items())
+        if path is not None:
+            with open(path, "w") as fh:
+                fh.write(collapsed)
+        return collapsed
+
+
+def profiled(method):
+    """Decorates a method so that its calls are recorded as a phase by the
+    instance's profiler attribute, or else by the active profiler.
+
+    Parameters
+    ----------
+    method : callable
+        the method
+
+    Returns
+    -------
+    wrapper : callable
+        the decorated method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = getattr(self, "profiler", None) or active()
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        with profiler.phase(method.__name__) as phase:
+            result = method(self, *args, **kwargs)
+            phase.allocated(result)
+        return result
+    return wrapper
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+"""
+rare_events.py
+
+Estimation of the probability of rare outcomes, such as the peak number of
+infected nodes exceeding a large fraction of the network, by fixed-effort
+multilevel splitting: simulations that reach an intermediate level of
+infection are cloned and continued with fresh randomness, so that effort
+concentrates on the trajectories that lead towards the rare event.
+"""
+
+__author__ = "Lucas McCabe"
+
+import copy
+import numpy as np
+
+
+_NETWORK_STATE = [
+    "Su", "In", "Re", "Sy", "Im", "EverTested", "NewPositiveTests", "state"]
+_SIM_STATE = ["Im_this_step", "contact_queue"]
+_CAMPAIGN_STATE = [
+    "next", "first_doses", "second_doses", "protected", "_second_queue"]
+
+
+def _snapshot(sim):
+    """Copies the state of a simulation needed to continue it.
+
+    Parameters
+    ----------
+    sim : `Contagion`
+        the simulation
+
+    Returns
+    -------
+    snapshot : `dict`
+        copies of the simulation's compartment records, step index and
+        campaign progress
+    """
+    net = sim.network
+    snapshot = {"t": sim.t, "network": {}, "sim": {}, "campaign": {}}
+    for name in _NETWORK_STATE:
+        if getattr(net, name, None) is not None:
+            snapshot["network"][name] = getattr(net, name).copy()
+    for name in _SIM_STATE:
+        if hasattr(sim, name):
+            snapshot["sim"][name] = copy.copy(getattr(sim, name))
+    if sim.campaign is not None:
+        for name in _CAMPAIGN_STATE:
+            snapshot["campaign"][name] = copy.deepcopy(
+                getattr(sim.campaign, name))
+    return snapshot
+
+
+def _restore(sim, snapshot):
+    """Restores a simulation to a snapshot taken by _snapshot().
+
+    Parameters
+    ----------
+    sim : `Contagion`
+        the simulation
+    snapshot : `dict`
+        the snapshot
+
+    Returns
+    -------
+    None
+    """
+    for name, value in snapshot["network"].items():
+        setattr(sim.network, name, value.copy())
+    for name, value in snapshot["sim"].items():
+        setattr(sim, name, copy.copy(value))
+    for name, value in snapshot["campaign"].items():
+        setattr(sim.campaign, name, copy.deepcopy(value))
+    sim._set_step(snapshot["t"])
+    return None
+
+
+def _run_to_level(sim, level, max_steps):
+    """Advances a simulation until its number of infected nodes reaches level,
+    the infection dies out, or max_steps steps have been taken in total.
+
+    Returns
+    -------
+    reached : `bool`
+        describes whether the level was reached
+    """
+    while True:
+        infected = np.sum(sim.network.In)
+        if infected >= level:
+            return True
+        if infected == 0 or sim.t >= max_steps:
+            return False
+        sim.simulate_step()
+
+
+def estimate_peak_exceedance(
+        sim_factory,
+        fraction,
+        levels = 5,
+        particles = 100,
+        repetitions = 10,
+        max_steps = 1000,
+        seed = None):
+    """Estimates the probability that the number of infected nodes exceeds a
+    fraction of the network at some step, by fixed-effort multilevel
+    splitting. The infected count must pass a sequence of increasing levels.
+    At each level, a fixed number of particles (simulations) are continued
+    from states that reached the previous level, each with its own random
+    number stream, and the fraction reaching the level estimates the
+    conditional probability of passing it. The states that reached the level
+    are then resampled with replacement. The product of the fractions is an
+    unbiased estimate of the probability; independent repetitions give its
+    variance.
+
+    Parameters
+    ----------
+    sim_factory : callable
+        called as sim_factory(seed) to create a Contagion in its initial state
+        for each repetition. Its histories are not maintained during
+        splitting. Partitioned, scheduled-event and compacted simulations
+        are not supported.
+    fraction : `float`
+        the peak fraction of infected nodes whose exceedance is estimated
+    levels : `int` or `List`
+        the intermediate infected counts, or their number, in which case they
+        are evenly spaced between the initial count and the target
+    particles : `int`
+        number of particles per level
+    repetitions : `int`
+        number of independent splitting estimates
+    max_steps : `int`
+        simulation horizon
+    seed : `int`
+        seed for the particles' random number streams and resampling
+
+    Returns
+    -------
+    results : `dict`
+        "estimate" (the mean over repetitions), "variance" (the estimated
+        variance of that mean), "std_error", "estimates" (one per repetition)
+        and "level_probabilities" (for each repetition, the list of
+        conditional probabilities of passing each level)
+
+    Raises
+    ------
+    ValueError: when the simulation does not support cloning.
+    """
+    root = np.random.SeedSequence(seed)
+    estimates = []
+    level_probabilities = []
+    for rep_seed in root.spawn(repetitions):
+        factory_seed, resample_seed, particle_seed = rep_seed.spawn(3)
+        sim = sim_factory(int(factory_seed.generate_state(1)[0]))
+        if sim.partitions is not None or sim.scheduled_events \
+                or sim.compact_immune:
+            raise ValueError(
+                "Splitting does not support partitioned, scheduled-event or "
+                "compacted simulations.")
+        sim.save_history = False
+        n = sim.network.n
+        target = np.floor(fraction*n) + 1
+        start = np.sum(sim.network.In)
+        if np.ndim(levels) == 0:
+            thresholds = np.linspace(start, target, int(levels) + 1)[1:]
+            thresholds = np.unique(np.ceil(thresholds))
+        else:
+            thresholds = np.append(
+                np.sort(np.asarray(levels, dtype=float)), target)
+            thresholds = thresholds[thresholds <= target]
+
+        resample_rng = np.random.default_rng(resample_seed)
+        particle_seeds = iter(particle_seed.spawn(particles*len(thresholds)))
+        states = [_snapshot(sim)]*particles
+        probabilities = []
+        for level in thresholds:
+            reached = []
+            for state in states:
+                _restore(sim, state)
+                sim.rng = np.random.default_rng(next(particle_seeds))
+                if _run_to_level(sim, level, max_steps):
+                    reached.append(_snapshot(sim))
+            probabilities.append(len(reached)/particles)
+            if not reached:
+                break
+            states = [reached[i]
+                for i in resample_rng.integers(len(reached), size=particles)]
+        probabilities += [0.]*(len(thresholds) - len(probabilities))
+        estimates.append(np.prod(probabilities))
+        level_probabilities.append(probabilities)
+
+    estimates = np.array(estimates)
+    variance = estimates.var(ddof=1)/repetitions if repetitions > 1 else np.nan
+    return {
+        "estimate": estimates.mean(),
+        "variance": variance,
+        "std_error": np.sqrt(variance),
+        "estimates": estimates,
+        "level_probabilities": level_probabilities}
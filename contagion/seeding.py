@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+"""
+seeding.py
+
+Selection of initially infected and recovered nodes. Seed sets are stored
+compactly as arrays of node indices, and are drawn by sampling indices
+directly, so that drawing and storing a seed set costs time and memory
+proportional to its size rather than to the size of the network. Strategies
+select seeds uniformly at random, within a range of degree quantiles, within a
+community or a local cluster of the network, or from an explicit node list.
+"""
+
+__author__ = "Lucas McCabe"
+
+import numpy as np
+
+
+def _generator(rng):
+    """Returns a numpy.random.Generator. A Generator is returned unchanged; if
+    rng is None or NumPy's global random module, a Generator is seeded from
+    the global random state, so that np.random.seed() still makes seeding
+    reproducible.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None or rng is np.random:
+        return np.random.default_rng(
+            np.random.randint(0, 2**63 - 1, dtype=np.int64))
+    return np.random.default_rng(rng)
+
+
+def sample_indices(population, k, rng = None):
+    """Samples k distinct elements of a population uniformly at random, in
+    time proportional to k when the population is a range of integers.
+
+    Parameters
+    ----------
+    population : `int` or `numpy.ndarray`
+        the number of nodes, in which case node indices are sampled, or an
+        array of candidate node indices
+    k : `int`
+        sample size
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    indices : `numpy.ndarray`
+        the sample, in random order
+
+    Raises
+    ------
+    ValueError: when k is larger than the population.
+    """
+    size = population if np.ndim(population) == 0 else len(population)
+    if not 0 <= k <= size:
+        raise ValueError("Cannot sample more nodes than the population.")
+    sample = _generator(rng).choice(size, size=int(k), replace=False)
+    if np.ndim(population) == 0:
+        return sample.astype(np.int64)
+    return np.asarray(population, dtype=np.int64)[sample]
+
+
+class SeedSet():
+    """The initially infected and recovered nodes of a network, as arrays of
+    node indices. A SeedSet is applied to a ContactNetwork with
+    ContactNetwork.seed() or apply(), which fill the network's compartment
+    arrays.
+    """
+
+    def __init__(self, infected, recovered = ()):
+        """Constructor for the SeedSet class.
+
+        Parameters
+        ----------
+        infected : `numpy.ndarray`
+            indices of the initially infected nodes
+        recovered : `numpy.ndarray`
+            indices of the initially recovered nodes
+
+        Raises
+        ------
+        ValueError: when a node is repeated, or both infected and recovered.
+
+        Returns
+        -------
+        None
+        """
+        self.infected = np.asarray(infected, dtype=np.int64).ravel()
+        self.recovered = np.asarray(recovered, dtype=np.int64).ravel()
+        nodes = np.concatenate([self.infected, self.recovered])
+        if len(np.unique(nodes)) != len(nodes):
+            raise ValueError(
+                "Seed nodes must be distinct, and cannot be both infected and "
+                "recovered.")
+        return None
+
+    def __len__(self):
+        return len(self.infected) + len(self.recovered)
+
+    def to_arrays(self, n):
+        """Builds (n, 1) susceptible, infected and recovered arrays.
+
+        Parameters
+        ----------
+        n : `int`
+            number of nodes
+
+        Returns
+        -------
+        susceptible, infected, recovered : `numpy.ndarray`
+            the compartment arrays
+        """
+        infected = np.zeros((n, 1))
+        recovered = np.zeros((n, 1))
+        infected[self.infected] = 1.
+        recovered[self.recovered] = 1.
+        return 1. - infected - recovered, infected, recovered
+
+    def apply(self, network):
+        """Sets a network's initial compartments to this seed set. Equivalent
+        to network.seed(self).
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the network
+
+        Returns
+        -------
+        None
+        """
+        network.seed(self)
+        return None
+
+
+def by_count(n, infected, recovered = 0, rng = None):
+    """Selects seeds uniformly at random.
+
+    Parameters
+    ----------
+    n : `int`
+        number of nodes
+    infected : `int`
+        number of infected seeds
+    recovered : `int`
+        number of recovered seeds
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds
+    """
+    nodes = sample_indices(n, infected + recovered, rng)
+    return SeedSet(nodes[:infected], nodes[infected:])
+
+
+def by_fraction(n, fraction_infected, fraction_recovered = 0., rng = None):
+    """Selects seeds uniformly at random, as fractions of the network.
+
+    Parameters
+    ----------
+    n : `int`
+        number of nodes
+    fraction_infected : `float`
+        portion of the population infected
+    fraction_recovered : `float`
+        portion of the population recovered
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds
+    """
+    infected = round(fraction_infected*n)
+    recovered = round(fraction_infected*n + fraction_recovered*n) - infected
+    return by_count(n, infected, recovered, rng)
+
+
+def by_degree(degrees, count, quantiles = (0.9, 1.), rng = None):
+    """Selects infected seeds uniformly at random among the nodes whose degree
+    lies within a range of degree quantiles, e.g. (0.9, 1.) for the
+    best-connected tenth of the network.
+
+    Parameters
+    ----------
+    degrees : `numpy.ndarray`
+        the degree of each node, e.g. ContactNetwork.degrees
+    count : `int`
+        number of infected seeds
+    quantiles : `tuple`
+        the lower and upper degree quantiles
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds
+    """
+    degrees = np.asarray(degrees).ravel()
+    low, high = np.quantile(degrees, quantiles)
+    candidates = np.flatnonzero((degrees >= low) & (degrees <= high))
+    return SeedSet(sample_indices(candidates, count, rng))
+
+
+def by_group(groups, count, group = None, rng = None):
+    """Selects infected seeds uniformly at random within one group of nodes,
+    e.g. a community, household or geographic region.
+
+    Parameters
+    ----------
+    groups : `numpy.ndarray`
+        the group of each node
+    count : `int`
+        number of infected seeds
+    group : hashable
+        the group to seed. Defaults to the group of a node chosen uniformly at
+        random.
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds
+    """
+    rng = _generator(rng)
+    groups = np.asarray(groups).ravel()
+    if group is None:
+        group = groups[rng.integers(len(groups))]
+    candidates = np.flatnonzero(groups == group)
+    return SeedSet(sample_indices(candidates, min(count, len(candidates)), rng))
+
+
+def by_cluster(A, count, center = None, rng = None):
+    """Selects a local cluster of infected seeds: the count nodes nearest to a
+    center node, found by breadth-first search, with ties at the last distance
+    broken at random.
+
+    Parameters
+    ----------
+    A : `scipy.sparse.csr_matrix`
+        the adjacency matrix, e.g. ContactNetwork.A
+    count : `int`
+        number of infected seeds
+    center : `int`
+        index of the center node. Defaults to a node chosen uniformly at
+        random.
+    rng : `numpy.random.Generator`
+        random number generator. Defaults to NumPy's global random state.
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds. Fewer than count nodes are seeded if the center's
+        component is smaller than count.
+    """
+    rng = _generator(rng)
+    n = A.shape[0]
+    if center is None:
+        center = rng.integers(n)
+    visited = np.zeros(n, dtype=bool)
+    visited[center] = True
+    cluster = [np.array([center], dtype=np.int64)]
+    frontier = cluster[0]
+    size = 1
+    while size < count and len(frontier):
+        # neighbors of the frontier, gathered from the CSR rows
+        starts, ends = A.indptr[frontier], A.indptr[frontier + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        neighbors = A.indices[offsets + np.arange(lengths.sum())]
+        frontier = np.unique(neighbors[~visited[neighbors]])
+        visited[frontier] = True
+        if size + len(frontier) > count:
+            frontier = sample_indices(frontier, count - size, rng)
+        cluster.append(frontier.astype(np.int64))
+        size += len(frontier)
+    return SeedSet(np.concatenate(cluster))
+
+
+def from_nodes(infected, recovered = ()):
+    """Uses an explicit list of seeds.
+
+    Parameters
+    ----------
+    infected : `List`
+        indices of the infected seeds
+    recovered : `List`
+        indices of the recovered seeds
+
+    Returns
+    -------
+    seeds : `SeedSet`
+        the seeds
+    """
+    return SeedSet(infected, recovered)
+
+
+def replicates(seed_set_factory, runs, seed = None):
+    """Draws the seed sets of many replicates, each from its own random number
+    stream. Storage is proportional to the total number of seeds.
+
+    Parameters
+    ----------
+    seed_set_factory : callable
+        called as seed_set_factory(rng) with a numpy.random.Generator, e.g.
+        lambda rng: seeding.by_count(n, 10, rng = rng)
+    runs : `int`
+        number of replicates
+    seed : `int`
+        seed from which the replicates' streams are spawned
+
+    Returns
+    -------
+    seed_sets : `List`
+        the SeedSets
+    """
+    return [
+        seed_set_factory(np.random.default_rng(s))
+        for s in np.random.SeedSequence(seed).spawn(runs)]
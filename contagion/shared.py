@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+shared.py
+
+Zero-copy handoff of contact networks to worker processes. A SharedNetwork
+publishes a network's adjacency, degree and immunization arrays once, in
+named shared memory blocks; workers attach read-only ContactNetwork views by
+name, each with its own compartment arrays. Requires Python 3.8 or later.
+"""
+
+__author__ = "Lucas McCabe"
+
+import sys
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+import scipy.sparse as sp
+from contagion import contagion
+
+
+def _create_block(array):
+    """Copies an array into a new shared memory block.
+
+    Parameters
+    ----------
+    array : `numpy.ndarray`
+        the array
+
+    Returns
+    -------
+    block : `multiprocessing.shared_memory.SharedMemory`
+        the block
+    spec : `tuple`
+        the block's name, and the array's dtype and shape
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, (block.name, array.dtype.str, array.shape)
+
+
+def _attach_block(spec):
+    """Attaches a read-only view of a shared memory block.
+
+    Parameters
+    ----------
+    spec : `tuple`
+        the block's name, and the array's dtype and shape
+
+    Returns
+    -------
+    block : `multiprocessing.shared_memory.SharedMemory`
+        the block, which is kept open for as long as the view is in use
+    view : `numpy.ndarray`
+        the read-only view
+    """
+    name, dtype, shape = spec
+    if sys.version_info >= (3, 13):
+        block = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # the publisher owns the block, so it is not registered with this
+        # process's resource tracker, which would unlink it on exit
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            block = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    view.setflags(write=False)
+    # the block is only closed once the view (and every view of it) is gone
+    weakref.finalize(view, block.close)
+    return block, view
+
+
+def _release(blocks):
+    """Closes and unlinks shared memory blocks."""
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # views attached in this process keep the mapping alive
+            pass
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedNetwork():
+    """Publishes a ContactNetwork's adjacency matrix, degrees and immunization
+    arrays in shared memory. The blocks are released by close(), when the
+    SharedNetwork is used as a context manager and its block exits, or when it
+    is garbage-collected:
+
+        with shared.SharedNetwork(network) as published:
+            pool.map(work, [published.spec]*runs)
+
+    where each worker calls shared.attach(spec).
+    """
+
+    def __init__(self, network):
+        """Constructor for the SharedNetwork class.
+
+        Parameters
+        ----------
+        network : `ContactNetwork`
+            the network to publish
+
+        Returns
+        -------
+        None
+        """
+        A = network.A
+        index_dtype = np.int32 if max(A.shape[0], A.nnz) < 2**31 else np.int64
+        arrays = {
+            "indptr": A.indptr.astype(index_dtype, copy=False),
+            "indices": A.indices.astype(index_dtype, copy=False),
+            "data": A.data,
+            "degrees": network.degrees}
+        if network.Im is not None:
+            arrays["Im"] = network.Im
+        if network.Mo is not None:
+            arrays["Mo"] = network.Mo
+
+        self._blocks = []
+        blocks = {}
+        for key, array in arrays.items():
+            block, spec = _create_block(array)
+            self._blocks.append(block)
+            blocks[key] = spec
+        self.spec = {
+            "n": network.n,
+            "blocks": blocks,
+            "im_type": network.im_type,
+            "im_starts_after": network.im_starts_after,
+            "efficacy": network.efficacy,
+            "mo_thresh": network.mo_thresh}
+        self._finalizer = weakref.finalize(self, _release, self._blocks)
+        return None
+
+    def close(self):
+        """Releases the shared memory blocks. Attached networks must no longer
+        be used.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self._finalizer()
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def attach(spec, fraction_infected = 0, fraction_recovered = 0):
+    """Attaches a ContactNetwork to arrays published by a SharedNetwork. The
+    adjacency matrix, degrees and immunization arrays are read-only views of
+    the shared memory; the compartment arrays are private to the network.
+    Simulations that modify the immunization array (e.g. with waning
+    immunization) replace it with a private copy.
+
+    Parameters
+    ----------
+    spec : `dict`
+        the spec attribute of a SharedNetwork
+    fraction_infected : `float`
+        portion of the population infected at initialization
+    fraction_recovered : `float`
+        portion of the population recovered at initialization
+
+    Returns
+    -------
+    network : `ContactNetwork`
+        the attached network
+    """
+    blocks = []
+    views = {}
+    for key, block_spec in spec["blocks"].items():
+        block, views[key] = _attach_block(block_spec)
+        blocks.append(block)
+    n = spec["n"]
+    A = sp.csr_matrix(
+        (views["data"], views["indices"], views["indptr"]), shape=(n, n))
+    network = contagion.ContactNetwork.from_csr(
+        A,
+        fraction_infected=fraction_infected,
+        fraction_recovered=fraction_recovered)
+    network.degrees = views["degrees"]
+    network.Im = views.get("Im")
+    network.Mo = views.get("Mo")
+    for key in ["im_type", "im_starts_after", "efficacy", "mo_thresh"]:
+        setattr(network, key, spec[key])
+    # keep the blocks open for as long as the network uses them
+    network._shared_memory = blocks
+    return network
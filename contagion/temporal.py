@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+
+"""
+temporal.py
+
+Temporal contact networks, whose contacts change from step to step. Contacts
+are given as a stream of per-step edge lists, either as complete snapshots or
+as edges added to and removed from the previous step's network. Edge lists
+are held in EdgeTables, which may live in memory or be memory-mapped from
+disk, so that long, fine-grained contact traces are read one step at a time.
+At each simulation step, transmission runs directly on that step's sparse
+adjacency matrix, while the compartment records carry over.
+"""
+
+__author__ = "Lucas McCabe"
+
+import os
+import numpy as np
+import scipy.sparse as sp
+from contagion import contagion
+from contagion.edgelist import edges_to_csr
+
+
+class EdgeTable():
+    """Per-step edge lists, stored as flat arrays of edge endpoints (and
+    optionally weights) sorted by step, with the edges of step t at positions
+    offsets[t] to offsets[t + 1]. The arrays may be memory-mapped.
+    """
+
+    def __init__(self, offsets, rows, cols, weights = None):
+        """Constructor for the EdgeTable class.
+
+        Parameters
+        ----------
+        offsets : `numpy.ndarray`
+            the (steps + 1) positions at which each step's edges start
+        rows : `numpy.ndarray`
+            source node of each edge
+        cols : `numpy.ndarray`
+            target node of each edge
+        weights : `numpy.ndarray`
+            weight of each edge (e.g. contact duration). Defaults to 1.
+
+        Raises
+        ------
+        ValueError: when the arrays are inconsistent.
+
+        Returns
+        -------
+        None
+        """
+        self.offsets = np.asarray(offsets)
+        self.rows, self.cols, self.weights = rows, cols, weights
+        if len(self.offsets) < 1 or self.offsets[0] != 0 \
+                or self.offsets[-1] != len(rows) or len(rows) != len(cols) \
+                or (weights is not None and len(weights) != len(rows)) \
+                or np.any(np.diff(self.offsets) < 0):
+            raise ValueError("Invalid edge table.")
+        return None
+
+    @classmethod
+    def from_events(cls, steps, rows, cols, weights = None, num_steps = None):
+        """Creates an edge table from contact events, each with a step.
+
+        Parameters
+        ----------
+        steps : `numpy.ndarray`
+            the step of each contact
+        rows : `numpy.ndarray`
+            source node of each contact
+        cols : `numpy.ndarray`
+            target node of each contact
+        weights : `numpy.ndarray`
+            weight of each contact
+        num_steps : `int`
+            number of steps. Defaults to the last step with contacts, plus 1.
+
+        Returns
+        -------
+        table : `EdgeTable`
+            the edge table
+        """
+        steps = np.asarray(steps, dtype=np.int64)
+        order = np.argsort(steps, kind="stable")
+        num_steps = int(steps.max()) + 1 if num_steps is None else num_steps
+        offsets = np.searchsorted(steps[order], np.arange(num_steps + 1))
+        return cls(
+            offsets,
+            np.asarray(rows)[order],
+            np.asarray(cols)[order],
+            None if weights is None else np.asarray(weights, dtype=float)[order])
+
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        """Creates an edge table from a list of per-step sparse adjacency
+        matrices.
+
+        Parameters
+        ----------
+        snapshots : `List`
+            one sparse matrix per step
+
+        Returns
+        -------
+        table : `EdgeTable`
+            the edge table, holding each edge of each matrix once
+        """
+        rows, cols, weights, steps = [], [], [], []
+        for t, A in enumerate(snapshots):
+            A = sp.triu(A, k=1).tocoo()
+            rows.append(A.row)
+            cols.append(A.col)
+            weights.append(A.data.astype(float))
+            steps.append(np.full(A.nnz, t))
+        return cls.from_events(
+            np.concatenate(steps),
+            np.concatenate(rows),
+            np.concatenate(cols),
+            np.concatenate(weights),
+            num_steps=len(snapshots))
+
+    @classmethod
+    def load(cls, path, mmap = True):
+        """Loads an edge table saved by save().
+
+        Parameters
+        ----------
+        path : `str`
+            the directory holding the table
+        mmap : `bool`
+            if True, the edge arrays are memory-mapped rather than read
+
+        Returns
+        -------
+        table : `EdgeTable`
+            the edge table
+        """
+        mode = "r" if mmap else None
+        arrays = {}
+        for name in ["offsets", "rows", "cols", "weights"]:
+            file = os.path.join(path, name + ".npy")
+            if os.path.exists(file):
+                arrays[name] = np.load(file, mmap_mode=mode)
+        return cls(**arrays)
+
+    def save(self, path):
+        """Saves the table as .npy files in a directory, to be memory-mapped by
+        load().
+
+        Parameters
+        ----------
+        path : `str`
+            the directory, which is created if needed
+
+        Returns
+        -------
+        None
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {"offsets": self.offsets, "rows": self.rows, "cols": self.cols}
+        if self.weights is not None:
+            arrays["weights"] = self.weights
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), np.asarray(array))
+        return None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def edges(self, t):
+        """Returns the edges of a step.
+
+        Parameters
+        ----------
+        t : `int`
+            the step index
+
+        Returns
+        -------
+        rows, cols, weights : `numpy.ndarray`
+            the step's edges; weights is None for an unweighted table
+        """
+        start, stop = self.offsets[t], self.offsets[t + 1]
+        weights = None if self.weights is None \
+            else np.asarray(self.weights[start:stop])
+        return (
+            np.asarray(self.rows[start:stop]),
+            np.asarray(self.cols[start:stop]),
+            weights)
+
+    def to_csr(self, t, n):
+        """Builds the adjacency matrix of a step. The weights of repeated
+        contacts are summed.
+
+        Parameters
+        ----------
+        t : `int`
+            the step index
+        n : `int`
+            number of nodes
+
+        Returns
+        -------
+        A : `scipy.sparse.csr_matrix`
+            the (n, n) adjacency matrix
+        """
+        rows, cols, weights = self.edges(t)
+        if weights is not None and np.any(weights < 0):
+            raise ValueError("Edge weights must be non-negative.")
+        return edges_to_csr(rows, cols, n, weights=weights)
+
+
+def _edge_rows(rows, cols, weights, nodes, n):
+    """Builds the rows of the given sorted nodes of a step's adjacency
+    matrix, as EdgeTable.to_csr would, without building the whole matrix."""
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    if weights is not None and np.any(weights < 0):
+        raise ValueError("Edge weights must be non-negative.")
+    keep = rows != cols
+    src = np.concatenate([rows[keep], cols[keep]])
+    dst = np.concatenate([cols[keep], rows[keep]])
+    data = np.ones(len(src)) if weights is None \
+        else np.tile(np.asarray(weights, dtype=float)[keep], 2)
+    M = sp.csr_matrix(
+        (data, (np.searchsorted(nodes, src), dst)), shape=(len(nodes), n))
+    M.sum_duplicates()
+    if weights is None:
+        # repeated unweighted contacts are counted once
+        M.data[:] = 1.
+    return M
+
+
+def _replace_rows(A, rows, B):
+    """Returns a copy of a CSR matrix with the given sorted rows replaced by
+    the rows of B. The entries between replaced rows are copied in blocks."""
+    stops = np.append(A.indptr[rows], A.nnz)
+    starts = np.concatenate([[0], A.indptr[rows + 1]])
+    indices, data = [], []
+    for i in range(len(rows)):
+        indices += [
+            A.indices[starts[i]:stops[i]],
+            B.indices[B.indptr[i]:B.indptr[i + 1]]]
+        data += [
+            A.data[starts[i]:stops[i]],
+            B.data[B.indptr[i]:B.indptr[i + 1]]]
+    indices.append(A.indices[starts[-1]:])
+    data.append(A.data[starts[-1]:])
+    shift = np.zeros(len(A.indptr), dtype=np.int64)
+    shift[rows + 1] = np.diff(B.indptr) - (starts[1:] - stops[:-1])
+    indptr = A.indptr + np.cumsum(shift)
+    return sp.csr_matrix(
+        (np.concatenate(data), np.concatenate(indices), indptr),
+        shape=A.shape)
+
+
+class TemporalNetwork(contagion.ContactNetwork):
+    """A contact network whose adjacency matrix changes at every simulation
+    step. Contagion looks up the matrix of the current step before computing
+    infection pressure, so the network's A (and degrees) always hold the
+    current snapshot; all other network state, including the compartment
+    records, carries over from step to step. After the last step of the
+    stream, the last snapshot is kept, or the stream is repeated if cycle is
+    True (e.g. for a week of contacts repeated weekly).
+    """
+
+    def __init__(
+            self,
+            n,
+            snapshots = None,
+            initial = None,
+            added = None,
+            removed = None,
+            cycle = False,
+            fraction_infected = 0,
+            fraction_recovered = 0,
+            labels = None):
+        """Constructor for the TemporalNetwork class. Either snapshots, or
+        initial together with added and/or removed, must be given.
+
+        Parameters
+        ----------
+        n : `int`
+            number of nodes
+        snapshots : `EdgeTable` or `List`
+            the contacts of each step, as an EdgeTable or a list of sparse
+            matrices
+        initial : `scipy.sparse.spmatrix`
+            the adjacency matrix of step 0, for a stream of deltas
+        added : `EdgeTable`
+            edges added at each step; entry t holds the edges added between
+            steps t - 1 and t, so entry 0 is ignored. An added edge that is
+            already present takes the new weight.
+        removed : `EdgeTable`
+            edges removed at each step, indexed as for added
+        cycle : `bool`
+            describes whether the stream repeats after its last step
+        fraction_infected : `float`
+            portion of the population infected at initialization
+        fraction_recovered : `float`
+            portion of the population recovered at initialization
+        labels : `numpy.ndarray`
+            the original label of each node index
+
+        Raises
+        ------
+        ValueError: when the stream is not specified correctly.
+
+        Returns
+        -------
+        None
+        """
+        if isinstance(snapshots, list):
+            snapshots = EdgeTable.from_snapshots(snapshots)
+        if (snapshots is None) == (initial is None):
+            raise ValueError(
+                "Either snapshots or an initial matrix and deltas are required.")
+        self.snapshots = snapshots
+        self.initial = None if initial is None else sp.csr_matrix(initial)
+        if self.initial is not None and self.initial.shape != (n, n):
+            raise ValueError("The initial matrix must be (n, n).")
+        self.added, self.removed = added, removed
+        tables = [t for t in [snapshots, added, removed] if t is not None]
+        self.num_steps = max([len(table) for table in tables] + [1])
+        self.cycle = cycle
+        self.step = 0
+        super().__init__(
+            fraction_infected = fraction_infected,
+            fraction_recovered = fraction_recovered,
+            A = snapshots.to_csr(0, n) if snapshots is not None
+                else self.initial,
+            labels = labels)
+        return None
+
+    def _stream_step(self, t):
+        """Maps a simulation step to a step of the stream."""
+        if self.cycle:
+            return t % self.num_steps
+        return min(t, self.num_steps - 1)
+
+    def _apply_delta(self, A, t):
+        """Applies the edges removed and added at step t to a matrix. Only
+        the rows of nodes with a changed contact are recomputed; the other
+        rows are copied in blocks, so a step costs a copy of the matrix plus
+        work proportional to the changed rows, rather than sparse arithmetic
+        on the whole matrix.
+        """
+        edges = [
+            table.edges(t) if table is not None and t < len(table) else None
+            for table in [self.removed, self.added]]
+        # a contact changes the rows of both of its nodes
+        nodes = np.unique(np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [np.concatenate(e[:2]) for e in edges if e is not None]))
+        if not len(nodes):
+            return A
+        R, D = [
+            None if e is None else _edge_rows(*e, nodes, self.n)
+            for e in edges]
+        B = A[nodes]
+        if R is not None:
+            B = B - B.multiply(R > 0)
+        if D is not None:
+            B = B - B.multiply(D > 0) + D
+        B = sp.csr_matrix(B)
+        B.eliminate_zeros()
+        B.sort_indices()
+        return _replace_rows(A, nodes, B)
+
+    def advance_to(self, t):
+        """Sets the network's adjacency matrix to that of a simulation step.
+        Snapshots are read directly; deltas are applied incrementally from the
+        current step, or replayed from step 0 to go back in time.
+
+        Parameters
+        ----------
+        t : `int`
+            the simulation step
+
+        Returns
+        -------
+        None
+        """
+        target = self._stream_step(t)
+        if target == self.step:
+            return None
+        if self.snapshots is not None:
+            self.A = self.snapshots.to_csr(target, self.n)
+        else:
+            if target < self.step:
+                self.A, self.step = self.initial, 0
+            A = self.A
+            for s in range(self.step + 1, target + 1):
+                A = self._apply_delta(A, s)
+            self.A = A
+        self.step = target
+        self.degrees = np.diff(self.A.indptr)
+        self._G = None
+        return None
+
+    def pressure(self, x, t):
+        """Computes the infection pressure A_t x on the snapshot of step t.
+
+        Parameters
+        ----------
+        x : `numpy.ndarray`
+            an (n, 1) or (n,) infectiousness-weighted infected record
+        t : `int`
+            the simulation step
+
+        Returns
+        -------
+        pressure : `numpy.ndarray`
+            the pressure on each node, shaped like x
+        """
+        self.advance_to(t)
+        return self.A @ x
+
+    def aggregate(self, steps = None):
+        """Sums the adjacency matrices of a range of steps into one static
+        matrix, e.g. for choosing an immunization policy.
+
+        Parameters
+        ----------
+        steps : `range`
+            the steps to aggregate. Defaults to every step of the stream.
+
+        Returns
+        -------
+        A : `scipy.sparse.csr_matrix`
+            the aggregated (n, n) adjacency matrix
+        """
+        steps = range(self.num_steps) if steps is None else steps
+        current = self.step
+        total = sp.csr_matrix((self.n, self.n))
+        for t in steps:
+            self.advance_to(t)
+            total = total + self.A
+        self.advance_to(current)
+        return total.tocsr()
@@ -0,0 +1,67 @@
+import sys
+import pickle
+import unittest
+import numpy as np
+sys.path.append("..")
+from contagion import aggregation
+
+
+class TestAggregation(unittest.TestCase):
+
+    def test_running_stats_merge(self):
+        """
+        Tests that merged running statistics match NumPy's.
+        """
+        x = np.random.default_rng(0).normal(size = (100, 3))
+        a, b = aggregation.RunningStats((3,)), aggregation.RunningStats((3,))
+        for row in x[:30]:
+            a.update(row)
+        for row in x[30:]:
+            b.update(row)
+        a.merge(b)
+        np.testing.assert_allclose(a.mean, x.mean(axis = 0))
+        np.testing.assert_allclose(a.variance(), x.var(axis = 0, ddof = 1))
+
+    def test_kll_quantiles(self):
+        """
+        Tests the rank error of merged quantile sketches.
+        """
+        x = np.random.default_rng(1).random(20000)
+        a = aggregation.KLLSketch(k = 200, seed = 0)
+        b = aggregation.KLLSketch(k = 200, seed = 1)
+        a.update(x[:5000])
+        for value in x[5000:]:
+            b.update(value)
+        a.merge(b)
+        self.assertEqual(a.count, 20000)
+        self.assertLess(sum(len(c) for c in a.compactors), 1000)
+        q = np.array([0.1, 0.5, 0.9])
+        np.testing.assert_allclose(a.quantile(q), q, atol = 0.02)
+
+    def test_ensemble_padding_and_merge(self):
+        """
+        Tests that shorter runs are held at their final values, and that
+        aggregators survive pickling and merging.
+        """
+        runs = [[1, 3, 2], [1, 5, 4, 2, 0], [2, 2]]
+        a = aggregation.EnsembleAggregator(seed = 0)
+        a.add(runs[0], final_size = 4)
+        b = aggregation.EnsembleAggregator(seed = 1)
+        b.add(runs[1], final_size = 6)
+        b.add(runs[2], final_size = 2)
+        a.merge(pickle.loads(pickle.dumps(b)))
+        padded = np.array([[1, 3, 2, 2, 2], [1, 5, 4, 2, 0], [2, 2, 2, 2, 2]])
+        self.assertEqual(a.runs, 3)
+        np.testing.assert_allclose(a.mean(), padded.mean(axis = 0))
+        np.testing.assert_allclose(
+            a.variance(), padded.var(axis = 0, ddof = 1))
+        np.testing.assert_array_equal(
+            a.quantiles([0., 1.]), [padded.min(axis = 0), padded.max(axis = 0)])
+        summary = a.summary()
+        self.assertAlmostEqual(summary["peak_height"]["mean"], 10/3)
+        self.assertAlmostEqual(summary["peak_time"]["mean"], 2/3)
+        self.assertEqual(summary["final_size"]["mean"], 4.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion, cache, campaigns, observers
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        G = nx.barabasi_albert_graph(1000, 3, seed = 0)
+        self.network = contagion.ContactNetwork(G, fraction_infected = 0.01)
+        self.network.init_Su_In_Re(rng = np.random.default_rng(0))
+
+    def test_run(self):
+        """
+        Tests that cached runs match simulation, are keyed by content and
+        default parameters, leave the network unchanged, and are reloaded
+        from disk.
+        """
+        In = self.network.In.copy()
+        with tempfile.TemporaryDirectory() as path:
+            results = cache.ResultCache(path)
+            result = results.run(self.network, seed = 1, beta = 0.1, gamma = 0.2)
+            self.assertTrue(np.array_equal(self.network.In, In))
+            sim = contagion.Contagion(self.network, beta = 0.1, gamma = 0.2, seed = 1)
+            sim.run_simulation()
+            self.network.reset_Su_In_Re()
+            self.assertTrue(np.array_equal(result["In_hist"], sim.In_hist))
+            self.assertEqual(result["peak"], max(sim.In_hist))
+
+            self.assertIs(
+                results.run(self.network, seed = 1, beta = 0.1, gamma = 0.2), result)
+            results.run(self.network, seed = 2, beta = 0.1, gamma = 0.2)
+            self.assertEqual((results.hits, results.misses), (1, 2))
+            self.assertEqual(
+                cache.fingerprint(self.network, seed = 1, beta = 1.),
+                cache.fingerprint(self.network, seed = 1))
+            copy = contagion.ContactNetwork.from_csr(self.network.A.copy())
+            copy.seed(contagion.seeding.SeedSet(np.flatnonzero(In)))
+            self.assertEqual(
+                cache.fingerprint(copy, seed = 1),
+                cache.fingerprint(self.network, seed = 1))
+
+            reloaded = cache.ResultCache(path)
+            result = reloaded.run(self.network, seed = 1, beta = 0.1, gamma = 0.2)
+            self.assertEqual(reloaded.hits, 1)
+            self.assertTrue(np.array_equal(result["In_hist"], sim.In_hist))
+            with self.assertRaises(ValueError):
+                result["In_hist"][0] = 0
+            with self.assertRaises(ValueError):
+                reloaded.run(self.network, beta = 0.1)
+
+    def test_network_restored(self):
+        """
+        Tests that runs restore immunization arrays modified by waning, so
+        a repeated request hits the cache, and that campaigns are keyed by
+        their parameters rather than their dosing progress.
+        """
+        Im = np.zeros((self.network.n, 1))
+        Im[:100] = 1
+        self.network.immunize_network(Im, im_type = "vaccinate")
+        results = cache.ResultCache()
+        kwargs = {"beta": 0.1, "gamma": 0.2, "omega": (0.1, 0.1), "seed": 0}
+        first = results.run(self.network, 50, **kwargs)
+        self.assertEqual(self.network.Im.sum(), 100)
+        self.assertIs(results.run(self.network, 50, **kwargs), first)
+        self.assertEqual((results.hits, results.misses), (1, 1))
+
+        network = contagion.ContactNetwork.from_csr(
+            self.network.A, fraction_infected = 0.01)
+        network.init_Su_In_Re(rng = np.random.default_rng(0))
+        campaign = campaigns.Campaign(np.arange(200), 10)
+        key = cache.fingerprint(network, 20, seed = 0, campaign = campaign)
+        contagion.Contagion(
+            network, seed = 0, campaign = campaign).run_simulation(20)
+        network.reset_Su_In_Re()
+        self.assertGreater(campaign.next, 0)
+        self.assertEqual(
+            cache.fingerprint(network, 20, seed = 0, campaign = campaign), key)
+
+    def test_final_size_and_key(self):
+        """
+        Tests that final sizes count reinfections, and that keys ignore the
+        number of threads but depend on the cache's schema.
+        """
+        results = cache.ResultCache()
+        result = results.run(
+            self.network, seed = 0, beta = 0.2, gamma = 0.2, omega = 0.2,
+            steps = 60)
+        sim = contagion.Contagion(
+            self.network, beta = 0.2, gamma = 0.2, omega = 0.2, seed = 0)
+        peak = sim.add_observer(observers.Peak())
+        sim.run_simulation(60)
+        self.network.reset_Su_In_Re()
+        self.assertEqual(result["final_size"], peak.cumulative)
+        self.assertGreater(
+            result["final_size"],
+            result["Su_hist"][0] - result["Su_hist"][-1] + result["In_hist"][0])
+
+        key = cache.fingerprint(self.network, seed = 0, partitions = 2)
+        self.assertEqual(
+            cache.fingerprint(
+                self.network, seed = 0, partitions = 2, n_threads = 1),
+            key)
+        schema = cache._SCHEMA
+        try:
+            cache._SCHEMA = schema + 1
+            self.assertNotEqual(
+                cache.fingerprint(self.network, seed = 0, partitions = 2), key)
+        finally:
+            cache._SCHEMA = schema
+
+    def test_sweep_and_eviction(self):
+        """
+        Tests that sweeps only simulate missing points, and that the on-disk
+        store evicts the least recently used results.
+        """
+        with tempfile.TemporaryDirectory() as path:
+            results = cache.ResultCache(path, memory_items = 1)
+            results.sweep(
+                self.network, [{"beta": 0.1, "seed": 0}, {"beta": 0.2, "seed": 0}])
+            results.sweep(
+                self.network,
+                [{"beta": b, "seed": 0} for b in [0.1, 0.2, 0.3]])
+            self.assertEqual((results.hits, results.misses), (2, 3))
+            sizes = [
+                os.path.getsize(os.path.join(path, name))
+                for name in os.listdir(path)]
+            self.assertEqual(len(sizes), 3)
+
+            results.max_bytes = sum(sizes) - 1
+            results.run(self.network, seed = 0, beta = 0.1)
+            results.run(self.network, seed = 0, beta = 0.4)
+            self.assertLessEqual(len(os.listdir(path)), 3)
+            key = cache.fingerprint(self.network, seed = 0, beta = 0.1)
+            self.assertTrue(os.path.exists(os.path.join(path, key + ".npz")))
+            key = cache.fingerprint(self.network, seed = 0, beta = 0.2)
+            self.assertFalse(os.path.exists(os.path.join(path, key + ".npz")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion, campaigns
+
+
+class TestCampaigns(unittest.TestCase):
+
+    def setUp(self):
+        self.G = nx.barabasi_albert_graph(1000, 3, seed = 0)
+
+    def test_capacity_and_order(self):
+        """
+        Tests that doses follow the priority order at the daily capacity, and
+        that fully effective doses protect susceptible nodes.
+        """
+        network = contagion.ContactNetwork(self.G, fraction_infected = 0.01)
+        network.init_Su_In_Re(rng = np.random.default_rng(0))
+        Im = contagion.Immunization(
+            network).generate_highest_degrees_immunization_array(Q = 200)
+        campaign = campaigns.Campaign(
+            Im, capacity = [10, 10, 10, 50], start = 2, priority = network.degrees)
+        self.assertTrue(np.all(np.diff(network.degrees[campaign.order]) <= 0))
+        sim = contagion.Contagion(
+            network, beta = 0.1, gamma = 0.1, seed = 1, campaign = campaign)
+        sim.simulate_step()
+        sim.simulate_step()
+        susceptible = network.Su.ravel()[campaign.order[:10]] > 0
+        sim.run_simulation(4)
+        self.assertEqual(campaign.first_doses, [10, 50, 50, 50])
+        self.assertEqual(campaign.coverage(), (160, 0))
+        first = campaign.order[:10][susceptible]
+        self.assertTrue(np.all(network.Re.ravel()[first] == 1))
+        self.assertTrue(np.all(network.Su + network.In + network.Re == 1))
+
+    def test_second_doses(self):
+        """
+        Tests that second doses are given after the delay, ahead of first
+        doses, and raise protection to the second-dose efficacy.
+        """
+        network = contagion.ContactNetwork(self.G, fraction_infected = 0.001)
+        network.init_Su_In_Re(rng = np.random.default_rng(0))
+        campaign = campaigns.Campaign(
+            np.arange(1000), capacity = 100, efficacy = 0.5,
+            second_dose_after = 3, second_efficacy = 0.9)
+        sim = contagion.Contagion(
+            network, beta = 0., gamma = 0.1, seed = 2, campaign = campaign)
+        for _ in range(12):
+            sim.simulate_step()
+        self.assertEqual(campaign.second_doses[:5], [0, 0, 0, 100, 100])
+        self.assertEqual(campaign.first_doses[:5], [100, 100, 100, 0, 0])
+        self.assertEqual(campaign.coverage(), (600, 600))
+        self.assertAlmostEqual(campaign.protected/600, 0.9, delta = 0.05)
+        with self.assertRaises(ValueError):
+            campaigns.Campaign(np.arange(10), 5, efficacy = 0.9,
+                second_efficacy = 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
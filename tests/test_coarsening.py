@@ -0,0 +1,93 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion, coarsening, generators
+
+
+class TestCoarsening(unittest.TestCase):
+
+    def test_coarsen(self):
+        """
+        Tests that structurally equivalent nodes are merged, that coarsening
+        reaches the reduction ratio, and that coarse contact weights are the
+        mean contacts of a member.
+        """
+        star = contagion.ContactNetwork(nx.star_graph(9))
+        labels = coarsening.structural_classes(star.A)
+        self.assertEqual(len(np.unique(labels)), 2)
+        self.assertEqual(len(np.unique(labels[1:])), 1)
+
+        G = nx.barabasi_albert_graph(2000, 3, seed = 0)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.01)
+        coarse = coarsening.coarsen(network, ratio = 0.2, seed = 0)
+        self.assertLessEqual(coarse.n, 400)
+        self.assertEqual(coarse.sizes.sum(), 2000)
+        self.assertEqual(coarse.population, 2000)
+        # contacts between super-nodes are kept, and contacts within dropped
+        membership = coarse.membership
+        A = network.A.tocoo()
+        between = membership[A.row] != membership[A.col]
+        self.assertAlmostEqual(
+            (coarse.sizes[:, None]*coarse.A.toarray()).sum(), between.sum())
+        coarse.init_Su_In_Re(rng = np.random.default_rng(0))
+        self.assertLessEqual(
+            abs(coarse.counts(coarse.In) - 20), coarse.sizes.max())
+        self.assertEqual(coarse.project(coarse.In).shape, (2000, 1))
+
+    def test_simulate_and_report(self):
+        """
+        Tests that coarse trajectories are counted in the original population,
+        and that the error report compares coarse and full runs on a sample.
+        """
+        A, households, _ = generators.household_workplace(3000, seed = 0)
+        network = contagion.ContactNetwork.from_csr(A, fraction_infected = 0.01)
+        coarse = coarsening.coarsen(network, ratio = 1., groups = households)
+        self.assertEqual(coarse.n, len(np.unique(households)))
+        coarse.init_Su_In_Re(rng = np.random.default_rng(0))
+        counts = coarsening.simulate(coarse, seed = 0, beta = 0.1, gamma = 0.2)
+        self.assertEqual(counts.shape[1], 3)
+        self.assertTrue(np.allclose(counts.sum(axis = 1), 3000))
+
+        # long runs keep their earliest counts
+        path = contagion.ContactNetwork(nx.path_graph(5), fraction_infected = 0.2)
+        path.init_Su_In_Re(rng = np.random.default_rng(0))
+        counts = coarsening.simulate(path, seed = 0, beta = 0., gamma = 5e-5)
+        self.assertGreater(len(counts), 10000)
+        self.assertTrue(np.array_equal(counts[0], [4., 1., 0.]))
+
+        report = coarsening.error_report(
+            network,
+            ratio = 1.,
+            groups = households,
+            sample = 2000,
+            runs = 3,
+            seed = 0,
+            beta = 0.1,
+            gamma = 0.2)
+        self.assertEqual(report["nodes"], 2000)
+        for key in ["final_size", "peak", "peak_step"]:
+            self.assertEqual(
+                set(report[key]), {"full", "coarse", "relative_error"})
+        self.assertLess(report["final_size"]["relative_error"], 0.5)
+        self.assertGreaterEqual(report["trajectory_rmse"], 0)
+
+        # the caller's seeds are kept, and both sides run unimmunized
+        network.init_Su_In_Re(rng = np.random.default_rng(1))
+        og_In = network.og_In.copy()
+        kwargs = {
+            "groups": households, "runs": 2, "seed": 0, "beta": 0.1,
+            "gamma": 0.2}
+        plain = coarsening.error_report(network, **kwargs)
+        Im = (np.arange(3000) % 2).astype(float).reshape(3000, 1)
+        network.immunize_network(Im, im_type = "vaccinate")
+        immunized = coarsening.error_report(network, **kwargs)
+        self.assertTrue(np.array_equal(network.og_In, og_In))
+        self.assertIs(network.Im, Im)
+        for key in ["final_size", "peak", "peak_step"]:
+            self.assertEqual(immunized[key], plain[key])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import comparison
+
+
+class TestComparison(unittest.TestCase):
+
+    def test_common_random_numbers(self):
+        """
+        Tests that identical policies have identical outcomes in every
+        replicate.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        Im = contagion.Immunization(
+            network).generate_random_immunization_array(Q = 20)
+        results = comparison.compare_policies(
+            network,
+            {"a": Im, "b": Im.copy()},
+            min_runs = 5,
+            max_runs = 5,
+            seed = 0,
+            beta = 0.2,
+            gamma = 0.1)
+        self.assertEqual(results["runs"], 5)
+        np.testing.assert_array_equal(
+            results["values"][:, 0], results["values"][:, 1])
+        self.assertEqual(results["differences"][("a", "b")], (0., 0., 0.))
+        self.assertFalse(results["settled"])
+
+    def test_ranking_settles(self):
+        """
+        Tests that a strong policy is ranked first and the comparison stops
+        early.
+        """
+        G = nx.barabasi_albert_graph(300, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.02)
+        Im = contagion.Immunization(
+            network).generate_highest_degrees_immunization_array(Q = 90)
+        results = comparison.compare_policies(
+            network,
+            {"none": None, "degree": Im},
+            max_runs = 200,
+            seed = 1,
+            beta = 0.3,
+            gamma = 0.1)
+        self.assertEqual(results["ranking"], ["degree", "none"])
+        self.assertTrue(results["settled"])
+        self.assertLess(results["runs"], 200)
+
+    def test_network_unchanged(self):
+        """
+        Tests that replicates leave the caller's seeds and immunization
+        unchanged.
+        """
+        G = nx.barabasi_albert_graph(200, 3, seed = 0)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        Im = contagion.Immunization(
+            network).generate_random_immunization_array(Q = 20)
+        network.immunize_network(Im, im_starts_after = 3)
+        In, og_In = network.In.copy(), network.og_In.copy()
+        comparison.run_replicate(
+            network, None, 0, beta = 0.2, gamma = 0.2)
+        self.assertTrue(np.array_equal(network.In, In))
+        self.assertTrue(np.array_equal(network.og_In, og_In))
+        self.assertIs(network.Im, Im)
+        self.assertEqual(network.im_starts_after, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
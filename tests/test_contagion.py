@@ -5,6 +5,9 @@ import numpy as np
 import networkx as nx
 sys.path.append("..")
 from contagion import contagion
+from contagion import _kernels
+from contagion import monitoring
+from contagion import observers
 
 
 class TestContagion(unittest.TestCase):
@@ -186,6 +189,326 @@ class TestContagion(unittest.TestCase):
         sim = contagion.Contagion(network, save_history = True)
         self.assertGreater(sim.run_simulation_get_max_infected_index(), -1)
 
+    @unittest.skipUnless(_kernels.HAVE_NUMBA, "requires numba")
+    def test_numba_backend(self):
+        """
+        Tests that the fused backend runs a simulation with waning immunity,
+        partial vaccination and testing.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(
+            G,
+            fraction_infected = 0.25)
+        Im = contagion.Immunization(
+            network).generate_highest_degrees_immunization_array(10)
+        network.immunize_network(Im, efficacy = 0.7)
+        sim = contagion.Contagion(
+            network,
+            beta = 0.5,
+            omega = 0.05,
+            track_symptomatic = True,
+            implement_testing = True,
+            test_rate = 0.1,
+            backend = "numba")
+        sim.run_simulation(20)
+        self.assertEqual(len(sim.In_hist), len(sim.NewPositiveTests_hist))
+        self.assertEqual(sim.In_hist[-1], np.sum(network.In))
+
+    def test_numba_backend_statistics(self):
+        """
+        Tests that the fused backend is statistically identical to the numpy
+        backend: seeded ensembles have the same mean infected curve, within
+        sampling error.
+        """
+        G = nx.barabasi_albert_graph(300, 3, seed = 0)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        Im = contagion.Immunization(
+            network).generate_highest_degrees_immunization_array(30)
+        network.immunize_network(Im, efficacy = 0.7)
+        runs = 150
+        curves = {}
+        for backend in ["numpy", "numba"]:
+            histories = []
+            for run in range(runs):
+                network.init_Su_In_Re(rng = np.random.default_rng(run))
+                sim = contagion.Contagion(
+                    network,
+                    beta = 0.15,
+                    gamma = 0.2,
+                    omega = 0.05,
+                    seed = run,
+                    backend = backend)
+                sim.run_simulation(40)
+                # runs stop once the infection dies out
+                history = sim.In_hist[:41]
+                histories.append(history + [history[-1]]*(41 - len(history)))
+            curves[backend] = np.array(histories)
+        difference = curves["numba"].mean(axis = 0) \
+            - curves["numpy"].mean(axis = 0)
+        error = np.sqrt(
+            (curves["numba"].var(axis = 0) + curves["numpy"].var(axis = 0))/runs)
+        self.assertTrue(np.all(np.abs(difference) <= 4*error + 1e-9))
+        self.assertGreater(curves["numpy"].mean(axis = 0).max(), 30)
+
+    def test_fused_step_deterministic(self):
+        """
+        Tests a deterministic fused step on a path graph: with beta = 1 and
+        gamma = 0, exactly the neighbors of the infected node become infected.
+        """
+        A = nx.adjacency_matrix(nx.path_graph(5)).astype(float)
+        Su = np.array([1., 1., 0., 1., 1.])
+        In = np.array([0., 0., 1., 0., 0.])
+        Re = np.zeros(5)
+        In_out = np.zeros(5)
+        new_transmissions = np.zeros(5)
+        new_recoveries = np.zeros(5)
+        empty = np.zeros(0)
+        _kernels.fused_step(
+            A.indptr, A.indices, A.data,
+            Su, In, In_out, Re, empty, np.zeros(5), empty, empty, empty,
+            new_transmissions, new_recoveries, empty, empty,
+            1., 0., 0., 0., 0., 1., 0., 0.,
+            _kernels.VACC_NONE, _kernels.TEST_NONE, _kernels.WANE_NONE, False,
+            False, 0.)
+        np.testing.assert_array_equal(In_out, [0., 1., 1., 1., 0.])
+        np.testing.assert_array_equal(Su, [1., 0., 0., 0., 1.])
+
+    def test_partitioned_thread_invariance(self):
+        """
+        Tests that partitioned stepping gives identical results regardless of
+        the number of threads.
+        """
+        G = nx.barabasi_albert_graph(300, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        histories = []
+        for n_threads in [1, 3]:
+            network.reset_Su_In_Re()
+            with contagion.Contagion(
+                    network,
+                    beta = 0.3,
+                    gamma = 0.2,
+                    omega = 0.05,
+                    partitions = 4,
+                    n_threads = n_threads,
+                    seed = 7) as sim:
+                sim.run_simulation(30)
+                histories.append(sim.In_hist)
+            self.assertIsNone(sim._executor)
+        self.assertEqual(histories[0], histories[1])
+
+    def test_close(self):
+        """
+        Tests that closing a partitioned simulation stops its worker threads,
+        and that it may be run again afterwards.
+        """
+        G = nx.barabasi_albert_graph(300, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        sim = contagion.Contagion(
+            network, beta = 0.3, gamma = 0.2, partitions = 4, seed = 7)
+        sim.run_simulation(5)
+        threads = list(sim._executor._threads)
+        self.assertTrue(threads)
+        sim.close()
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        sim.run_simulation(10)
+        sim.close()
+        self.assertIsNone(sim._executor)
+
+    def test_reorder_nodes(self):
+        """
+        Tests that reordering nodes permutes the adjacency matrix and the
+        compartmental arrays consistently.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.1)
+        In = network.In.copy()
+        A = network.A.toarray()
+        order = network.reorder_nodes("rcm")
+        np.testing.assert_array_equal(network.In, In[order])
+        np.testing.assert_array_equal(network.A.toarray(), A[order][:, order])
+        np.testing.assert_array_equal(network.labels, order)
+
+    def test_immunization_matches_networkx(self):
+        """
+        Tests that breadth-first, depth-first and eigenvector immunization
+        choose the nodes found by NetworkX: searches take nodes in traversal
+        order from the lowest-indexed node of each component, and eigenvector
+        centrality ignores contact weights.
+        """
+        G = nx.disjoint_union(
+            nx.barabasi_albert_graph(60, 2, seed = 1),
+            nx.watts_strogatz_graph(40, 4, 0.3, seed = 2))
+        A = nx.to_scipy_sparse_array(G, nodelist = range(100), format = "csr")
+        A.data = np.random.default_rng(0).integers(1, 4, A.nnz).astype(float)
+        A = (A + A.T).tocsr()
+        network = contagion.ContactNetwork.from_csr(A)
+        immunizer = contagion.Immunization(network)
+        # the graph built from the matrix lists neighbors in index order
+        H = nx.from_scipy_sparse_array(A)
+        for Q in [1, 7, 75]:
+            bfs, dfs = [], []
+            for component in sorted(nx.connected_components(H), key = min):
+                start = min(component)
+                bfs += [start] + [v for _, v in nx.bfs_edges(H, start)]
+                dfs += list(nx.dfs_preorder_nodes(H, start))
+            expected = np.zeros((100, 1))
+            expected[bfs[:Q]] = 1
+            np.testing.assert_array_equal(
+                immunizer.generate_bfs_immunization_array(Q), expected)
+            expected = np.zeros((100, 1))
+            expected[dfs[:Q]] = 1
+            np.testing.assert_array_equal(
+                immunizer.generate_dfs_immunization_array(Q), expected)
+
+        centrality = nx.eigenvector_centrality(G, max_iter = 1000)
+        expected = np.zeros((100, 1))
+        expected[sorted(centrality, key = centrality.get, reverse = True)[:10]] = 1
+        np.testing.assert_array_equal(
+            immunizer.generate_centrality_immunization_array(
+                10, centrality_type = "eigenvector"),
+            expected)
+
+    def test_weighted_transmission_probability(self):
+        """
+        Tests that weighted transmission infects a leaf of an infected star
+        hub with probability 1 - (1 - beta)**w.
+        """
+        G = nx.star_graph(5000)
+        nx.set_edge_attributes(G, 2., "weight")
+        network = contagion.ContactNetwork(G)
+        network.Su[:], network.In[:], network.Re[:] = 1., 0., 0.
+        network.Su[0], network.In[0] = 0., 1.
+        sim = contagion.Contagion(
+            network,
+            beta = 0.5,
+            gamma = 0.,
+            weighted_transmission = True,
+            seed = 3)
+        sim.simulate_step()
+        self.assertAlmostEqual(
+            np.sum(sim.new_transmissions)/5000, 0.75, delta = 0.03)
+
+    def test_beta_schedule_lookup(self):
+        """
+        Tests that scheduled transmission rates are looked up by step index,
+        with the last rate maintained.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.25)
+        sim = contagion.Contagion(network, beta = [0.1, 0.2, 0.3])
+        betas = [sim.beta]
+        for i in range(4):
+            sim.simulate_step()
+            betas.append(sim.beta)
+        self.assertEqual(betas, [0.1, 0.2, 0.3, 0.3, 0.3])
+        self.assertEqual(sim.beta_queue, [])
+
+    def test_per_node_rates(self):
+        """
+        Tests per-node recovery rates and zero susceptibility.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.5)
+        gamma = np.zeros((100, 1))
+        gamma[:50] = 1.
+        In = network.In.copy()
+        sim = contagion.Contagion(
+            network,
+            beta = 1.,
+            gamma = gamma,
+            susceptibility = np.zeros((100, 1)))
+        sim.simulate_step()
+        self.assertEqual(np.sum(sim.new_transmissions), 0)
+        np.testing.assert_array_equal(network.In[:50], 0.)
+        np.testing.assert_array_equal(network.In[50:], In[50:])
+
+    def test_invalid_per_node_rate(self):
+        """
+        Tests that per-node rates with the wrong dimensions are rejected.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(network, gamma = np.zeros((50, 1)))
+
+    def test_scheduled_recovery_delays(self):
+        """
+        Tests that scheduled recoveries occur at geometrically distributed
+        times.
+        """
+        G = nx.empty_graph(20000)
+        network = contagion.ContactNetwork(G, fraction_infected = 1.)
+        sim = contagion.Contagion(
+            network,
+            gamma = 0.25,
+            seed = 0,
+            scheduled_events = True)
+        for _ in range(3):
+            sim.simulate_step()
+        expected = 20000*0.75**np.arange(4)
+        np.testing.assert_allclose(sim.In_hist, expected, rtol = 0.03)
+        self.assertEqual(sim.Re_hist[-1], 20000 - sim.In_hist[-1])
+
+    def test_scheduled_events_invalid(self):
+        """
+        Tests that scheduled events reject unsupported configurations.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.1)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(
+                network, gamma = [0.1, 0.2], scheduled_events = True)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(
+                network, contagion_type = "seir", scheduled_events = True)
+        network.immunize_network(np.ones((100, 1)), efficacy = 0.5)
+        sim = contagion.Contagion(network, scheduled_events = True)
+        with self.assertRaises(ValueError):
+            sim.simulate_step()
+
+    def test_compact_immune(self):
+        """
+        Tests that compaction drops vaccinated nodes from the simulated
+        network, keeps full-size histories, and restores the full arrays.
+        """
+        G = nx.erdos_renyi_graph(2000, 0.005, seed = 0)
+        Im = (np.arange(2000) % 2 == 0).astype(float).reshape(2000, 1)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.02)
+        network.init_Su_In_Re(rng = np.random.default_rng(0))
+        network.immunize_network(Im, im_type = "vaccinate")
+        infected_vaccinated = np.sum(Im*network.In)
+        sim = contagion.Contagion(
+            network, beta = 0.2, gamma = 0.1, seed = 0, compact_immune = True)
+        sim.run_simulation(30)
+        self.assertEqual(sim.network.n, 1000 + infected_vaccinated)
+        self.assertIs(sim.full_network, network)
+        self.assertGreaterEqual(sim.Re_hist[1], 1000)
+        self.assertEqual(np.sum(network.Re), sim.Re_hist[-1])
+        self.assertEqual(np.sum(network.In), sim.In_hist[-1])
+        self.assertTrue(np.all(network.Re[Im > 0] == 1))
+        self.assertTrue(np.all(
+            network.In[sim.node_index] == sim.network.In))
+
+        # observers report on the original nodes
+        network.reset_Su_In_Re()
+        groups = np.arange(2000) % 4
+        fractions = observers.GroupFractions(groups)
+        first = monitoring.FirstInfection()
+        sim = contagion.Contagion(
+            network, beta = 0.2, gamma = 0.1, seed = 0, compact_immune = True,
+            observers = [fractions, first])
+        sim.run_simulation(30)
+        infected = np.bincount(
+            groups, weights = network.In.ravel(), minlength = 4)
+        self.assertTrue(np.allclose(fractions.fractions.values()[-1], infected/500))
+        self.assertEqual(len(first.times), 2000)
+        self.assertTrue(np.all(first.times[network.og_In.ravel() > 0] == 0))
+        ever = ((network.In + network.Re)*(1 - Im) + network.og_In).ravel() > 0
+        self.assertTrue(np.array_equal(first.times >= 0, ever))
+
+        network.immunize_network(Im, im_type = "vaccinate", efficacy = 0.5)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(network, compact_immune = True)
 
 if __name__ == '__main__':
     unittest.main()
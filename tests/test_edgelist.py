@@ -0,0 +1,141 @@
+import sys
+import os
+import gzip
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import edgelist
+
+
+class TestEdgelist(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text, compress = False):
+        path = os.path.join(self.tmpdir.name, name)
+        if compress:
+            with gzip.open(path, "wt") as fh:
+                fh.write(text)
+        else:
+            with open(path, "w") as fh:
+                fh.write(text)
+        return path
+
+    def test_read_edgelist_symmetrize_dedupe(self):
+        """
+        Tests that duplicate, reversed and self-loop edges are removed.
+        """
+        path = self.write(
+            "edges.txt",
+            "# comment\na b\nb a\na b\nb c\nc c\n")
+        A, labels = edgelist.read_edgelist(path, chunk_size = 2)
+        self.assertEqual(list(labels), ["a", "b", "c"])
+        expected = np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0]])
+        np.testing.assert_array_equal(A.toarray(), expected)
+
+    def test_read_edgelist_gzip_csv(self):
+        """
+        Tests reading a gzip-compressed CSV with a header.
+        """
+        path = self.write(
+            "edges.csv.gz",
+            "id,src,dst\n0,10,20\n1,20,30\n2,30,10\n",
+            compress = True)
+        A, labels = edgelist.read_edgelist(
+            path,
+            delimiter = ",",
+            columns = (1, 2),
+            skip_header = True,
+            nodetype = int)
+        self.assertEqual(list(labels), [10, 20, 30])
+        self.assertEqual(A.nnz, 6)
+
+    def test_read_edgelist_weights_summed(self):
+        """
+        Tests that the weights of repeated edges are summed.
+        """
+        path = self.write("weighted.txt", "a b 1.5\nb a 2\nb c 4\n")
+        A, labels = edgelist.read_edgelist(path, weight_column = 2)
+        expected = np.array([[0, 3.5, 0], [3.5, 0, 4], [0, 4, 0]])
+        np.testing.assert_array_equal(A.toarray(), expected)
+
+    def test_read_edgelist_external_merge(self):
+        """
+        Tests that edges repeated across chunks are merged before the matrix
+        is built, so memory does not grow with the number of duplicates, and
+        that an empty edge list is rejected.
+        """
+        rng = np.random.default_rng(0)
+        u, v = rng.integers(0, 30, 500), rng.integers(0, 30, 500)
+        w = rng.integers(1, 5, 500)
+        path = self.write("random.txt", "".join(
+            "{} {} {}\n".format(*edge) for edge in zip(u, v, w)))
+        A, labels = edgelist.read_edgelist(
+            path, nodetype = int, weight_column = 2, chunk_size = 7)
+        ids = {label: i for i, label in enumerate(labels)}
+        expected = edgelist.edges_to_csr(
+            [ids[x] for x in u], [ids[x] for x in v], len(labels), weights = w)
+        np.testing.assert_array_equal(A.toarray(), expected.toarray())
+
+        path = self.write("repeated.txt", "a b\nb a\n"*100000)
+        tracemalloc.start()
+        A, labels = edgelist.read_edgelist(path, chunk_size = 1000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertEqual(A.nnz, 2)
+        self.assertLess(peak, 2**20)
+
+        path = self.write("empty.txt", "# no edges\n")
+        with self.assertRaises(ValueError):
+            edgelist.read_edgelist(path)
+
+    def test_edges_to_csr_matches_networkx(self):
+        """
+        Tests that edges_to_csr reproduces NetworkX's adjacency matrix.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        edges = np.array(G.edges())
+        A = edgelist.edges_to_csr(
+            np.concatenate([edges[:, 0], edges[:, 1]]),
+            np.concatenate([edges[:, 1], edges[:, 0]]),
+            200,
+            chunk_size = 50)
+        expected = nx.to_numpy_array(G, nodelist = range(200))
+        np.testing.assert_array_equal(A.toarray(), expected)
+
+    def test_from_edgelist_immunization_without_graph(self):
+        """
+        Tests that graph-dependent immunization works without a NetworkX graph.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        path = self.write(
+            "ba.txt",
+            "\n".join("{} {}".format(u, v) for u, v in G.edges()))
+        network = contagion.ContactNetwork.from_edgelist(
+            path,
+            fraction_infected = 0.1,
+            nodetype = int)
+        self.assertIsNone(network._G)
+        immunizer = contagion.Immunization(network)
+        for Im in [
+                immunizer.generate_highest_degrees_immunization_array(5),
+                immunizer.generate_bfs_immunization_array(5),
+                immunizer.generate_dfs_immunization_array(5),
+                immunizer.generate_centrality_immunization_array(
+                    5, centrality_type = "eigenvector")]:
+            self.assertEqual(np.sum(Im), 5)
+        self.assertIsNone(network._G)
+        top = network.labels[np.argmax(network.degrees)]
+        self.assertEqual(G.degree[top], max(d for _, d in G.degree))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import sys
+import unittest
+import numpy as np
+sys.path.append("..")
+from contagion import contagion, generators
+
+
+class TestGenerators(unittest.TestCase):
+
+    def assertSimpleGraph(self, A):
+        self.assertEqual((A != A.T).nnz, 0)
+        self.assertEqual(A.diagonal().sum(), 0)
+
+    def test_erdos_renyi(self):
+        """
+        Tests that Erdős-Rényi graphs are simple, reproducible and have the
+        expected number of edges.
+        """
+        n, p = 2000, 0.005
+        A = generators.erdos_renyi(n, p, seed = 0)
+        self.assertSimpleGraph(A)
+        expected = p*n*(n - 1)/2
+        self.assertLess(abs(A.nnz/2 - expected), 4*np.sqrt(expected))
+        B = generators.erdos_renyi(n, p, seed = np.random.default_rng(0))
+        self.assertEqual((A != B).nnz, 0)
+        self.assertEqual(generators.erdos_renyi(n, 0., seed = 0).nnz, 0)
+
+    def test_stochastic_block_model(self):
+        """
+        Tests the edge densities within and between blocks.
+        """
+        P = [[0.1, 0.01], [0.01, 0.2]]
+        A = generators.stochastic_block_model([400, 300], P, seed = 1)
+        self.assertSimpleGraph(A)
+        self.assertAlmostEqual(
+            A[:400, :400].nnz/(400*399), 0.1, delta = 0.01)
+        self.assertAlmostEqual(
+            A[400:, 400:].nnz/(300*299), 0.2, delta = 0.02)
+        self.assertAlmostEqual(
+            A[:400, 400:].nnz/(400*300), 0.01, delta = 0.003)
+        with self.assertRaises(ValueError):
+            generators.stochastic_block_model([10, 10], [[0.1, 0.2], [0.3, 0.1]])
+
+    def test_configuration_model_and_chung_lu(self):
+        """
+        Tests that degrees approximately follow the given sequence or weights.
+        """
+        rng = np.random.default_rng(2)
+        degrees = rng.integers(1, 8, size = 5000)
+        A = generators.configuration_model(degrees, seed = 2)
+        self.assertSimpleGraph(A)
+        realized = np.diff(A.indptr)
+        self.assertTrue(np.all(realized <= degrees))
+        self.assertGreater(realized.sum()/degrees.sum(), 0.99)
+
+        weights = np.where(np.arange(5000) < 2500, 4., 12.)
+        A = generators.chung_lu(weights, seed = 3)
+        self.assertSimpleGraph(A)
+        realized = np.diff(A.indptr)
+        self.assertAlmostEqual(realized[:2500].mean(), 4., delta = 0.3)
+        self.assertAlmostEqual(realized[2500:].mean(), 12., delta = 0.5)
+
+    def test_household_workplace(self):
+        """
+        Tests that group members form cliques and that the result can be
+        simulated without NetworkX.
+        """
+        groups = np.array([0, 0, 0, -1, 1, 1, 2])
+        A = generators.group_projection(groups, weight = 2.)
+        self.assertEqual(A.nnz, 8)
+        self.assertEqual(A[0, 2], 2.)
+        self.assertEqual(A[4, 5], 2.)
+        self.assertEqual(A[3].nnz, 0)
+
+        A, households, workplaces = generators.household_workplace(
+            5000, mean_household_size = 3., seed = 4)
+        self.assertSimpleGraph(A)
+        self.assertAlmostEqual(
+            np.bincount(households).mean(), 3., delta = 0.2)
+        members = np.flatnonzero(households == households[0])
+        for u in members:
+            for v in members:
+                if u != v:
+                    self.assertGreater(A[u, v], 0)
+        network = contagion.ContactNetwork.from_csr(
+            A, fraction_infected = 0.01)
+        sim = contagion.Contagion(network, beta = 0.1, gamma = 0.1, seed = 0)
+        sim.run_simulation(10)
+        self.assertEqual(network.n, 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import unittest
+import numpy as np
+sys.path.append("..")
+from contagion import contagion, generators, layers
+
+
+class TestLayers(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 400
+        self.household = generators.group_projection(np.arange(self.n)//4)
+        self.school = generators.erdos_renyi(self.n, 0.02, seed = 0)
+
+    def run_pair(self, network, reference, **kwargs):
+        network.init_Su_In_Re(rng = np.random.default_rng(1))
+        reference.init_Su_In_Re(rng = np.random.default_rng(1))
+        sims = [contagion.Contagion(net, seed = 2, **kwargs)
+            for net in [network, reference]]
+        for sim in sims:
+            sim.run_simulation(30)
+        return sims
+
+    def test_matches_combined_network(self):
+        """
+        Tests that layered simulation matches simulation on the equivalent
+        combined matrix, without building it.
+        """
+        for weighted in [False, True]:
+            network = layers.MultiLayerNetwork([
+                layers.Layer(self.household, "household", multiplier = 2.),
+                layers.Layer(self.school, "school")],
+                fraction_infected = 0.05)
+            reference = contagion.ContactNetwork.from_csr(
+                2*self.household + self.school, fraction_infected = 0.05)
+            layered, combined = self.run_pair(
+                network, reference, beta = 0.1, gamma = 0.2,
+                weighted_transmission = weighted)
+            self.assertEqual(layered.In_hist, combined.In_hist)
+            self.assertIsNone(network._A)
+
+    def test_schedules(self):
+        """
+        Tests that closed layers carry no transmission, and that multiplier
+        schedules are looked up by step.
+        """
+        school = layers.Layer(self.school, "school", closed = [(0, None)])
+        network = layers.MultiLayerNetwork(
+            [layers.Layer(self.household, "household"), school],
+            fraction_infected = 0.05)
+        reference = contagion.ContactNetwork.from_csr(
+            self.household, fraction_infected = 0.05)
+        layered, combined = self.run_pair(
+            network, reference, beta = 0.2, gamma = 0.1,
+            weighted_transmission = True)
+        self.assertEqual(layered.In_hist, combined.In_hist)
+        self.assertIs(network.layer("school"), school)
+
+        layer = layers.Layer(self.school, multiplier = [1., 0.5, 0.25])
+        layer.close(10, 12)
+        self.assertEqual(
+            [layer.weight(t) for t in [0, 1, 2, 9, 10, 11, 12]],
+            [1., 0.5, 0.25, 0.25, 0., 0., 0.25])
+        self.assertEqual(
+            network.degrees.sum(), self.household.nnz + self.school.nnz)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(network, partitions = 2)
+
+    def test_reorder_nodes(self):
+        """
+        Tests that reordering permutes every layer with the nodes, so
+        per-layer pressure is unchanged up to the permutation.
+        """
+        network = layers.MultiLayerNetwork([
+            layers.Layer(self.household, "household", multiplier = 2.),
+            layers.Layer(self.school, "school", closed = [(5, None)])])
+        x = np.random.default_rng(0).random((self.n, 1))
+        before = [network.pressure(x, t) for t in [0, 5]]
+        order = np.random.default_rng(1).permutation(self.n)
+        self.assertTrue(np.array_equal(network.reorder_nodes(order), order))
+        for t, pressure in zip([0, 5], before):
+            self.assertTrue(
+                np.allclose(network.pressure(x[order], t), pressure[order]))
+        self.assertIsNone(network._A)
+        network.reorder_nodes("rcm")
+        self.assertEqual(
+            (network.A != sum(layer.A for layer in network.layers)).nnz, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import models
+
+
+class TestModels(unittest.TestCase):
+
+    def test_builtin_models_conserve_population(self):
+        """
+        Tests that every built-in model keeps all nodes in some compartment.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        for name in ["seir", "sis", "seirs", "sird"]:
+            network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+            sim = contagion.Contagion(
+                network,
+                beta = 0.3,
+                gamma = 0.2,
+                omega = 0.1,
+                contagion_type = name,
+                rates = {"sigma": 0.5, "mu": 0.05},
+                seed = 0)
+            sim.run_simulation(30)
+            totals = np.sum([sim.hist[c] for c in sim.model.compartments], axis=0)
+            self.assertTrue(np.all(totals == 200))
+            self.assertEqual(len(sim.In_hist), len(sim.hist["S"]))
+
+    def test_seir_latent_period(self):
+        """
+        Tests that with sigma = 0 no exposed node becomes infectious.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        sim = contagion.Contagion(
+            network,
+            beta = 1.,
+            gamma = 1.,
+            contagion_type = "seir",
+            rates = {"sigma": 0.})
+        sim.simulate_step()
+        sim.simulate_step()
+        self.assertEqual(sim.hist["I"][-1], 0)
+        self.assertGreater(sim.hist["E"][-1], 0)
+
+    def test_custom_model(self):
+        """
+        Tests a user-defined model with a constant transition probability.
+        """
+        model = models.CompartmentModel(
+            "si",
+            ["S", "I"],
+            [models.Transition("S", "I", 1., infectious=("I",))])
+        G = nx.path_graph(10)
+        network = contagion.ContactNetwork(G)
+        network.Su[:], network.In[:] = 1., 0.
+        network.Su[0], network.In[0] = 0., 1.
+        sim = contagion.Contagion(network, contagion_type = model)
+        sim.simulate_step()
+        self.assertEqual(sim.hist["I"], [1, 2])
+
+    def test_missing_rate(self):
+        """
+        Tests that a model rate must be provided.
+        """
+        G = nx.barabasi_albert_graph(50, 3)
+        network = contagion.ContactNetwork(G)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(network, contagion_type = "seir")
+
+    def test_invalid_model(self):
+        """
+        Tests that unknown contagion types are rejected.
+        """
+        G = nx.barabasi_albert_graph(50, 3)
+        network = contagion.ContactNetwork(G)
+        with self.assertRaises(ValueError):
+            contagion.Contagion(network, contagion_type = "xyz")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+import scipy.sparse as sp
+sys.path.append("..")
+from contagion import contagion
+from contagion import monitoring
+
+
+class TestMonitoring(unittest.TestCase):
+
+    def test_detection_times(self):
+        """
+        Tests batched detection times against a per-set computation.
+        """
+        rng = np.random.default_rng(0)
+        first = rng.integers(-1, 20, size = 50)
+        incidence = sp.random(50, 30, density = 0.2, random_state = 1)
+        thresholds = rng.integers(1, 5, size = 30)
+        times = monitoring.detection_times(first, incidence, thresholds)
+        dense = incidence.toarray() != 0
+        for k in range(30):
+            t = np.sort(first[dense[:, k] & (first >= 0)])
+            expected = t[thresholds[k] - 1] if len(t) >= thresholds[k] \
+                else np.inf
+            self.assertEqual(times[k], expected)
+
+    def test_evaluate_placements(self):
+        """
+        Tests that an ensemble of runs stops once every placement is detected.
+        """
+        G = nx.barabasi_albert_graph(300, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.02)
+        incidence = sp.csc_matrix(np.eye(300)[:, :3])
+
+        def sim_factory(run):
+            network.reset_Su_In_Re()
+            return contagion.Contagion(
+                network, beta = 0.3, gamma = 0.05, seed = run,
+                save_history = False)
+
+        times = monitoring.evaluate_placements(
+            sim_factory, incidence, thresholds = 1, runs = 4)
+        self.assertEqual(times.shape, (4, 3))
+        infected = network.og_In.ravel()[:3] > 0
+        np.testing.assert_array_equal(times[:, infected], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
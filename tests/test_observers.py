@@ -0,0 +1,68 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import observers
+
+
+class TestObservers(unittest.TestCase):
+
+    def test_ring_buffer(self):
+        """
+        Tests that a full ring buffer keeps its most recent values in order.
+        """
+        buffer = observers.RingBuffer(3)
+        for x in range(5):
+            buffer.append(x)
+        self.assertEqual(len(buffer), 3)
+        np.testing.assert_array_equal(buffer.values(), [2, 3, 4])
+
+    def test_new_cases_and_peak(self):
+        """
+        Tests that observed new cases and peaks agree with the histories.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        new_cases = observers.NewCases()
+        peak = observers.Peak()
+        sim = contagion.Contagion(
+            network,
+            beta = 0.2,
+            gamma = 0.1,
+            seed = 0,
+            observers = [new_cases, peak])
+        sim.run_simulation(30)
+        np.testing.assert_array_equal(
+            new_cases.cases.values(), -np.diff(sim.Su_hist))
+        self.assertEqual(peak.peak, max(sim.In_hist))
+        self.assertEqual(peak.peak_step, int(np.argmax(sim.In_hist)))
+
+    def test_early_termination_without_history(self):
+        """
+        Tests that an observer can stop a run that keeps no history.
+        """
+        G = nx.barabasi_albert_graph(200, 3)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        groups = np.arange(200) % 4
+        fractions = observers.GroupFractions(groups, capacity = 5)
+        sim = contagion.Contagion(
+            network,
+            beta = 0.2,
+            gamma = 0.01,
+            save_history = False,
+            observers = [
+                fractions,
+                observers.StopWhen(lambda sim, step, deltas: step >= 8)])
+        sim.run_simulation()
+        self.assertEqual(sim.t, 8)
+        self.assertFalse(hasattr(sim, "In_hist"))
+        self.assertEqual(fractions.fractions.values().shape, (5, 4))
+        np.testing.assert_allclose(
+            fractions.fractions.values()[-1],
+            np.bincount(groups, weights = network.In.ravel())/50)
+
+
+if __name__ == '__main__':
+    unittest.main()
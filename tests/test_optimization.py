@@ -0,0 +1,62 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion, optimization
+
+
+class TestOptimization(unittest.TestCase):
+
+    def setUp(self):
+        self.G = nx.barabasi_albert_graph(300, 2, seed = 0)
+        self.network = contagion.ContactNetwork(self.G, fraction_infected = 0.02)
+
+    def test_percolation_greedy(self):
+        """
+        Tests that greedy immunization under the percolation estimator picks Q
+        nodes, that its benefit curve is nonincreasing and matches the
+        estimator, and that it does at least as well as the highest degrees,
+        leaving the network's seeds unchanged.
+        """
+        og_In = self.network.og_In.copy()
+        estimator = optimization.PercolationEstimator(
+            self.network, beta = 0.2, gamma = 0.2, runs = 30, seed = 0)
+        self.assertTrue(np.array_equal(self.network.og_In, og_In))
+        Im, benefit, evaluations = optimization.greedy_immunization(
+            estimator, Q = 5)
+        self.assertEqual(Im.shape, (300, 1))
+        self.assertEqual(Im.sum(), 5)
+        self.assertEqual(len(benefit), 6)
+        self.assertTrue(np.all(np.diff(benefit) <= 0))
+        self.assertGreater(evaluations, 0)
+        immune = Im.ravel() > 0
+        self.assertAlmostEqual(estimator.sizes(immune).mean(), benefit[-1])
+        degree = np.zeros(300, dtype = bool)
+        degree[np.argsort(-self.network.degrees)[:5]] = True
+        self.assertLessEqual(benefit[-1], estimator.sizes(degree).mean())
+
+        Im = contagion.Immunization(self.network).generate_greedy_immunization_array(
+            Q = 5, beta = 0.2, gamma = 0.2, runs = 30, seed = 0)
+        self.assertTrue(np.array_equal(Im.ravel() > 0, immune))
+
+    def test_simulation_greedy(self):
+        """
+        Tests that greedy immunization under the simulation estimator selects
+        among the given candidates, with common random numbers.
+        """
+        estimator = optimization.SimulationEstimator(
+            self.network, runs = 5, seed = 0, beta = 0.2, gamma = 0.2)
+        none = np.zeros(300, dtype = bool)
+        self.assertTrue(np.array_equal(estimator.sizes(none), estimator.sizes(none)))
+        candidates = np.argsort(-self.network.degrees)[:6]
+        Im, benefit, evaluations = optimization.greedy_immunization(
+            estimator, Q = 2, candidates = candidates)
+        self.assertEqual(Im.sum(), 2)
+        self.assertTrue(np.all(Im.ravel()[candidates].sum() == 2))
+        self.assertGreaterEqual(evaluations, 6)
+        self.assertLessEqual(benefit[-1], benefit[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
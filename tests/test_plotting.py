@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+import matplotlib
+matplotlib.use("Agg")
+sys.path.append("..")
+from contagion import contagion, plotting
+
+
+class TestPlotting(unittest.TestCase):
+
+    def test_core_import(self):
+        """
+        Tests that importing the core module does not import plotting
+        libraries, NetworkX, Numba or SciPy's special functions and optimizers.
+        """
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        code = (
+            "import sys, contagion.contagion; print(' '.join(sys.modules))")
+        modules = subprocess.check_output(
+            [sys.executable, "-c", code], cwd = root, text = True).split()
+        for module in [
+                "matplotlib", "seaborn", "networkx", "numba", "scipy.special",
+                "scipy.optimize"]:
+            self.assertNotIn(module, modules)
+
+    def test_plot_simulation(self):
+        """
+        Tests that plots are rendered from stored histories without running
+        the simulation further, and require save_history.
+        """
+        G = nx.barabasi_albert_graph(200, 3, seed = 0)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.05)
+        sim = contagion.Contagion(network, beta = 0.2, gamma = 0.1, seed = 0)
+        sim.run_simulation(20)
+        ax = plotting.plot_simulation(sim, show = False)
+        self.assertEqual(sim.t, 20)
+        self.assertEqual(len(ax.get_lines()), 3)
+        self.assertTrue(np.array_equal(ax.get_lines()[0].get_ydata(), sim.Su_hist))
+        self.assertEqual(ax.get_ylim()[1], 200)
+
+        sim = contagion.Contagion(
+            network, beta = 0.2, gamma = 0.1, seed = 0, save_history = False)
+        with self.assertRaises(ValueError):
+            plotting.plot_simulation(sim, show = False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import profiling
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_simulate_step_phases(self):
+        """
+        Tests that each phase of simulate_step is recorded once per step.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G, fraction_infected = 0.1)
+        sim = contagion.Contagion(
+            network,
+            beta = 0.1,
+            gamma = 0.1,
+            track_symptomatic = True,
+            profile = True)
+        for _ in range(3):
+            sim.simulate_step()
+        stats = sim.profiler.as_dict()
+        self.assertEqual(stats["simulate_step"]["calls"], 3)
+        self.assertEqual(stats["simulate_step;transmission"]["calls"], 3)
+        self.assertEqual(
+            stats["simulate_step;transmission"]["bytes"], 3*100*8)
+        self.assertIn("simulate_step;symptoms", stats)
+        self.assertNotIn("simulate_step;testing", stats)
+        self.assertGreaterEqual(
+            stats["simulate_step"]["time"],
+            stats["simulate_step;transmission"]["time"])
+
+    def test_context_manager(self):
+        """
+        Tests that an active profiler records Immunization methods, and that
+        nothing is recorded once it is deactivated.
+        """
+        G = nx.barabasi_albert_graph(100, 5)
+        network = contagion.ContactNetwork(G)
+        imm = contagion.Immunization(network)
+        with profiling.Profiler() as prof:
+            imm.generate_highest_degrees_immunization_array(Q = 5)
+            imm.generate_random_immunization_array(Q = 5)
+        imm.generate_random_immunization_array(Q = 5)
+        stats = prof.as_dict()
+        self.assertEqual(
+            stats["generate_random_immunization_array"]["calls"], 1)
+        self.assertEqual(
+            stats["generate_highest_degrees_immunization_array"]["bytes"],
+            100*8)
+        self.assertIsNone(profiling.active())
+
+    def test_collapsed_stacks(self):
+        """
+        Tests that collapsed stacks report self time of nested phases.
+        """
+        prof = profiling.Profiler()
+        with prof.phase("outer"):
+            with prof.phase("inner"):
+                pass
+        lines = dict(
+            line.rsplit(" ", 1) for line in prof.to_collapsed().splitlines())
+        self.assertEqual(set(lines), {"outer", "outer;inner"})
+        self.assertTrue(all(int(v) >= 0 for v in lines.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
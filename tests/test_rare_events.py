@@ -0,0 +1,80 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import observers
+from contagion import rare_events
+from contagion import campaigns
+
+
+class TestRareEvents(unittest.TestCase):
+
+    def setUp(self):
+        G = nx.barabasi_albert_graph(100, 2, seed = 1)
+        self.network = contagion.ContactNetwork(G, fraction_infected = 0.02)
+
+    def factory(self, beta):
+        def sim_factory(seed):
+            self.network.init_Su_In_Re(rng = np.random.default_rng(0))
+            return contagion.Contagion(
+                self.network, beta = beta, gamma = 0.3, seed = seed)
+        return sim_factory
+
+    def test_no_transmission(self):
+        """
+        Tests that an unreachable peak has probability zero.
+        """
+        results = rare_events.estimate_peak_exceedance(
+            self.factory(0.), 0.1, particles = 10, repetitions = 3, seed = 0)
+        self.assertEqual(results["estimate"], 0.)
+        self.assertEqual(results["variance"], 0.)
+
+    def test_against_monte_carlo(self):
+        """
+        Tests the splitting estimate against crude Monte Carlo.
+        """
+        factory = self.factory(0.15)
+        runs = 400
+        hits = 0
+        for seed in range(runs):
+            sim = factory(seed)
+            peak = sim.add_observer(observers.Peak())
+            sim.run_simulation(1000)
+            hits += peak.peak > 0.1*100
+        crude = hits/runs
+        crude_var = crude*(1 - crude)/runs
+        results = rare_events.estimate_peak_exceedance(
+            factory, 0.1, levels = 3, particles = 50, repetitions = 8,
+            seed = 0)
+        self.assertLess(
+            abs(results["estimate"] - crude),
+            4*np.sqrt(crude_var + results["variance"]))
+
+    def test_restore_campaign(self):
+        """
+        Tests that restored particles resume a campaign's dosing from the
+        snapshot, so continuations with the same randomness agree.
+        """
+        self.network.init_Su_In_Re(rng = np.random.default_rng(0))
+        campaign = campaigns.Campaign(
+            np.arange(100), 3, efficacy = 0.8, second_dose_after = 2)
+        sim = contagion.Contagion(
+            self.network, beta = 0.2, gamma = 0.3, seed = 0,
+            campaign = campaign)
+        sim.run_simulation(3)
+        snapshot = rare_events._snapshot(sim)
+        runs = []
+        for _ in range(2):
+            rare_events._restore(sim, snapshot)
+            sim.rng = np.random.default_rng(1)
+            sim.run_simulation(10)
+            runs.append((
+                sim.network.Re.copy(), campaign.coverage(), campaign.protected))
+        self.assertTrue(np.array_equal(runs[0][0], runs[1][0]))
+        self.assertEqual(runs[0][1:], runs[1][1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import unittest
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion, seeding
+
+
+class TestSeeding(unittest.TestCase):
+
+    def setUp(self):
+        self.G = nx.barabasi_albert_graph(500, 2, seed = 0)
+        self.network = contagion.ContactNetwork(self.G, fraction_infected = 0.1)
+
+    def test_init_Su_In_Re(self):
+        """
+        Tests that random initialization seeds the expected counts without
+        overlap, and is reproducible.
+        """
+        network = contagion.ContactNetwork(
+            self.G, fraction_infected = 0.1, fraction_recovered = 0.2)
+        network.init_Su_In_Re(rng = np.random.default_rng(1))
+        self.assertEqual(network.In.sum(), 50)
+        self.assertEqual(network.Re.sum(), 100)
+        self.assertTrue(np.all(network.Su + network.In + network.Re == 1))
+        In = network.In.copy()
+        network.init_Su_In_Re(rng = np.random.default_rng(1))
+        self.assertTrue(np.array_equal(In, network.In))
+        network.In[:] = 0
+        network.reset_Su_In_Re()
+        self.assertTrue(np.array_equal(In, network.In))
+
+    def test_strategies(self):
+        """
+        Tests the degree, group, cluster and explicit seeding strategies.
+        """
+        rng = np.random.default_rng(2)
+        seeds = seeding.by_degree(
+            self.network.degrees, 5, quantiles = (0.95, 1.), rng = rng)
+        threshold = np.quantile(self.network.degrees, 0.95)
+        self.assertEqual(len(seeds), 5)
+        self.assertTrue(np.all(self.network.degrees[seeds.infected] >= threshold))
+
+        groups = np.arange(500) % 7
+        seeds = seeding.by_group(groups, 10, group = 3, rng = rng)
+        self.assertTrue(np.all(groups[seeds.infected] == 3))
+
+        seeds = seeding.by_cluster(self.network.A, 20, center = 0, rng = rng)
+        self.assertEqual(len(seeds), 20)
+        self.assertEqual(seeds.infected[0], 0)
+        distances = nx.single_source_shortest_path_length(self.G, 0)
+        within = sorted(distances.values())[19]
+        self.assertTrue(all(distances[i] <= within for i in seeds.infected))
+
+        self.network.seed(seeding.from_nodes([1, 2], recovered = [3]))
+        self.assertEqual(self.network.In.sum(), 2)
+        self.assertEqual(self.network.Re[3, 0], 1)
+        with self.assertRaises(ValueError):
+            seeding.from_nodes([1, 2], recovered = [2])
+
+    def test_replicates(self):
+        """
+        Tests that replicate seed sets are compact and reproducible.
+        """
+        factory = lambda rng: seeding.by_count(10**9, 10, 5, rng = rng)
+        first = seeding.replicates(factory, 100, seed = 3)
+        second = seeding.replicates(factory, 100, seed = 3)
+        self.assertEqual(len(first), 100)
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a.infected, b.infected))
+            self.assertEqual(len(np.union1d(a.infected, a.recovered)), 15)
+        self.assertFalse(np.array_equal(first[0].infected, first[1].infected))
+
+
+if __name__ == '__main__':
+    unittest.main()
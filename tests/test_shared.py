@@ -0,0 +1,95 @@
+import sys
+import unittest
+import multiprocessing
+import numpy as np
+import networkx as nx
+sys.path.append("..")
+from contagion import contagion
+from contagion import shared
+
+
+def _final_size(spec):
+    network = shared.attach(spec, fraction_infected = 0.05)
+    network.init_Su_In_Re(rng = np.random.default_rng(0))
+    sim = contagion.Contagion(network, beta = 0.2, gamma = 0.2, seed = 0)
+    sim.run_simulation()
+    return network.n - sim.Su_hist[-1]
+
+
+class TestShared(unittest.TestCase):
+
+    def setUp(self):
+        G = nx.barabasi_albert_graph(200, 3)
+        self.network = contagion.ContactNetwork(G)
+        Im = np.zeros((200, 1))
+        Im[:10] = 1
+        self.network.immunize_network(Im, im_starts_after = 2)
+
+    def test_attach_read_only_views(self):
+        """
+        Tests that attached networks share read-only adjacency and
+        immunization arrays.
+        """
+        with shared.SharedNetwork(self.network) as published:
+            network = shared.attach(published.spec, fraction_infected = 0.1)
+            self.assertEqual((network.A != self.network.A).nnz, 0)
+            np.testing.assert_array_equal(network.Im, self.network.Im)
+            self.assertEqual(network.im_starts_after, 2)
+            self.assertFalse(network.A.indices.flags.writeable)
+            self.assertFalse(network.Im.flags.writeable)
+            self.assertTrue(network.In.flags.writeable)
+            sim = contagion.Contagion(network, beta = 0.2, gamma = 0.2)
+            sim.run_simulation(10)
+
+    def test_numba_backend(self):
+        """
+        Tests that the numba backend runs on attached networks with
+        immunization, leaving the shared immunization array unchanged.
+        """
+        try:
+            import numba
+        except ImportError:
+            self.skipTest("numba is not installed")
+        with shared.SharedNetwork(self.network) as published:
+            network = shared.attach(published.spec, fraction_infected = 0.1)
+            shared_Im = network.Im
+            sim = contagion.Contagion(
+                network, beta = 0.2, gamma = 0.2, omega = (0.1, 0.1), seed = 0,
+                backend = "numba")
+            sim.run_simulation(10)
+            self.assertTrue(network.Im.flags.writeable)
+            np.testing.assert_array_equal(shared_Im, self.network.Im)
+
+    def test_waning_backends(self):
+        """
+        Tests that simulations with waning immunization run on attached
+        networks with every numpy stepping path, leaving the shared arrays
+        unchanged.
+        """
+        with shared.SharedNetwork(self.network) as published:
+            for kwargs in [{}, {"partitions": 2}, {"scheduled_events": True}]:
+                network = shared.attach(published.spec, fraction_infected = 0.1)
+                with contagion.Contagion(
+                        network, beta = 0.2, gamma = 0.2,
+                        omega = (0.05, 0.05), seed = 0, **kwargs) as sim:
+                    sim.run_simulation(10)
+                self.assertTrue(network.Im.flags.writeable)
+            # views outlive the attached network
+            np.testing.assert_array_equal(
+                shared.attach(published.spec).Im, self.network.Im)
+
+    def test_worker_processes(self):
+        """
+        Tests that worker processes can attach and simulate.
+        """
+        with shared.SharedNetwork(self.network) as published:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "fork" if "fork" in methods else "spawn")
+            with context.Pool(2) as pool:
+                sizes = pool.map(_final_size, [published.spec]*2)
+        self.assertEqual(sizes[0], sizes[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import sys
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse as sp
+sys.path.append("..")
+from contagion import contagion, generators, temporal
+
+
+class TestTemporal(unittest.TestCase):
+
+    def setUp(self):
+        self.n = 300
+        self.snapshots = [
+            generators.erdos_renyi(self.n, 0.02, seed = s) for s in range(5)]
+
+    def test_snapshots(self):
+        """
+        Tests that each step runs on its own snapshot, from memory or from a
+        memory-mapped table, and that compartments carry over.
+        """
+        table = temporal.EdgeTable.from_snapshots(self.snapshots)
+        with tempfile.TemporaryDirectory() as path:
+            table.save(path)
+            loaded = temporal.EdgeTable.load(path)
+            self.assertIsInstance(loaded.rows, np.memmap)
+            network = temporal.TemporalNetwork(
+                self.n, snapshots = loaded, fraction_infected = 0.05)
+            for t in [3, 1, 4, 7]:
+                network.advance_to(t)
+                self.assertEqual(
+                    (network.A != self.snapshots[min(t, 4)]).nnz, 0)
+
+            network.advance_to(0)
+            network.init_Su_In_Re(rng = np.random.default_rng(0))
+            sim = contagion.Contagion(network, beta = 0.2, gamma = 0.1, seed = 1)
+            sim.run_simulation(20)
+            self.assertEqual(len(sim.In_hist), 21)
+            self.assertTrue(np.all(network.Su + network.In + network.Re == 1))
+
+        cyclic = temporal.TemporalNetwork(
+            self.n, snapshots = self.snapshots, cycle = True)
+        cyclic.advance_to(7)
+        self.assertEqual((cyclic.A != self.snapshots[2]).nnz, 0)
+
+    def test_deltas(self):
+        """
+        Tests that edge additions and removals reproduce the snapshots, going
+        forwards and backwards.
+        """
+        added, removed = [], []
+        for previous, current in zip(self.snapshots[:-1], self.snapshots[1:]):
+            added.append(sp.csr_matrix(current - current.multiply(previous)))
+            removed.append(sp.csr_matrix(previous - previous.multiply(current)))
+        empty = sp.csr_matrix((self.n, self.n))
+        network = temporal.TemporalNetwork(
+            self.n,
+            initial = self.snapshots[0],
+            added = temporal.EdgeTable.from_snapshots([empty] + added),
+            removed = temporal.EdgeTable.from_snapshots([empty] + removed))
+        for t in [1, 2, 4, 2, 3]:
+            network.advance_to(t)
+            self.assertEqual((network.A != self.snapshots[t]).nnz, 0)
+        aggregate = network.aggregate()
+        self.assertEqual((aggregate != sum(self.snapshots)).nnz, 0)
+        with self.assertRaises(ValueError):
+            temporal.TemporalNetwork(self.n)
+
+    def test_weighted_deltas(self):
+        """
+        Tests that deltas only change the rows of nodes they touch, and that
+        added edges take their new weights, as for full sparse arithmetic.
+        """
+        rng = np.random.default_rng(0)
+        initial = generators.erdos_renyi(self.n, 0.02, seed = 0)
+        initial.data = rng.uniform(1, 2, initial.nnz)
+        initial = sp.csr_matrix(initial + initial.T)
+        tables = []
+        for _ in range(2):
+            steps = rng.integers(1, 6, 400)
+            rows, cols = rng.integers(0, 40, (2, 400))
+            tables.append(temporal.EdgeTable.from_events(
+                steps, rows, cols, weights = rng.uniform(1, 2, 400),
+                num_steps = 6))
+        network = temporal.TemporalNetwork(
+            self.n, initial = initial, added = tables[0], removed = tables[1])
+        expected = initial
+        for t in range(1, 6):
+            R = tables[1].to_csr(t, self.n)
+            D = tables[0].to_csr(t, self.n)
+            expected = expected - expected.multiply(R > 0)
+            expected = expected - expected.multiply(D > 0) + D
+            network.advance_to(t)
+            self.assertTrue(np.allclose(network.A.toarray(), expected.toarray()))
+            np.testing.assert_array_equal(
+                network.A[40:].toarray(), initial[40:].toarray())
+
+
+if __name__ == '__main__':
+    unittest.main()